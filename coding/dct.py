@@ -0,0 +1,320 @@
+"""Integer 8 x 8 forward and inverse DCT (Loeffler, Ligtenberg and Moschytz, as in the IJG "islow" method).
+
+Constants are fixed-point with CONST_BITS fraction bits; the intermediate
+results of the column pass keep PASS1_BITS extra bits of precision.
+
+The reduced inverse transforms (as the IJG jidctred) compute 4 x 4 and
+2 x 2 samples directly from the coefficients of an 8 x 8 block, for
+decoding at 1/2 and 1/4 size; at 1/8 size, a block is its DC coefficient.
+"""
+
+CONST_BITS = 13
+PASS1_BITS = 2
+
+FIX_0_211164243 = 1730
+FIX_0_298631336 = 2446
+FIX_0_390180644 = 3196
+FIX_0_509795579 = 4176
+FIX_0_541196100 = 4433
+FIX_0_601344887 = 4926
+FIX_0_720959822 = 5906
+FIX_0_765366865 = 6270
+FIX_0_850430095 = 6967
+FIX_0_899976223 = 7373
+FIX_1_061594337 = 8697
+FIX_1_175875602 = 9633
+FIX_1_272758580 = 10426
+FIX_1_451774981 = 11893
+FIX_1_501321110 = 12299
+FIX_1_847759065 = 15137
+FIX_1_961570560 = 16069
+FIX_2_053119869 = 16819
+FIX_2_172734803 = 17799
+FIX_2_562915447 = 20995
+FIX_3_072711026 = 25172
+FIX_3_624509785 = 29692
+
+# LIMIT[(value + 384) & 1023] is a sample value limited to 0 .. 255; wildly
+# out of range values (from corrupt data) wrap around instead of failing
+LIMIT = bytes(min(255, max(0, i - 384)) for i in range(1024))
+
+
+def idct(block, output, offset, stride):
+    """Inverse transforms 64 dequantized coefficients in natural (row-major) order.
+
+    Writes the 8 x 8 samples, level shifted by 128, into the output buffer
+    starting at offset, with rows stride bytes apart.
+    """
+    workspace = [0] * 64
+    descale = CONST_BITS - PASS1_BITS
+    rounding = 1 << (descale - 1)
+
+    # Pass 1: columns, into the workspace
+    for c in range(8):
+        d0, d1, d2, d3, d4, d5, d6, d7 = block[c::8]
+
+        if not (d1 or d2 or d3 or d4 or d5 or d6 or d7):
+            workspace[c::8] = [d0 << PASS1_BITS] * 8
+            continue
+
+        z1 = (d2 + d6) * FIX_0_541196100
+        tmp2 = z1 - d6 * FIX_1_847759065
+        tmp3 = z1 + d2 * FIX_0_765366865
+        tmp0 = (d0 + d4) << CONST_BITS
+        tmp1 = (d0 - d4) << CONST_BITS
+
+        tmp10 = tmp0 + tmp3 + rounding
+        tmp13 = tmp0 - tmp3 + rounding
+        tmp11 = tmp1 + tmp2 + rounding
+        tmp12 = tmp1 - tmp2 + rounding
+
+        z1 = d7 + d1
+        z2 = d5 + d3
+        z3 = d7 + d3
+        z4 = d5 + d1
+        z5 = (z3 + z4) * FIX_1_175875602
+
+        z1 *= -FIX_0_899976223
+        z2 *= -FIX_2_562915447
+        z3 = z3 * -FIX_1_961570560 + z5
+        z4 = z4 * -FIX_0_390180644 + z5
+
+        tmp0 = d7 * FIX_0_298631336 + z1 + z3
+        tmp1 = d5 * FIX_2_053119869 + z2 + z4
+        tmp2 = d3 * FIX_3_072711026 + z2 + z3
+        tmp3 = d1 * FIX_1_501321110 + z1 + z4
+
+        workspace[c::8] = [(tmp10 + tmp3) >> descale, (tmp11 + tmp2) >> descale,
+                           (tmp12 + tmp1) >> descale, (tmp13 + tmp0) >> descale,
+                           (tmp13 - tmp0) >> descale, (tmp12 - tmp1) >> descale,
+                           (tmp11 - tmp2) >> descale, (tmp10 - tmp3) >> descale]
+
+    # Pass 2: rows, into the output, with the level shift folded into the rounding
+    descale = CONST_BITS + PASS1_BITS + 3
+    rounding = (1 << (descale - 1)) + (128 << descale) + (384 << descale)
+
+    for r in range(8):
+        d0, d1, d2, d3, d4, d5, d6, d7 = workspace[r * 8:r * 8 + 8]
+        start = offset + r * stride
+
+        if not (d1 or d2 or d3 or d4 or d5 or d6 or d7):
+            output[start:start + 8] = bytes((LIMIT[((d0 + (1 << (PASS1_BITS + 2))) >> (PASS1_BITS + 3)) + 512 & 1023],)) * 8
+            continue
+
+        z1 = (d2 + d6) * FIX_0_541196100
+        tmp2 = z1 - d6 * FIX_1_847759065
+        tmp3 = z1 + d2 * FIX_0_765366865
+        tmp0 = (d0 + d4) << CONST_BITS
+        tmp1 = (d0 - d4) << CONST_BITS
+
+        tmp10 = tmp0 + tmp3 + rounding
+        tmp13 = tmp0 - tmp3 + rounding
+        tmp11 = tmp1 + tmp2 + rounding
+        tmp12 = tmp1 - tmp2 + rounding
+
+        z1 = d7 + d1
+        z2 = d5 + d3
+        z3 = d7 + d3
+        z4 = d5 + d1
+        z5 = (z3 + z4) * FIX_1_175875602
+
+        z1 *= -FIX_0_899976223
+        z2 *= -FIX_2_562915447
+        z3 = z3 * -FIX_1_961570560 + z5
+        z4 = z4 * -FIX_0_390180644 + z5
+
+        tmp0 = d7 * FIX_0_298631336 + z1 + z3
+        tmp1 = d5 * FIX_2_053119869 + z2 + z4
+        tmp2 = d3 * FIX_3_072711026 + z2 + z3
+        tmp3 = d1 * FIX_1_501321110 + z1 + z4
+
+        output[start:start + 8] = bytes((LIMIT[(tmp10 + tmp3) >> descale & 1023], LIMIT[(tmp11 + tmp2) >> descale & 1023],
+                                         LIMIT[(tmp12 + tmp1) >> descale & 1023], LIMIT[(tmp13 + tmp0) >> descale & 1023],
+                                         LIMIT[(tmp13 - tmp0) >> descale & 1023], LIMIT[(tmp12 - tmp1) >> descale & 1023],
+                                         LIMIT[(tmp11 - tmp2) >> descale & 1023], LIMIT[(tmp10 - tmp3) >> descale & 1023]))
+
+
+def idct_dc(dc, output, offset, stride, size=8):
+    """Fills a size x size block of output with the samples of a block having only a DC coefficient."""
+    row = bytes((LIMIT[((dc + 4) >> 3) + 512 & 1023],)) * size
+
+    for r in range(size):
+        start = offset + r * stride
+        output[start:start + size] = row
+
+
+def idct_4x4(block, output, offset, stride):
+    """Inverse transforms 64 dequantized coefficients into 4 x 4 samples, as idct does into 8 x 8.
+
+    Coefficients of frequency 4 do not contribute to the reduced samples.
+    """
+    workspace = [0] * 32
+    descale = CONST_BITS - PASS1_BITS + 1
+    rounding = 1 << (descale - 1)
+
+    # Pass 1: columns, into 4 rows of 8 (column 4 is not needed)
+    for c in (0, 1, 2, 3, 5, 6, 7):
+        d0, d1, d2, d3, _, d5, d6, d7 = block[c::8]
+
+        if not (d1 or d2 or d3 or d5 or d6 or d7):
+            workspace[c::8] = [d0 << PASS1_BITS] * 4
+            continue
+
+        tmp0 = d0 << (CONST_BITS + 1)
+        tmp2 = d2 * FIX_1_847759065 - d6 * FIX_0_765366865
+        tmp10 = tmp0 + tmp2 + rounding
+        tmp12 = tmp0 - tmp2 + rounding
+
+        tmp0 = -d7 * FIX_0_211164243 + d5 * FIX_1_451774981 - d3 * FIX_2_172734803 + d1 * FIX_1_061594337
+        tmp2 = -d7 * FIX_0_509795579 - d5 * FIX_0_601344887 + d3 * FIX_0_899976223 + d1 * FIX_2_562915447
+
+        workspace[c::8] = [(tmp10 + tmp2) >> descale, (tmp12 + tmp0) >> descale, (tmp12 - tmp0) >> descale, (tmp10 - tmp2) >> descale]
+
+    # Pass 2: rows, into the output, with the level shift folded into the rounding
+    descale = CONST_BITS + PASS1_BITS + 3 + 1
+    rounding = (1 << (descale - 1)) + (128 << descale) + (384 << descale)
+
+    for r in range(4):
+        d0, d1, d2, d3, _, d5, d6, d7 = workspace[r * 8:r * 8 + 8]
+        start = offset + r * stride
+
+        if not (d1 or d2 or d3 or d5 or d6 or d7):
+            output[start:start + 4] = bytes((LIMIT[((d0 + (1 << (PASS1_BITS + 2))) >> (PASS1_BITS + 3)) + 512 & 1023],)) * 4
+            continue
+
+        tmp0 = d0 << (CONST_BITS + 1)
+        tmp2 = d2 * FIX_1_847759065 - d6 * FIX_0_765366865
+        tmp10 = tmp0 + tmp2 + rounding
+        tmp12 = tmp0 - tmp2 + rounding
+
+        tmp0 = -d7 * FIX_0_211164243 + d5 * FIX_1_451774981 - d3 * FIX_2_172734803 + d1 * FIX_1_061594337
+        tmp2 = -d7 * FIX_0_509795579 - d5 * FIX_0_601344887 + d3 * FIX_0_899976223 + d1 * FIX_2_562915447
+
+        output[start:start + 4] = bytes((LIMIT[(tmp10 + tmp2) >> descale & 1023], LIMIT[(tmp12 + tmp0) >> descale & 1023],
+                                         LIMIT[(tmp12 - tmp0) >> descale & 1023], LIMIT[(tmp10 - tmp2) >> descale & 1023]))
+
+
+def idct_2x2(block, output, offset, stride):
+    """Inverse transforms 64 dequantized coefficients into 2 x 2 samples, as idct does into 8 x 8.
+
+    Only the DC and the odd frequencies contribute to the reduced samples.
+    """
+    workspace = [0] * 16
+    descale = CONST_BITS - PASS1_BITS + 2
+    rounding = 1 << (descale - 1)
+
+    # Pass 1: columns, into 2 rows of 8 (even columns but 0 are not needed)
+    for c in (0, 1, 3, 5, 7):
+        d0, d1, _, d3, _, d5, _, d7 = block[c::8]
+
+        if not (d1 or d3 or d5 or d7):
+            workspace[c] = workspace[8 + c] = d0 << PASS1_BITS
+            continue
+
+        tmp10 = (d0 << (CONST_BITS + 2)) + rounding
+        tmp0 = -d7 * FIX_0_720959822 + d5 * FIX_0_850430095 - d3 * FIX_1_272758580 + d1 * FIX_3_624509785
+
+        workspace[c] = (tmp10 + tmp0) >> descale
+        workspace[8 + c] = (tmp10 - tmp0) >> descale
+
+    # Pass 2: rows, into the output, with the level shift folded into the rounding
+    descale = CONST_BITS + PASS1_BITS + 3 + 2
+    rounding = (1 << (descale - 1)) + (128 << descale) + (384 << descale)
+
+    for r in range(2):
+        d0, d1, _, d3, _, d5, _, d7 = workspace[r * 8:r * 8 + 8]
+        start = offset + r * stride
+
+        tmp10 = (d0 << (CONST_BITS + 2)) + rounding
+        tmp0 = -d7 * FIX_0_720959822 + d5 * FIX_0_850430095 - d3 * FIX_1_272758580 + d1 * FIX_3_624509785
+
+        output[start:start + 2] = bytes((LIMIT[(tmp10 + tmp0) >> descale & 1023], LIMIT[(tmp10 - tmp0) >> descale & 1023]))
+
+
+def fdct(samples, offset, stride):
+    """Forward transforms the 8 x 8 samples starting at offset, with rows stride bytes apart.
+
+    Samples are level shifted by 128 first.
+
+    :return:
+        64 coefficients in natural (row-major) order, scaled up by 8
+    """
+    workspace = [0] * 64
+    descale = CONST_BITS - PASS1_BITS
+    rounding = 1 << (descale - 1)
+
+    # Pass 1: rows, scaled up by PASS1_BITS; the level shift only changes the DC term
+    for r in range(8):
+        start = offset + r * stride
+        d0, d1, d2, d3, d4, d5, d6, d7 = samples[start:start + 8]
+
+        tmp0 = d0 + d7
+        tmp7 = d0 - d7
+        tmp1 = d1 + d6
+        tmp6 = d1 - d6
+        tmp2 = d2 + d5
+        tmp5 = d2 - d5
+        tmp3 = d3 + d4
+        tmp4 = d3 - d4
+
+        tmp10 = tmp0 + tmp3
+        tmp13 = tmp0 - tmp3
+        tmp11 = tmp1 + tmp2
+        tmp12 = tmp1 - tmp2
+
+        z1 = (tmp12 + tmp13) * FIX_0_541196100
+        z5 = (tmp4 + tmp5 + tmp6 + tmp7) * FIX_1_175875602
+        z1_odd = (tmp4 + tmp7) * -FIX_0_899976223
+        z2 = (tmp5 + tmp6) * -FIX_2_562915447
+        z3 = (tmp4 + tmp6) * -FIX_1_961570560 + z5
+        z4 = (tmp5 + tmp7) * -FIX_0_390180644 + z5
+
+        workspace[r * 8:r * 8 + 8] = [(tmp10 + tmp11 - 8 * 128) << PASS1_BITS,
+                                      (tmp7 * FIX_1_501321110 + z1_odd + z4 + rounding) >> descale,
+                                      (z1 + tmp13 * FIX_0_765366865 + rounding) >> descale,
+                                      (tmp6 * FIX_3_072711026 + z2 + z3 + rounding) >> descale,
+                                      (tmp10 - tmp11) << PASS1_BITS,
+                                      (tmp5 * FIX_2_053119869 + z2 + z4 + rounding) >> descale,
+                                      (z1 - tmp12 * FIX_1_847759065 + rounding) >> descale,
+                                      (tmp4 * FIX_0_298631336 + z1_odd + z3 + rounding) >> descale]
+
+    # Pass 2: columns, removing the PASS1_BITS scaling
+    descale = CONST_BITS + PASS1_BITS
+    rounding = 1 << (descale - 1)
+    even_rounding = 1 << (PASS1_BITS - 1)
+    output = [0] * 64
+
+    for c in range(8):
+        d0, d1, d2, d3, d4, d5, d6, d7 = workspace[c::8]
+
+        tmp0 = d0 + d7
+        tmp7 = d0 - d7
+        tmp1 = d1 + d6
+        tmp6 = d1 - d6
+        tmp2 = d2 + d5
+        tmp5 = d2 - d5
+        tmp3 = d3 + d4
+        tmp4 = d3 - d4
+
+        tmp10 = tmp0 + tmp3
+        tmp13 = tmp0 - tmp3
+        tmp11 = tmp1 + tmp2
+        tmp12 = tmp1 - tmp2
+
+        z1 = (tmp12 + tmp13) * FIX_0_541196100
+        z5 = (tmp4 + tmp5 + tmp6 + tmp7) * FIX_1_175875602
+        z1_odd = (tmp4 + tmp7) * -FIX_0_899976223
+        z2 = (tmp5 + tmp6) * -FIX_2_562915447
+        z3 = (tmp4 + tmp6) * -FIX_1_961570560 + z5
+        z4 = (tmp5 + tmp7) * -FIX_0_390180644 + z5
+
+        output[c::8] = [(tmp10 + tmp11 + even_rounding) >> PASS1_BITS,
+                        (tmp7 * FIX_1_501321110 + z1_odd + z4 + rounding) >> descale,
+                        (z1 + tmp13 * FIX_0_765366865 + rounding) >> descale,
+                        (tmp6 * FIX_3_072711026 + z2 + z3 + rounding) >> descale,
+                        (tmp10 - tmp11 + even_rounding) >> PASS1_BITS,
+                        (tmp5 * FIX_2_053119869 + z2 + z4 + rounding) >> descale,
+                        (z1 - tmp12 * FIX_1_847759065 + rounding) >> descale,
+                        (tmp4 * FIX_0_298631336 + z1_odd + z3 + rounding) >> descale]
+
+    return output
@@ -0,0 +1,298 @@
+"""Bit-level input and output and canonical Huffman codes, as used by JPEG.
+
+Codes are decoded with two-level lookup tables: the next LOOKAHEAD bits
+index a table giving the symbol and length of a shorter code at once, or
+for a longer code the subtable that its following bits index.
+"""
+
+import heapq
+
+# Codes up to this many bits long are decoded with a single table lookup, longer ones with two
+LOOKAHEAD = 9
+
+# Longest code length (as in JPEG)
+MAX_LENGTH = 16
+
+
+def code_lengths(frequencies, max_length=MAX_LENGTH):
+    """Code lengths of an optimal prefix code for symbols 0, 1, ... with the given frequencies, limited to max_length bits.
+
+    Huffman's algorithm gives the lengths; codes longer than max_length are
+    then shortened as in JPEG (Annex K.2), moving pairs of leaves up the tree,
+    with the symbols keeping their order of length.
+
+    :return:
+        List of the code length of every symbol, 0 for symbols of frequency 0
+    """
+    heap = [(frequency, symbol, [symbol]) for symbol, frequency in enumerate(frequencies) if frequency]
+    coded = [symbol for _, symbol, _ in heap]
+    lengths = [0] * len(frequencies)
+
+    if len(coded) > 1 << max_length:
+        raise ValueError('{} symbols do not fit in codes of up to {} bits'.format(len(coded), max_length))
+
+    if not coded:
+        return lengths
+
+    if len(coded) == 1:
+        lengths[coded[0]] = 1
+        return lengths
+
+    # Huffman's algorithm; ties are broken by the smallest symbol of each subtree
+    heapq.heapify(heap)
+
+    while len(heap) > 1:
+        frequency1, symbol1, symbols1 = heapq.heappop(heap)
+        frequency2, symbol2, symbols2 = heapq.heappop(heap)
+
+        for symbol in symbols1 + symbols2:
+            lengths[symbol] += 1
+
+        heapq.heappush(heap, (frequency1 + frequency2, min(symbol1, symbol2), symbols1 + symbols2))
+
+    counts = [0] * (max(max(lengths), max_length) + 1)
+    for symbol in coded:
+        counts[lengths[symbol]] += 1
+
+    # Shorten the longest codes: two leaves at length i move up, the prefix of one becomes a
+    # leaf at i - 1, and a leaf at a shorter length j becomes a node with two leaves at j + 1
+    for i in range(len(counts) - 1, max_length, -1):
+        while counts[i]:
+            j = i - 2
+            while not counts[j]:
+                j -= 1
+
+            counts[i] -= 2
+            counts[i - 1] += 1
+            counts[j + 1] += 2
+            counts[j] -= 1
+
+    limited = [length for length in range(1, max_length + 1) for _ in range(counts[length])]
+    for symbol, length in zip(sorted(coded, key=lambda symbol: (lengths[symbol], symbol)), limited):
+        lengths[symbol] = length
+
+    return lengths
+
+
+class HuffmanTable:
+    """Canonical Huffman code given as in a JPEG DHT segment.
+
+    Codes are assigned in order of length and, within a length, in the order
+    of the symbols, so the code is fully defined by the number of codes of
+    each length 1 - 16 and the list of symbols.
+    """
+
+    def __init__(self, counts, symbols):
+        if len(counts) > MAX_LENGTH or sum(counts) != len(symbols):
+            raise ValueError('Invalid Huffman table: {} symbols for code counts {}'.format(len(symbols), list(counts)))
+
+        self.counts = list(counts) + [0] * (MAX_LENGTH - len(counts))
+        self.symbols = list(symbols)
+
+        # lookup[next LOOKAHEAD bits] is symbol << 8 | length for a code of up to LOOKAHEAD bits,
+        # ~index of the subtable for longer codes, or 0 if the bits start no code
+        self.lookup = [0] * (1 << LOOKAHEAD)
+
+        # (bits, entries) of every subtable, indexed by the bits that follow the first LOOKAHEAD bits
+        self.subtables = []
+
+        self.codes = {}
+        long_codes = []
+        code = 0
+        i = 0
+
+        for length in range(1, MAX_LENGTH + 1):
+            count = self.counts[length - 1]
+
+            if code + count > 1 << length:
+                raise ValueError('Invalid Huffman table: too many codes of length {}'.format(length))
+
+            for symbol in self.symbols[i:i + count]:
+                self.codes[symbol] = (code, length)
+
+                if length <= LOOKAHEAD:
+                    shift = LOOKAHEAD - length
+                    entry = symbol << 8 | length
+                    for bits in range(code << shift, (code + 1) << shift):
+                        self.lookup[bits] = entry
+                else:
+                    long_codes.append((code, length, symbol))
+
+                code += 1
+
+            i += count
+            code <<= 1
+
+        # Long codes sharing their first LOOKAHEAD bits share a subtable as wide as the longest of them needs
+        widths = {}
+        for code, length, _ in long_codes:
+            prefix = code >> (length - LOOKAHEAD)
+            widths[prefix] = max(widths.get(prefix, 0), length - LOOKAHEAD)
+
+        for prefix, bits in widths.items():
+            self.lookup[prefix] = ~len(self.subtables)
+            self.subtables.append((bits, [0] * (1 << bits)))
+
+        for code, length, symbol in long_codes:
+            bits, entries = self.subtables[~self.lookup[code >> (length - LOOKAHEAD)]]
+            suffix = code & ((1 << (length - LOOKAHEAD)) - 1)
+            shift = bits - (length - LOOKAHEAD)
+            for index in range(suffix << shift, (suffix + 1) << shift):
+                entries[index] = symbol << 8 | length
+
+    @staticmethod
+    def from_lengths(lengths):
+        """Canonical code of symbols 0, 1, ... with the given code lengths (0 for symbols without a code)."""
+        counts = [0] * MAX_LENGTH
+        for length in lengths:
+            if length:
+                counts[length - 1] += 1
+
+        return HuffmanTable(counts, sorted((symbol for symbol, length in enumerate(lengths) if length), key=lambda symbol: (lengths[symbol], symbol)))
+
+    @staticmethod
+    def from_frequencies(frequencies, max_length=MAX_LENGTH):
+        """Optimal code for symbols 0, 1, ... with the given frequencies, limited to max_length bits.
+
+        As in JPEG (Annex K.2), no code consists of one bits only: a reserved
+        symbol is coded along and one of the longest codes dropped afterwards.
+        Symbols with frequency 0 get no code.
+        """
+        lengths = code_lengths(list(frequencies) + [1], max_length)
+        symbols = sorted((symbol for symbol, length in enumerate(lengths[:-1]) if length), key=lambda symbol: (lengths[symbol], symbol))
+
+        counts = [0] * MAX_LENGTH
+        for length in lengths:
+            if length:
+                counts[length - 1] += 1
+
+        if symbols:
+            counts[max(lengths) - 1] -= 1
+        else:
+            counts = [0] * MAX_LENGTH
+
+        return HuffmanTable(counts, symbols)
+
+
+class BitReader:
+    """Reads bits, most significant first, from entropy-coded data.
+
+    With stuffed, every 0xFF byte of the data is followed by a 0x00 byte
+    that is not part of the data (JPEG byte stuffing); the data must not
+    contain markers. Reading past the end yields zero bits.
+    """
+
+    def __init__(self, data, stuffed=True):
+        self.data = bytes(data).replace(b'\xff\x00', b'\xff') if stuffed else bytes(data)
+        self.position = 0
+        self.bits = 0
+        self.count = 0
+
+    def fill(self):
+        """Loads bytes so that at least 32 bits are available."""
+        while self.count < 32:
+            chunk = self.data[self.position:self.position + 6]
+            self.position += 6
+            self.bits = self.bits << 48 | int.from_bytes(chunk.ljust(6, b'\x00'), byteorder='big')
+            self.count += 48
+
+    def peek(self, n):
+        if self.count < n:
+            self.fill()
+        return self.bits >> (self.count - n)
+
+    def skip(self, n):
+        self.count -= n
+        self.bits &= (1 << self.count) - 1
+
+    def read(self, n):
+        if self.count < n:
+            self.fill()
+        self.count -= n
+        value = self.bits >> self.count
+        self.bits &= (1 << self.count) - 1
+        return value
+
+    def receive_extend(self, n):
+        """Reads an n-bit JPEG magnitude category value as a signed number."""
+        if not n:
+            return 0
+        if self.count < n:
+            self.fill()
+        self.count -= n
+        value = self.bits >> self.count
+        self.bits &= (1 << self.count) - 1
+        return value if value >> (n - 1) else value - (1 << n) + 1
+
+    def decode(self, table):
+        """Reads one Huffman-coded symbol."""
+        if self.count < MAX_LENGTH:
+            self.fill()
+
+        entry = table.lookup[self.bits >> (self.count - LOOKAHEAD)]
+
+        if entry <= 0:
+            if not entry:
+                raise ValueError('Invalid Huffman code')
+
+            # Longer code: its following bits index a subtable
+            bits, entries = table.subtables[~entry]
+            entry = entries[self.bits >> (self.count - LOOKAHEAD - bits) & (1 << bits) - 1]
+
+            if not entry:
+                raise ValueError('Invalid Huffman code')
+
+        self.count -= entry & 0xff
+        self.bits &= (1 << self.count) - 1
+        return entry >> 8
+
+    def align(self):
+        """Skips the bits remaining in the current byte."""
+        self.skip(self.count % 8)
+
+
+class BitWriter:
+    """Writes bits, most significant first, into a buffer of bytes.
+
+    With stuffed, a 0x00 byte is inserted after every 0xFF byte (JPEG byte
+    stuffing), so that the data contains no markers.
+    """
+
+    def __init__(self, stuffed=True):
+        self.stuffed = stuffed
+        self.data = bytearray()
+        self.bits = 0
+        self.count = 0
+
+    def write(self, value, length):
+        """Appends the length least significant bits of value, which must have no higher bits set."""
+        self.bits = self.bits << length | value
+        self.count += length
+
+        if self.count >= 48:
+            self.count -= 48
+            chunk = (self.bits >> self.count).to_bytes(6, byteorder='big')
+            self.bits &= (1 << self.count) - 1
+            self.data += chunk.replace(b'\xff', b'\xff\x00') if self.stuffed and b'\xff' in chunk else chunk
+
+    def encode(self, table, symbol):
+        """Writes the Huffman code of a symbol."""
+        code, length = table.codes[symbol]
+        self.write(code, length)
+
+    def align(self, padding=1):
+        """Fills the current byte with padding bits (one bits, as JPEG requires, by default) and flushes all bits."""
+        if self.count % 8:
+            fill = 8 - self.count % 8
+            self.write((1 << fill) - 1 if padding else 0, fill)
+
+        chunk = self.bits.to_bytes(self.count // 8, byteorder='big')
+        self.data += chunk.replace(b'\xff', b'\xff\x00') if self.stuffed else chunk
+        self.bits = 0
+        self.count = 0
+
+    def take(self):
+        """Returns and removes the complete bytes written so far."""
+        data = bytes(self.data)
+        self.data.clear()
+        return data
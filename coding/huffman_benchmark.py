@@ -0,0 +1,83 @@
+# Measures the throughput of the bit I/O and Huffman coding of coding/huffman.py, in MB of 8-bit symbols per second
+#
+# > python -m coding.huffman_benchmark
+# > python -m coding.huffman_benchmark --size 4 --skew 0.5 --max-length 12 --unstuffed
+import random
+import time
+
+from coding.huffman import LOOKAHEAD, BitReader, BitWriter, HuffmanTable, code_lengths
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def write_bits(symbols, stuffed):
+    writer = BitWriter(stuffed)
+    for symbol in symbols:
+        writer.write(symbol, 8)
+    writer.align()
+    return writer.take()
+
+
+def read_bits(data, count, stuffed):
+    reader = BitReader(data, stuffed)
+    return [reader.read(8) for _ in range(count)]
+
+
+def encode(symbols, table, stuffed):
+    writer = BitWriter(stuffed)
+    for symbol in symbols:
+        writer.encode(table, symbol)
+    writer.align()
+    return writer.take()
+
+
+def decode(data, count, table, stuffed):
+    reader = BitReader(data, stuffed)
+    return [reader.decode(table) for _ in range(count)]
+
+
+def benchmark(size, skew, max_length, stuffed):
+    # Symbol frequencies falling off as 1 / rank ** skew, as in typical entropy-coded data
+    weights = [1 / (rank + 1) ** skew for rank in range(256)]
+    symbols = random.choices(range(256), weights, k=int(size * (1 << 20)))
+
+    frequencies = [0] * 256
+    for symbol in symbols:
+        frequencies[symbol] += 1
+
+    seconds, lengths = measure(code_lengths, frequencies, max_length)
+    table = HuffmanTable.from_lengths(lengths)
+    bits = sum(frequencies[symbol] * length for symbol, length in enumerate(lengths))
+    long_codes = sum(frequencies[symbol] for symbol, length in enumerate(lengths) if length > LOOKAHEAD)
+
+    print('{} symbols, {:.2f} bits per symbol, {:.1%} of codes over {} bits, code built in {:.1f} ms'.format(
+        len(symbols), bits / len(symbols), long_codes / len(symbols), LOOKAHEAD, seconds * 1000))
+
+    megabytes = len(symbols) / (1 << 20)
+    write_time, data = measure(write_bits, symbols, stuffed)
+    read_time, result = measure(read_bits, data, len(symbols), stuffed)
+    assert result == symbols
+
+    encode_time, data = measure(encode, symbols, table, stuffed)
+    decode_time, result = measure(decode, data, len(symbols), table, stuffed)
+    assert result == symbols
+
+    for name, seconds in (('write 8 bits', write_time), ('read 8 bits', read_time), ('huffman encode', encode_time), ('huffman decode', decode_time)):
+        print('{:<16} {:8.2f} MB/s'.format(name, megabytes / seconds))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Benchmark bit I/O and Huffman coding')
+    parser.add_argument('--size', dest='size', type=float, default=1, help='MB of symbols')
+    parser.add_argument('--skew', dest='skew', type=float, default=1, help='exponent of the symbol frequency falloff')
+    parser.add_argument('--max-length', dest='max_length', type=int, default=16, help='longest code length')
+    parser.add_argument('--unstuffed', dest='stuffed', action='store_false', help='without JPEG byte stuffing')
+
+    args = parser.parse_args()
+    benchmark(args.size, args.skew, args.max_length, args.stuffed)
@@ -0,0 +1,92 @@
+from coding.huffman import BitReader, BitWriter, HuffmanTable, code_lengths
+from unittest import TestCase
+
+
+def encode(table, symbols):
+    """Huffman-codes symbols into JPEG byte-stuffed data, padding with one bits."""
+    bits = ''.join(format(code, '0{}b'.format(length)) for code, length in (table.codes[symbol] for symbol in symbols))
+    bits += '1' * (-len(bits) % 8)
+    data = bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
+    return data.replace(b'\xff', b'\xff\x00')
+
+
+class HuffmanTableTest(TestCase):
+
+    def setUp(self):
+        # One code of each length 1 - 12, the longer ones past the lookahead table
+        self.table = HuffmanTable([1] * 12 + [0] * 4, range(0x10, 0xd0, 0x10))
+
+    def test_canonical_codes(self):
+        self.assertEqual((0b0, 1), self.table.codes[0x10])
+        self.assertEqual((0b10, 2), self.table.codes[0x20])
+        self.assertEqual((0b111111111110, 12), self.table.codes[0xc0])
+
+    def test_decode(self):
+        symbols = [0xb0, 0xc0, 0x10, 0x30, 0xc0, 0xc0, 0x20, 0x90, 0x10]
+        reader = BitReader(encode(self.table, symbols))
+        self.assertEqual(symbols, [reader.decode(self.table) for _ in symbols])
+
+    def test_receive_extend(self):
+        reader = BitReader(bytes((0b01111100,)))
+        self.assertEqual(-8, reader.receive_extend(4))
+        self.assertEqual(0, reader.receive_extend(0))
+        self.assertEqual(3, reader.receive_extend(2))
+
+    def test_invalid_code(self):
+        # The 12 one bits start no code
+        reader = BitReader(encode(self.table, [0x10]) + b'\xff\x00\xff\x00')
+        self.assertEqual(0x10, reader.decode(self.table))
+
+        with self.assertRaises(ValueError):
+            reader.decode(self.table)
+
+    def test_invalid_table(self):
+        with self.assertRaises(ValueError):
+            HuffmanTable([3] + [0] * 15, [1, 2, 3])
+
+    def test_from_frequencies(self):
+        # Fibonacci frequencies make the optimal code lengths exceed 16 bits
+        frequencies = [0] * 256
+        a, b = 1, 1
+        for symbol in range(30):
+            frequencies[symbol] = a
+            a, b = b, a + b
+
+        table = HuffmanTable.from_frequencies(frequencies)
+        lengths = {symbol: length for symbol, (_, length) in table.codes.items()}
+
+        self.assertEqual(set(range(30)), set(lengths))
+        self.assertLessEqual(max(lengths.values()), 16)
+        self.assertLessEqual(lengths[29], lengths[0])
+        self.assertNotIn((1 << 16) - 1, [code for code, length in table.codes.values() if length == 16])
+
+    def test_code_lengths(self):
+        frequencies = [0] * 40
+        a, b = 1, 1
+        for symbol in range(0, 40, 2):
+            frequencies[symbol] = a
+            a, b = b, a + b
+
+        lengths = code_lengths(frequencies, max_length=12)
+        self.assertEqual([0] * 20, lengths[1::2])
+        self.assertLessEqual(max(lengths), 12)
+        self.assertEqual(1, sum(2 ** -length for length in lengths if length))
+        self.assertEqual([], code_lengths([]))
+        self.assertEqual([0, 0], code_lengths([0, 0]))
+
+        # Two levels of lookup for the codes over 9 bits
+        table = HuffmanTable.from_lengths(lengths)
+        symbols = list(range(0, 40, 2)) * 3
+        reader = BitReader(encode(table, symbols))
+        self.assertEqual(symbols, [reader.decode(table) for _ in symbols])
+
+
+class BitWriterTest(TestCase):
+
+    def test_stuffing(self):
+        writer = BitWriter()
+        writer.write(0xff, 8)
+        writer.write(0b101, 3)
+        writer.align()
+        self.assertEqual(b'\xff\x00\xbf', writer.take())
+        self.assertEqual(b'', writer.take())
@@ -1,47 +1,82 @@
-import math
+from array import array
 
-from matrix import Matrix
+from matrix import Matrix, MatrixColumn, array_interface
 
 
 class GrayscaleMatrix(Matrix):
+    """Matrix of gray values stored row by row in a flat array.
+
+    Integer matrices hold bytes (0 - 255), float matrices hold doubles (0.0 - 1.0).
+    """
 
     def __init__(self, width, height, value_type=int):
         super().__init__(width, height)
-        x = 0 if value_type is int else 0.0
-        self.values = [[x] * height for _ in range(width)]
+        typecode = 'B' if value_type is int else 'd'
+        self.values = array(typecode, bytes(width * height * array(typecode).itemsize))
         self.value_type = value_type
 
     def apply_to(self, image):
-        for x, y in image.coordinates:
-            gray = self.values[x][y] if self.value_type is int else int(self.values[x][y] * 255)
-            image.reds[x][y] = image.greens[x][y] = image.blues[x][y] = gray
+        values = self.values if self.value_type is int else bytes(int(value * 255) for value in self.values)
+        for channel in (image.RED, image.GREEN, image.BLUE):
+            image.set_channel(channel, values)
 
     def luminance(self, x, y):
-        return self.values[x][y] / 255 if self.value_type is int else self.values[x][y]
+        value = self.values[y * self.width + x]
+        return value / 255 if self.value_type is int else value
 
     def set_luminance(self, x, y, value):
-        self.values[x][y] = int(value * 255) if self.value_type is int else value
+        self.values[y * self.width + x] = int(value * 255) if self.value_type is int else value
+
+    def edge_values(self):
+        return min(self.values), max(self.values)
+
+    def memoryview(self):
+        return memoryview(self.values).cast('B').cast(self.values.typecode, (self.height, self.width))
+
+    @property
+    def __array_interface__(self):
+        return array_interface(self.values, (self.height, self.width))
 
     @staticmethod
     def from_image(image, value_type=int):
         matrix = GrayscaleMatrix(image.width, image.height, value_type)
+        grays = gray_plane(image.get_channel(image.RED), image.get_channel(image.GREEN), image.get_channel(image.BLUE))
 
-        for x, y in image.coordinates:
-            red = image.reds[x][y]
-            green = image.greens[x][y]
-            blue = image.blues[x][y]
-
-            gray = gray_from_rgb(red, green, blue)
-            matrix.values[x][y] = gray if value_type is int else gray / 255
+        if value_type is int:
+            matrix.values = array('B', grays)
+        else:
+            matrix.values = array('d', [gray / 255 for gray in grays])
 
         return matrix
 
     def __getitem__(self, x):
-        return self.values[x]
+        return MatrixColumn(self.values, self.width, x)
+
+
+WEIGHT_BITS = 16
+
+
+def luma_weights(weight, bias=0):
+    """Fixed-point table of weight * value for every 8-bit value, scaled by 2 ** WEIGHT_BITS."""
+    return [int(weight * value * (1 << WEIGHT_BITS) + 0.5) + bias for value in range(256)]
+
+
+# Each table entry is off by at most half a unit, so a bias of 2 units makes the
+# truncated sum equal the floor of the exact 0.299 R + 0.587 G + 0.114 B.
+RED_WEIGHTS = luma_weights(0.299, bias=2)
+GREEN_WEIGHTS = luma_weights(0.587)
+BLUE_WEIGHTS = luma_weights(0.114)
 
 
 def gray_from_rgb(red, green, blue):
-    return math.floor(0.299 * red + 0.587 * green + 0.114 * blue)
+    return (RED_WEIGHTS[red] + GREEN_WEIGHTS[green] + BLUE_WEIGHTS[blue]) >> WEIGHT_BITS
+
+
+def gray_plane(reds, greens, blues, weights=(RED_WEIGHTS, GREEN_WEIGHTS, BLUE_WEIGHTS)):
+    """Mixes whole channel planes into gray values using fixed-point weight tables."""
+    red_weights, green_weights, blue_weights = weights
+    return bytes([(red_weights[red] + green_weights[green] + blue_weights[blue]) >> WEIGHT_BITS
+                  for red, green, blue in zip(reds, greens, blues)])
 
 
 if __name__ == '__main__':
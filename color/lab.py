@@ -1,4 +1,7 @@
-from matrix import MatrixIterator
+from array import array
+from bisect import bisect_right
+
+from matrix import MatrixIterator, MatrixView, array_interface
 
 
 class LabColor:
@@ -71,22 +74,48 @@ class LabColor:
 
 
 class LabMatrix:
+    """L*, a* and b* planes of an image, stored one after another in a single array of doubles.
+
+    Each plane is a flat, row-major view (`l_values`, `a_values`, `b_values`):
+    the value for (x, y) is at index y * width + x. `l`, `a` and `b` allow
+    `matrix.l[x][y]` style indexing into the planes.
+    """
 
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.l = [[0] * height for _ in range(width)]
-        self.a = [[0] * height for _ in range(width)]
-        self.b = [[0] * height for _ in range(width)]
+        self.values = array('d', bytes(3 * width * height * array('d').itemsize))
+
+        planes = memoryview(self.values)
+        size = width * height
+        self.l_values = planes[0:size]
+        self.a_values = planes[size:2 * size]
+        self.b_values = planes[2 * size:3 * size]
+
+    @property
+    def l(self):
+        return MatrixView(self.l_values, self.width)
+
+    @property
+    def a(self):
+        return MatrixView(self.a_values, self.width)
+
+    @property
+    def b(self):
+        return MatrixView(self.b_values, self.width)
 
     def apply_to(self, image):
-        from color.rgb import RgbColor
+        reds, greens, blues = lab_to_rgb(self.l_values, self.a_values, self.b_values)
+        image.set_channel(image.RED, reds)
+        image.set_channel(image.GREEN, greens)
+        image.set_channel(image.BLUE, blues)
 
-        for x, y in self:
-            rgb = RgbColor.from_lab(self.l[x][y], self.a[x][y], self.b[x][y])
-            image.reds[x][y] = rgb.red
-            image.greens[x][y] = rgb.green
-            image.blues[x][y] = rgb.blue
+    def memoryview(self):
+        return memoryview(self.values).cast('B').cast('d', (3, self.height, self.width))
+
+    @property
+    def __array_interface__(self):
+        return array_interface(self.values, (3, self.height, self.width))
 
     def __iter__(self):
         return MatrixIterator(self)
@@ -94,14 +123,87 @@ class LabMatrix:
     @staticmethod
     def from_image(image):
         matrix = LabMatrix(image.width, image.height)
-        for x, y in image.coordinates:
-            lab_color = LabColor.from_rgb(image.reds[x][y], image.greens[x][y], image.blues[x][y])
-            matrix.l[x][y] = lab_color.l
-            matrix.a[x][y] = lab_color.a
-            matrix.b[x][y] = lab_color.b
+        l, a, b = rgb_to_lab(image.get_channel(image.RED), image.get_channel(image.GREEN), image.get_channel(image.BLUE))
+        matrix.l_values[:] = l
+        matrix.a_values[:] = a
+        matrix.b_values[:] = b
         return matrix
 
 
+def decompand(value):
+    """Linear light of an sRGB value between 0.0 and 1.0."""
+    return pow((value + 0.055) / 1.055, 2.4) if value > 0.04045 else value / 12.92
+
+
+# Contribution of each 8-bit sRGB channel value to X / Xn, Y / Yn and Z / Zn (D65)
+X_TABLES = [[decompand(v / 255) * weight * 100 / 95.047 for v in range(256)] for weight in (0.4124, 0.3576, 0.1805)]
+Y_TABLES = [[decompand(v / 255) * weight for v in range(256)] for weight in (0.2126, 0.7152, 0.0722)]
+Z_TABLES = [[decompand(v / 255) * weight * 100 / 108.883 for v in range(256)] for weight in (0.0193, 0.1192, 0.9505)]
+
+# Linear light values from which a channel becomes 1, 2, ... 255 after companding
+# and truncation to 8 bits; the channel value is the number of thresholds below it.
+THRESHOLDS = [decompand(value / 255) for value in range(1, 256)]
+
+
+def rgb_to_lab(reds, greens, blues):
+    """Converts whole planes of 8-bit sRGB values to CIELAB.
+
+    :return:
+        (l, a, b) arrays of doubles
+    """
+    xr, xg, xb = X_TABLES
+    yr, yg, yb = Y_TABLES
+    zr, zg, zb = Z_TABLES
+    ls = array('d')
+    as_ = array('d')
+    bs = array('d')
+
+    for red, green, blue in zip(reds, greens, blues):
+        x = xr[red] + xg[green] + xb[blue]
+        y = yr[red] + yg[green] + yb[blue]
+        z = zr[red] + zg[green] + zb[blue]
+
+        x = x ** (1 / 3) if x > 0.008856 else 7.787 * x + 16 / 116
+        y = y ** (1 / 3) if y > 0.008856 else 7.787 * y + 16 / 116
+        z = z ** (1 / 3) if z > 0.008856 else 7.787 * z + 16 / 116
+
+        ls.append(116 * y - 16)
+        as_.append(500 * (x - y))
+        bs.append(200 * (y - z))
+
+    return ls, as_, bs
+
+
+def lab_to_rgb(ls, as_, bs):
+    """Converts whole planes of CIELAB values to 8-bit sRGB, clamping colors out of gamut.
+
+    :return:
+        (reds, greens, blues) as bytes
+    """
+    reds = bytearray()
+    greens = bytearray()
+    blues = bytearray()
+    thresholds = THRESHOLDS
+
+    for l, a, b in zip(ls, as_, bs):
+        y = (l + 16) / 116
+        x = a / 500 + y
+        z = y - b / 200
+
+        x = x * x * x if x * x * x > 0.008856 else (x - 16 / 116) / 7.787
+        y = y * y * y if y * y * y > 0.008856 else (y - 16 / 116) / 7.787
+        z = z * z * z if z * z * z > 0.008856 else (z - 16 / 116) / 7.787
+
+        x *= 0.95047
+        z *= 1.08883
+
+        reds.append(bisect_right(thresholds, x * 3.2406 + y * -1.5372 + z * -0.4986))
+        greens.append(bisect_right(thresholds, x * -0.9689 + y * 1.8758 + z * 0.0415))
+        blues.append(bisect_right(thresholds, x * 0.0557 + y * -0.2040 + z * 1.0570))
+
+    return bytes(reds), bytes(greens), bytes(blues)
+
+
 if __name__ == '__main__':
     import sys
     from color.rgb import RgbColor
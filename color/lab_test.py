@@ -0,0 +1,34 @@
+from color.lab import LabColor, lab_to_rgb, rgb_to_lab
+from color.rgb import RgbColor
+from unittest import TestCase
+
+
+class LabPlanesTest(TestCase):
+
+    def setUp(self):
+        # Every channel value, in different combinations
+        self.reds = bytes(range(256))
+        self.greens = bytes((value * 7) % 256 for value in range(256))
+        self.blues = bytes((value * 131 + 17) % 256 for value in range(256))
+
+    def test_rgb_to_lab(self):
+        ls, as_, bs = rgb_to_lab(self.reds, self.greens, self.blues)
+
+        for i, rgb in enumerate(zip(self.reds, self.greens, self.blues)):
+            color = LabColor.from_rgb(*rgb)
+            self.assertAlmostEqual(color.l, ls[i], places=9)
+            self.assertAlmostEqual(color.a, as_[i], places=9)
+            self.assertAlmostEqual(color.b, bs[i], places=9)
+
+    def test_lab_to_rgb(self):
+        planes = rgb_to_lab(self.reds, self.greens, self.blues)
+        reds, greens, blues = lab_to_rgb(*planes)
+
+        for i, lab in enumerate(zip(*planes)):
+            color = RgbColor.from_lab(*lab)
+            self.assertEqual((color.red, color.green, color.blue), (reds[i], greens[i], blues[i]))
+
+    def test_round_trip(self):
+        # Channels are truncated to 8 bits, as by RgbColor, so they may come back one lower
+        for expected, actual in zip((self.reds, self.greens, self.blues), lab_to_rgb(*rgb_to_lab(self.reds, self.greens, self.blues))):
+            self.assertTrue(all(0 <= a - b <= 1 for a, b in zip(expected, actual)))
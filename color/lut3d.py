@@ -0,0 +1,236 @@
+from array import array
+
+
+class Lut3D:
+    """Three-dimensional color lookup table.
+
+    Holds the result of an RGB -> RGB transform sampled on a size x size x size
+    grid spanning the input domain, domain_min .. domain_max per channel (0.0 .. 1.0
+    unless a .cube file sets another). Entry (r, g, b) is stored at index
+    r + size * (g + size * b) (red changing fastest, as in .cube files) of the reds,
+    greens and blues arrays. Colors between grid points are interpolated tetrahedrally;
+    colors outside the domain take the value of its nearest edge.
+    """
+
+    def __init__(self, size=33):
+        if size < 2:
+            raise ValueError('LUT size must be at least 2. Got {}.'.format(size))
+
+        self.size = size
+        self.title = None
+        self.domain_min = (0.0, 0.0, 0.0)
+        self.domain_max = (1.0, 1.0, 1.0)
+        count = size * size * size
+        self.reds = array('d', bytes(count * 8))
+        self.greens = array('d', bytes(count * 8))
+        self.blues = array('d', bytes(count * 8))
+
+    def index(self, r, g, b):
+        return r + self.size * (g + self.size * b)
+
+    def get(self, r, g, b):
+        i = self.index(r, g, b)
+        return self.reds[i], self.greens[i], self.blues[i]
+
+    def set(self, r, g, b, color):
+        i = self.index(r, g, b)
+        self.reds[i], self.greens[i], self.blues[i] = color
+
+    @staticmethod
+    def identity(size=33):
+        return Lut3D.from_function(lambda r, g, b: (r, g, b), size)
+
+    @staticmethod
+    def from_function(function, size=33):
+        """Bakes function(r, g, b) -> (r, g, b), with components between 0.0 and 1.0, into a LUT."""
+        lut = Lut3D(size)
+        steps = [i / (size - 1) for i in range(size)]
+
+        for b in range(size):
+            for g in range(size):
+                for r in range(size):
+                    lut.set(r, g, b, function(steps[r], steps[g], steps[b]))
+
+        return lut
+
+    @staticmethod
+    def from_lab_function(function, size=33):
+        """Bakes function(l, a, b) -> (l, a, b), an edit in CIELAB, into a LUT."""
+        from color.lab import LabColor
+        from color.rgb import srgb_from_lab
+
+        def transform(r, g, b):
+            lab = LabColor.from_rgb(r * 255, g * 255, b * 255)
+            return srgb_from_lab(*function(lab.l, lab.a, lab.b))
+
+        return Lut3D.from_function(transform, size)
+
+    @staticmethod
+    def from_cube(text):
+        """Parses a LUT in the .cube format (Adobe / Resolve) from its text."""
+        lut = None
+        title = None
+        domain_min = (0.0, 0.0, 0.0)
+        domain_max = (1.0, 1.0, 1.0)
+        i = 0
+
+        for line in text.splitlines():
+            line = line.strip()
+
+            if not line or line.startswith('#'):
+                continue
+
+            keyword, value = (line.split(None, 1) + [''])[:2]
+
+            if keyword == 'TITLE':
+                title = value.strip().strip('"')
+            elif keyword == 'LUT_3D_SIZE':
+                lut = Lut3D(int(value))
+            elif keyword == 'DOMAIN_MIN':
+                domain_min = tuple(float(n) for n in value.split())
+            elif keyword == 'DOMAIN_MAX':
+                domain_max = tuple(float(n) for n in value.split())
+            elif keyword in ('LUT_1D_SIZE', 'LUT_1D_INPUT_RANGE'):
+                raise ValueError('1D LUTs are not supported')
+            elif keyword == 'LUT_3D_INPUT_RANGE':
+                low, high = (float(n) for n in value.split())
+                domain_min = (low, low, low)
+                domain_max = (high, high, high)
+            else:
+                if lut is None:
+                    raise ValueError('LUT_3D_SIZE must precede the table data')
+
+                if i >= len(lut.reds):
+                    raise ValueError('Too many entries in a LUT of size {}'.format(lut.size))
+
+                lut.reds[i], lut.greens[i], lut.blues[i] = (float(n) for n in line.split())
+                i += 1
+
+        if lut is None or i != len(lut.reds):
+            raise ValueError('Incomplete LUT: expected {} entries, got {}'.format(len(lut.reds) if lut else '?', i))
+
+        if len(domain_min) != 3 or len(domain_max) != 3 or any(low >= high for low, high in zip(domain_min, domain_max)):
+            raise ValueError('Invalid LUT domain: {} - {}'.format(domain_min, domain_max))
+
+        lut.title = title
+        lut.domain_min = domain_min
+        lut.domain_max = domain_max
+        return lut
+
+    def to_cube(self):
+        lines = []
+
+        if self.title:
+            lines.append('TITLE "{}"'.format(self.title))
+
+        lines.append('LUT_3D_SIZE {}'.format(self.size))
+
+        if self.domain_min != (0.0, 0.0, 0.0) or self.domain_max != (1.0, 1.0, 1.0):
+            lines.append('DOMAIN_MIN {:.6f} {:.6f} {:.6f}'.format(*self.domain_min))
+            lines.append('DOMAIN_MAX {:.6f} {:.6f} {:.6f}'.format(*self.domain_max))
+
+        for red, green, blue in zip(self.reds, self.greens, self.blues):
+            lines.append('{:.6f} {:.6f} {:.6f}'.format(red, green, blue))
+
+        return '\n'.join(lines) + '\n'
+
+    def apply(self, image):
+        """Applies the LUT to all pixels of the image (alpha is kept)."""
+        reds, greens, blues = self.transform(image.get_channel(image.RED), image.get_channel(image.GREEN), image.get_channel(image.BLUE))
+        image.set_channel(image.RED, reds)
+        image.set_channel(image.GREEN, greens)
+        image.set_channel(image.BLUE, blues)
+
+    def transform(self, reds, greens, blues):
+        """Transforms planes of 8-bit values using tetrahedral interpolation.
+
+        :return:
+            (reds, greens, blues) as bytes
+        """
+        size = self.size
+        r_step = 1
+        g_step = size
+        b_step = size * size
+
+        # Grid cell and position within it for every 8-bit value of each channel,
+        # after mapping the value (as 0.0 .. 1.0) into the domain of the grid
+        cells = ([], [], [])
+        fractions = ([], [], [])
+        for low, high, channel_cells, channel_fractions in zip(self.domain_min, self.domain_max, cells, fractions):
+            for value in range(256):
+                position = (value / 255 - low) / (high - low) * (size - 1)
+                position = 0.0 if position < 0 else size - 1.0 if position > size - 1 else position
+                cell = min(int(position), size - 2)
+                channel_cells.append(cell)
+                channel_fractions.append(position - cell)
+
+        red_cells, green_cells, blue_cells = cells
+        red_fractions, green_fractions, blue_fractions = fractions
+
+        red_table = self.reds
+        green_table = self.greens
+        blue_table = self.blues
+        outputs = (bytearray(len(reds)), bytearray(len(reds)), bytearray(len(reds)))
+
+        for i, (red, green, blue) in enumerate(zip(reds, greens, blues)):
+            fr = red_fractions[red]
+            fg = green_fractions[green]
+            fb = blue_fractions[blue]
+
+            c0 = red_cells[red] * r_step + green_cells[green] * g_step + blue_cells[blue] * b_step
+            c3 = c0 + r_step + g_step + b_step
+
+            # The tetrahedron containing the color is chosen by the order of the fractions;
+            # its corners c0, c1, c2, c3 are weighted by 1 - f1, f1 - f2, f2 - f3 and f3.
+            if fr > fg:
+                if fg > fb:
+                    c1, c2, f1, f2, f3 = c0 + r_step, c0 + r_step + g_step, fr, fg, fb
+                elif fr > fb:
+                    c1, c2, f1, f2, f3 = c0 + r_step, c0 + r_step + b_step, fr, fb, fg
+                else:
+                    c1, c2, f1, f2, f3 = c0 + b_step, c0 + b_step + r_step, fb, fr, fg
+            else:
+                if fb > fg:
+                    c1, c2, f1, f2, f3 = c0 + b_step, c0 + b_step + g_step, fb, fg, fr
+                elif fb > fr:
+                    c1, c2, f1, f2, f3 = c0 + g_step, c0 + g_step + b_step, fg, fb, fr
+                else:
+                    c1, c2, f1, f2, f3 = c0 + g_step, c0 + g_step + r_step, fg, fr, fb
+
+            w0 = (1 - f1) * 255
+            w1 = (f1 - f2) * 255
+            w2 = (f2 - f3) * 255
+            w3 = f3 * 255
+
+            for table, output in zip((red_table, green_table, blue_table), outputs):
+                value = int(table[c0] * w0 + table[c1] * w1 + table[c2] * w2 + table[c3] * w3 + 0.5)
+                output[i] = 0 if value < 0 else 255 if value > 255 else value
+
+        return tuple(bytes(output) for output in outputs)
+
+
+def read(path):
+    with open(path) as file:
+        return Lut3D.from_cube(file.read())
+
+
+def write(lut, path):
+    with open(path, 'w') as file:
+        file.write(lut.to_cube())
+
+
+if __name__ == '__main__':
+    import imageio
+
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Apply a 3D color lookup table (.cube) to an image')
+    parser.add_argument('input_file', metavar='image', help='image to be graded')
+    parser.add_argument('lut_file', metavar='lut', help='.cube file')
+    parser.add_argument('-o', '--out', dest='output_file', nargs='?', help='output file (default: overwrite the input)')
+
+    args = parser.parse_args()
+
+    image = imageio.read(args.input_file)
+    read(args.lut_file).apply(image)
+    imageio.write(image, args.output_file or args.input_file)
@@ -0,0 +1,43 @@
+from color.lut3d import Lut3D
+from image import Image
+from unittest import TestCase
+
+
+class Lut3DTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(3, 1)
+        self.image.set_argb(0, 0, 0x00ff9900)
+        self.image.set_argb(1, 0, 0x80123456)
+        self.image.set_argb(2, 0, 0x00010203)
+
+    def test_identity(self):
+        expected = bytes(self.image.pixels)
+        Lut3D.identity(5).apply(self.image)
+        self.assertEqual(expected, self.image.pixels)
+
+    def test_linear_transform_is_exact(self):
+        Lut3D.from_function(lambda r, g, b: (1 - r, b, g), 3).apply(self.image)
+        self.assertEqual(0x00000099, self.image.get_argb(0, 0))
+        self.assertEqual(0x80ed5634, self.image.get_argb(1, 0))
+
+    def test_cube_round_trip(self):
+        lut = Lut3D.from_function(lambda r, g, b: (r * r, g, 0.5), 4)
+        lut.title = 'Test'
+        parsed = Lut3D.from_cube(lut.to_cube())
+
+        self.assertEqual('Test', parsed.title)
+        self.assertEqual(4, parsed.size)
+        for expected, actual in zip(lut.reds, parsed.reds):
+            self.assertAlmostEqual(expected, actual, places=6)
+
+    def test_cube_domain(self):
+        # An identity table over inputs 0 .. 2 halves colors; the table values are kept
+        table = ''.join('{} {} {}\n'.format(r, g, b) for b in (0, 1) for g in (0, 1) for r in (0, 1))
+        lut = Lut3D.from_cube('LUT_3D_SIZE 2\nDOMAIN_MIN 0 0 0\nDOMAIN_MAX\t2 2 2\n' + table)
+
+        self.assertEqual((1.0, 1.0, 1.0), lut.get(1, 1, 1))
+        self.assertEqual((2.0, 2.0, 2.0), Lut3D.from_cube(lut.to_cube()).domain_max)
+
+        lut.apply(self.image)
+        self.assertEqual(0x00804d00, self.image.get_argb(0, 0))
@@ -53,35 +53,40 @@ class RgbColor:
 
     @staticmethod
     def from_lab(l, a, b):
-        y = (l + 16) / 116.0
-        x = a / 500.0 + y
-        z = y - b / 200.0
+        return RgbColor(*srgb_from_lab(l, a, b))
 
-        x = pow(x, 3) if pow(x, 3) > 0.008856 else (x - 16.0 / 116) / 7.787
-        y = pow(y, 3) if pow(y, 3) > 0.008856 else (y - 16.0 / 116) / 7.787
-        z = pow(z, 3) if pow(z, 3) > 0.008856 else (z - 16.0 / 116) / 7.787
 
-        x *= 95.047
-        y *= 100
-        z *= 108.883
+def srgb_from_lab(l, a, b):
+    """Converts CIELAB to sRGB components between 0.0 and 1.0, clamping colors out of gamut."""
+    y = (l + 16) / 116.0
+    x = a / 500.0 + y
+    z = y - b / 200.0
 
-        x = x / 100
-        y = y / 100
-        z = z / 100
+    x = pow(x, 3) if pow(x, 3) > 0.008856 else (x - 16.0 / 116) / 7.787
+    y = pow(y, 3) if pow(y, 3) > 0.008856 else (y - 16.0 / 116) / 7.787
+    z = pow(z, 3) if pow(z, 3) > 0.008856 else (z - 16.0 / 116) / 7.787
 
-        r = x * 3.2406 + y * -1.5372 + z * -0.4986
-        g = x * -0.9689 + y * 1.8758 + z * 0.0415
-        b = x * 0.0557 + y * -0.2040 + z * 1.0570
+    x *= 95.047
+    y *= 100
+    z *= 108.883
 
-        r = 1.055 * pow(r, 1 / 2.4) - 0.055 if r > 0.0031308 else 12.92 * r
-        g = 1.055 * pow(g, 1 / 2.4) - 0.055 if g > 0.0031308 else 12.92 * g
-        b = 1.055 * pow(b, 1 / 2.4) - 0.055 if b > 0.0031308 else 12.92 * b
+    x = x / 100
+    y = y / 100
+    z = z / 100
 
-        r = max(0.0, min(r, 1.0))
-        g = max(0.0, min(g, 1.0))
-        b = max(0.0, min(b, 1.0))
+    r = x * 3.2406 + y * -1.5372 + z * -0.4986
+    g = x * -0.9689 + y * 1.8758 + z * 0.0415
+    b = x * 0.0557 + y * -0.2040 + z * 1.0570
 
-        return RgbColor(r, g, b)
+    r = 1.055 * pow(r, 1 / 2.4) - 0.055 if r > 0.0031308 else 12.92 * r
+    g = 1.055 * pow(g, 1 / 2.4) - 0.055 if g > 0.0031308 else 12.92 * g
+    b = 1.055 * pow(b, 1 / 2.4) - 0.055 if b > 0.0031308 else 12.92 * b
+
+    r = max(0.0, min(r, 1.0))
+    g = max(0.0, min(g, 1.0))
+    b = max(0.0, min(b, 1.0))
+
+    return r, g, b
 
 
 if __name__ == '__main__':
@@ -1,5 +1,11 @@
+import io
+import mmap
+
+from format.info import ImageInfo
 from image import Image
 
+SIGNATURE = b'BM'
+
 
 class BmpFormat:
 
@@ -19,7 +25,7 @@ class BmpFormat:
     def bitmap_data(self):
         rows = []
         for y in reversed(range(self.image.height)):
-            rows.append([self.image.colors[x][y] for x in range(self.image.width)])
+            rows.append([self.image.get_argb(x, y) for x in range(self.image.width)])
         return rows
 
     @staticmethod
@@ -33,64 +39,229 @@ class BmpFormat:
 
     @staticmethod
     def from_bytes(bytes):
-        bmp_header = BmpHeader.from_bytes(bytes[:BmpHeader.SIZE_BITS])
-        bytes = bytes[BmpHeader.SIZE_BITS:]
+        return BmpFormat.from_buffer(bytes)
+
+    @staticmethod
+    def from_buffer(buffer):
+        """Decodes a BMP file from any buffer (bytes, mmap, ...) without copying it.
+
+        Supports uncompressed 24-bit and 32-bit bitmaps stored bottom-up or top-down.
+        """
+        reader = BmpReader(buffer)
+        image = reader.read_rows(0, reader.height)
+        image.has_alpha = reader.has_alpha
+        return image
+
+    def __str__(self) -> str:
+        string = "BMP image (Windows Bitmap)"
+        if self.dib_header is not None:
+            string += " {} * {} px".format(self.dib_header.image_width, self.dib_header.image_height)
+        return string
+
+    def write_to(self, file):
+        """Writes the BMP to a binary file object, one scanline at a time."""
+        file.write(bytes(self.bmp_header))
+        file.write(bytes(self.dib_header))
+
+        pixel_size = self.dib_header.pixel_dword_size
+        data_size = self.image.width * pixel_size
+        padding = BmpFormat.bitmap_data_padding(self.image.width, pixel_size)
+
+        # A single buffer is reused for every scanline; the padding at its end stays zero
+        row = bytearray(data_size + len(padding))
+        data = memoryview(row)[:data_size]
+
+        for y in reversed(range(self.image.height)):
+            encode_row(self.image.row(y), data, pixel_size)
+            file.write(row)
+
+    def __bytes__(self):
+        stream = io.BytesIO()
+        self.write_to(stream)
+        return stream.getvalue()
 
-        dib_header_size = int.from_bytes(bytes[:4], byteorder='little')
-        dib_header = DibHeader.from_bytes(bytes[:dib_header_size])
-        bytes = bytes[dib_header_size:]
 
-        image = Image(dib_header.image_width, dib_header.image_height)
-        image.has_alpha = dib_header.pixel_dword_size == 4
+class BmpReader:
+    """Decodes rows of a BMP file held in a buffer, on demand.
 
-        x = 0
-        y = image.height - 1
+    Supports uncompressed 24-bit and 32-bit bitmaps stored bottom-up or top-down.
+    32-bit bitmaps with channel masks (BI_BITFIELDS) are supported where every
+    mask selects a whole byte.
+    """
 
-        pixel_count = image.width * image.height
-        pixel_size = dib_header.pixel_dword_size
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.bmp_header = BmpHeader.from_bytes(bytes(self.view[:BmpHeader.SIZE_BITS]))
 
-        i = 0
+        if self.bmp_header.type != 'BM':
+            raise ValueError('Not a BMP file')
 
-        for _ in range(pixel_count):
-            pixel = int.from_bytes(bytes[i : i + pixel_size], byteorder='little')
-            i += pixel_size
+        dib_header_size = int.from_bytes(self.view[BmpHeader.SIZE_BITS:BmpHeader.SIZE_BITS + 4], byteorder='little')
+        self.dib_header = DibHeader.from_bytes(bytes(self.view[BmpHeader.SIZE_BITS:BmpHeader.SIZE_BITS + dib_header_size]))
 
-            a = pixel >> 24 & 0xff
-            r = pixel >> 16 & 0xff
-            g = pixel >> 8 & 0xff
-            b = pixel & 0xff
+        pixel_size = self.dib_header.pixel_dword_size
+        compression = self.dib_header.compression
 
-            image.alphas[x][y] = a
-            image.reds[x][y] = r
-            image.greens[x][y] = g
-            image.blues[x][y] = b
+        if pixel_size not in (3, 4):
+            raise ValueError('Unsupported bit depth: {}'.format(pixel_size * 8))
 
-            x += 1
+        if compression not in (DibHeader.COMPRESSION_RGB, DibHeader.COMPRESSION_BITFIELDS) or \
+                compression == DibHeader.COMPRESSION_BITFIELDS and pixel_size != 4:
+            raise ValueError('Unsupported compression: {}'.format(compression))
 
-            if x >= image.width:
-                x = 0
-                y -= 1
+        self.width = self.dib_header.image_width
+        self.height = abs(self.dib_header.image_height)
+        self.pixel_size = pixel_size
+        self.row_size = self.width * pixel_size + len(BmpFormat.bitmap_data_padding(self.width, pixel_size))
+        self.top_down = self.dib_header.image_height < 0
+
+        # Offsets of the red, green, blue and alpha bytes within a pixel (None: no alpha)
+        if compression == DibHeader.COMPRESSION_BITFIELDS:
+            start = BmpHeader.SIZE_BITS + 40
+            masks = self.view[start:start + (16 if dib_header_size >= 56 else 12)]
+            masks = [int.from_bytes(masks[i:i + 4], byteorder='little') for i in range(0, len(masks), 4)]
+            self.offsets = tuple(mask_offset(mask, alpha=i == 3) for i, mask in enumerate(masks + [0] * (4 - len(masks))))
+        else:
+            self.offsets = (2, 1, 0, 3) if pixel_size == 4 else (2, 1, 0, None)
+
+    @property
+    def has_alpha(self):
+        return self.offsets[3] is not None
+
+    def row_offset(self, y):
+        return self.bmp_header.offset + (y if self.top_down else self.height - 1 - y) * self.row_size
+
+    def read_rows(self, start, count):
+        """Decodes rows start .. start + count - 1 (counted from the top) into a new image."""
+        image = Image(self.width, count)
+        data_size = self.width * self.pixel_size
+
+        for y in range(count):
+            i = self.row_offset(start + y)
+            decode_row(self.view[i:i + data_size], image.row(y), self.pixel_size, self.offsets)
 
         return image
 
-    def __str__(self) -> str:
-        string = "BMP image (Windows Bitmap)"
-        if self.dib_header is not None:
-            string += " {} * {} px".format(self.dib_header.image_width, self.dib_header.image_height)
-        return string
+    def apply(self, operation, chunk_size=1 << 20):
+        """Applies a point operation (operations.point) directly to the pixel bytes of the buffer.
+
+        The buffer must be writable. Rows are processed in chunks of about chunk_size bytes.
+        """
+        data_size = self.width * self.pixel_size
+        offsets = self.offsets[:3]
+        start = self.bmp_header.offset
+        end = start + self.height * self.row_size
+
+        if data_size == self.row_size:
+            # No padding: consecutive rows form one run of pixels
+            step = max(self.row_size, chunk_size - chunk_size % self.row_size)
+            for i in range(start, end, step):
+                operation.apply_to_buffer(self.view[i:min(end, i + step)], offsets, self.pixel_size)
+        else:
+            for i in range(start, end, self.row_size):
+                operation.apply_to_buffer(self.view[i:i + data_size], offsets, self.pixel_size)
 
-    def __bytes__(self):
-        b = bytearray()
-        b += bytes(self.bmp_header)
-        b += bytes(self.dib_header)
+    @staticmethod
+    def open(path, writable=False):
+        """Maps a BMP file into memory; with writable, changes to the buffer are written to the file."""
+        # The mapping stays valid after the file is closed; close() unmaps it
+        with open(path, 'r+b' if writable else 'rb') as file:
+            return BmpReader(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ))
 
-        for y in reversed(range(self.image.height)):
-            for x in range(self.image.width):
-                b += self.image.get_argb(x, y).to_bytes(self.dib_header.pixel_dword_size, byteorder='little')
+    def close(self):
+        buffer = self.view.obj
+        self.view.release()
+
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
-            b += BmpFormat.bitmap_data_padding(self.image.width, self.dib_header.pixel_dword_size)
 
-        return bytes(b)
+class BmpWriter:
+    """Writes a BMP file of known size in any order of rows, e.g. strip by strip."""
+
+    def __init__(self, file, width, height, has_alpha=False):
+        self.file = file
+        self.dib_header = DibHeader.from_size(width, height, 4 if has_alpha else 3)
+
+        bmp_header = BmpHeader()
+        bmp_header.offset = self.dib_header.size + BmpHeader.SIZE_BITS
+        bmp_header.file_size = bmp_header.offset + self.dib_header.image_data_size
+
+        self.offset = bmp_header.offset
+        self.row_size = self.dib_header.image_data_size // height if height else 0
+
+        file.write(bytes(bmp_header))
+        file.write(bytes(self.dib_header))
+        file.truncate(bmp_header.file_size)
+
+    def write_rows(self, start, image):
+        """Writes all rows of the image as rows start .. start + image.height - 1 (counted from the top)."""
+        pixel_size = self.dib_header.pixel_dword_size
+        row = bytearray(self.row_size)
+        data = memoryview(row)[:image.width * pixel_size]
+
+        for y in range(image.height):
+            encode_row(image.row(y), data, pixel_size)
+            self.file.seek(self.offset + (self.dib_header.image_height - 1 - start - y) * self.row_size)
+            self.file.write(row)
+
+    @staticmethod
+    def open(path, width, height, has_alpha=False):
+        return BmpWriter(open(path, 'w+b'), width, height, has_alpha)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def mask_offset(mask, alpha=False):
+    """Offset of the byte a BI_BITFIELDS channel mask selects, None for no alpha mask."""
+    if alpha and not mask:
+        return None
+
+    for offset in range(4):
+        if mask == 0xff << (offset * 8):
+            return offset
+
+    raise ValueError('Unsupported BMP channel mask: {:#010x}'.format(mask))
+
+
+def decode_row(source, row, pixel_size, offsets=(2, 1, 0, 3)):
+    """Converts a BGR, or a 32-bit scanline with the red, green, blue and alpha bytes at offsets, into RGBA pixels."""
+    if pixel_size == 4:
+        red, green, blue, alpha = offsets
+        row[Image.RED::Image.PIXEL_SIZE] = source[red::4]
+        row[Image.GREEN::Image.PIXEL_SIZE] = source[green::4]
+        row[Image.BLUE::Image.PIXEL_SIZE] = source[blue::4]
+
+        if alpha is not None:
+            row[Image.ALPHA::Image.PIXEL_SIZE] = source[alpha::4]
+    else:
+        row[Image.BLUE::Image.PIXEL_SIZE] = source[0::3]
+        row[Image.GREEN::Image.PIXEL_SIZE] = source[1::3]
+        row[Image.RED::Image.PIXEL_SIZE] = source[2::3]
+
+
+def encode_row(row, data, pixel_size):
+    """Converts RGBA pixels into a BGR or BGRA scanline."""
+    if pixel_size == 4:
+        data[:] = row
+        data[0::4], data[2::4] = row[Image.BLUE::Image.PIXEL_SIZE], row[Image.RED::Image.PIXEL_SIZE]
+    else:
+        data[0::3] = row[Image.BLUE::Image.PIXEL_SIZE]
+        data[1::3] = row[Image.GREEN::Image.PIXEL_SIZE]
+        data[2::3] = row[Image.RED::Image.PIXEL_SIZE]
 
 
 class BmpHeader:
@@ -120,6 +291,9 @@ class BmpHeader:
 
 class DibHeader:
 
+    COMPRESSION_RGB = 0
+    COMPRESSION_BITFIELDS = 3
+
     def __init__(self):
         self.size = 0
         self.image_width = 0
@@ -135,14 +309,18 @@ class DibHeader:
 
     @staticmethod
     def from_image(image):
+        return DibHeader.from_size(image.width, image.height, 4 if image.has_alpha_channel() else 3)
+
+    @staticmethod
+    def from_size(width, height, pixel_dword_size):
         header = DibHeader()
         header.size = 40
-        header.image_width = image.width
-        header.image_height = image.height
+        header.image_width = width
+        header.image_height = height
         header.planes = 1
-        header.pixel_dword_size = 4 if image.has_alpha_channel() else 3
+        header.pixel_dword_size = pixel_dword_size
         header.compression = 0
-        header.image_data_size = ((header.pixel_dword_size * image.width) + len(BmpFormat.bitmap_data_padding(image.width, header.pixel_dword_size))) * image.height
+        header.image_data_size = ((header.pixel_dword_size * width) + len(BmpFormat.bitmap_data_padding(width, header.pixel_dword_size))) * height
         header.print_resolution_horizontal = 2835
         header.print_resolution_vertical = 2835
         header.colors_in_palette = 0
@@ -154,7 +332,7 @@ class DibHeader:
         header = DibHeader()
         header.size = int.from_bytes(bytes[0:4], byteorder='little')
         header.image_width = int.from_bytes(bytes[4:8], byteorder='little')
-        header.image_height = int.from_bytes(bytes[8:12], byteorder='little')
+        header.image_height = int.from_bytes(bytes[8:12], byteorder='little', signed=True)
         header.planes = int.from_bytes(bytes[12:14], byteorder='little')
         header.pixel_dword_size = int.from_bytes(bytes[14:16], byteorder='little') // 8
         header.compression = int.from_bytes(bytes[16:20], byteorder='little')
@@ -169,7 +347,7 @@ class DibHeader:
         return b'' + \
             self.size.to_bytes(4, byteorder='little') + \
             self.image_width.to_bytes(4, byteorder='little') + \
-            self.image_height.to_bytes(4, byteorder='little') + \
+            self.image_height.to_bytes(4, byteorder='little', signed=True) + \
             self.planes.to_bytes(2, byteorder='little') + \
             (self.pixel_dword_size * 8).to_bytes(2, byteorder='little') + \
             self.compression.to_bytes(4, byteorder='little') + \
@@ -180,14 +358,52 @@ class DibHeader:
             self.important_colors.to_bytes(4, byteorder='little')
 
 
+def probe(file):
+    """Reads the size and pixel format of a BMP from the headers at the start of a binary file."""
+    data = file.read(BmpHeader.SIZE_BITS + 16)
+
+    if len(data) < BmpHeader.SIZE_BITS + 12 or not data.startswith(SIGNATURE):
+        raise ValueError('Not a BMP file')
+
+    dib = data[BmpHeader.SIZE_BITS:]
+
+    if int.from_bytes(dib[0:4], byteorder='little') == 12:
+        # OS/2 BITMAPCOREHEADER with 16-bit dimensions
+        width = int.from_bytes(dib[4:6], byteorder='little')
+        height = int.from_bytes(dib[6:8], byteorder='little')
+        bits = int.from_bytes(dib[10:12], byteorder='little')
+    else:
+        width = int.from_bytes(dib[4:8], byteorder='little')
+        height = abs(int.from_bytes(dib[8:12], byteorder='little', signed=True))
+        bits = int.from_bytes(dib[14:16], byteorder='little')
+
+    if bits <= 8:
+        return ImageInfo('bmp', width, height, bits, 1)
+
+    channels = 4 if bits == 32 else 3
+    return ImageInfo('bmp', width, height, 5 if bits == 16 else 8, channels, channels == 4)
+
+
 def read(path):
-    with open(path, 'rb') as file:
-        return BmpFormat.from_bytes(file.read())
+    with BmpReader.open(path) as reader:
+        image = reader.read_rows(0, reader.height)
+        image.has_alpha = reader.has_alpha
+        return image
 
 
 def write(image, path):
     with open(path, 'wb') as file:
-        file.write(bytes(BmpFormat(image)))
+        BmpFormat(image).write_to(file)
+
+
+def edit(path, operation):
+    """Applies a point operation to a BMP file in place, without decoding it.
+
+    Only the pages of the pixel data are rewritten, through a shared memory map.
+    """
+    with BmpReader.open(path, writable=True) as reader:
+        reader.apply(operation)
+        reader.view.obj.flush()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,113 @@
+import os
+import tempfile
+
+import format.bmp as bmp
+from format.info import ImageInfo
+from image import Image
+from operations.negative import negative
+from unittest import TestCase
+
+
+def top_down(data):
+    """The same BMP file with its rows stored top-down (negative height)."""
+    offset = int.from_bytes(data[10:14], byteorder='little')
+    height = int.from_bytes(data[22:26], byteorder='little', signed=True)
+    row_size = (len(data) - offset) // height
+    rows = [data[offset + y * row_size:offset + (y + 1) * row_size] for y in range(height)]
+    return data[:22] + (-height).to_bytes(4, byteorder='little', signed=True) + data[26:offset] + b''.join(reversed(rows))
+
+
+class BmpTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(5, 3)
+        for i in range(len(self.image.pixels)):
+            if i % 4 != 3:
+                self.image.pixels[i] = i * 7 % 256
+
+        handle, self.path = tempfile.mkstemp(suffix='.bmp')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        # 24-bit rows of 15 bytes take 16 with padding, 32-bit rows of 20 bytes need none
+        for has_alpha, size in ((False, 16), (True, 20)):
+            if has_alpha:
+                self.image.pixels[3::4] = bytes(range(1, 16))
+
+            bmp.write(self.image, self.path)
+            with open(self.path, 'rb') as file:
+                data = file.read()
+
+            self.assertEqual(54 + 3 * size, len(data))
+            self.assertEqual(len(data), int.from_bytes(data[2:6], byteorder='little'))
+            self.assertEqual(bytes(self.image.pixels), bytes(bmp.read(self.path).pixels))
+
+    def test_from_buffer(self):
+        # Rows 5 pixels wide are padded in 24-bit files, not in 32-bit ones
+        for has_alpha in (False, True):
+            if has_alpha:
+                self.image.pixels[3::4] = bytes(range(1, 16))
+
+            data = bytes(bmp.BmpFormat(self.image))
+
+            for buffer in (data, top_down(data)):
+                image = bmp.BmpFormat.from_buffer(buffer)
+                self.assertEqual(has_alpha, image.has_alpha)
+                self.assertEqual(bytes(self.image.pixels), bytes(image.pixels))
+
+    def test_read_rows(self):
+        data = bytes(bmp.BmpFormat(self.image))
+
+        for buffer in (data, top_down(data)):
+            reader = bmp.BmpReader(buffer)
+            self.assertEqual(bytes(self.image.row(1)), bytes(reader.read_rows(1, 1).pixels))
+            self.assertEqual(bytes(self.image.pixels[5 * 4:]), bytes(reader.read_rows(1, 2).pixels))
+
+    def test_bitfields(self):
+        def bitfields(*masks):
+            pixels = Image(2, 1)
+            pixels.set_argb(0, 0, 0xff000000)
+            header = bmp.DibHeader.from_image(pixels)
+            header.compression = bmp.DibHeader.COMPRESSION_BITFIELDS
+            file = bmp.BmpHeader()
+            file.offset = bmp.BmpHeader.SIZE_BITS + header.size + 4 * len(masks)
+            masks = b''.join(mask.to_bytes(4, byteorder='little') for mask in masks)
+            return bytes(file) + bytes(header) + masks + bytes((9, 3, 2, 1, 9, 6, 5, 4))
+
+        # Red in the top byte, blue in the second lowest, no alpha mask
+        image = bmp.BmpFormat.from_buffer(bitfields(0xff000000, 0x00ff0000, 0x0000ff00))
+        self.assertEqual([0x00010203, 0x00040506], [image.get_argb(0, 0), image.get_argb(1, 0)])
+        self.assertFalse(image.has_alpha)
+
+        with self.assertRaises(ValueError):
+            bmp.BmpFormat.from_buffer(bitfields(0x00ff00ff, 0x00ff0000, 0x0000ff00))
+
+    def test_writer_rows_in_any_order(self):
+        bmp.write(self.image, self.path)
+        with open(self.path, 'rb') as file:
+            expected = file.read()
+
+        with bmp.BmpWriter.open(self.path, 5, 3) as writer:
+            for start in (2, 0, 1):
+                strip = Image(5, 1)
+                strip.pixels[:] = self.image.row(start)
+                writer.write_rows(start, strip)
+
+        with open(self.path, 'rb') as file:
+            self.assertEqual(expected, file.read())
+
+    def test_edit_in_place(self):
+        bmp.write(self.image, self.path)
+        bmp.edit(self.path, negative())
+
+        negative().apply(self.image)
+        self.assertEqual(bytes(self.image.pixels), bytes(bmp.read(self.path).pixels))
+
+    def test_probe(self):
+        bmp.write(self.image, self.path)
+
+        with open(self.path, 'rb') as file:
+            self.assertEqual(ImageInfo('bmp', 5, 3, 8, 3), bmp.probe(file))
@@ -0,0 +1,26 @@
+class ImageInfo:
+    """Metadata of an image file read from its header only.
+
+    :param bit_depth:
+        Bits per sample (per palette index for indexed images)
+    :param channels:
+        Samples per pixel as stored in the file (1 for indexed images)
+    """
+
+    def __init__(self, format, width, height, bit_depth, channels, has_alpha=False):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.channels = channels
+        self.has_alpha = has_alpha
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def __eq__(self, other):
+        return isinstance(other, ImageInfo) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return 'ImageInfo({format!r}, {width}, {height}, bit_depth={bit_depth}, channels={channels}, has_alpha={has_alpha})'.format(**vars(self))
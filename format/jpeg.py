@@ -0,0 +1,1372 @@
+import multiprocessing
+import os
+import re
+from array import array
+from collections import deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from itertools import chain, islice, repeat
+
+from coding.dct import fdct, idct, idct_2x2, idct_4x4, idct_dc
+from coding.huffman import BitReader, BitWriter, HuffmanTable
+from format.info import ImageInfo
+from image import Image
+
+SIGNATURE = b'\xff\xd8'
+
+# Start of frame markers (all coding processes), which hold the image size
+SOF_MARKERS = {0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf}
+
+SOF_BASELINE = 0xc0
+SOF_EXTENDED = 0xc1
+SOF_PROGRESSIVE = 0xc2
+DHT = 0xc4
+RST0 = 0xd0
+SOI = 0xd8
+EOI = 0xd9
+SOS = 0xda
+DQT = 0xdb
+DRI = 0xdd
+APP0 = 0xe0
+APP14 = 0xee
+
+# Reduced sizes a file can be decoded at, and the inverse DCT used for the blocks of a component:
+# the reduced sizes take their samples from the coefficients alone (and 1/8 from DC only)
+SCALES = (1, 1 / 2, 1 / 4, 1 / 8)
+IDCTS = {8: idct, 4: idct_4x4, 2: idct_2x2}
+
+# Parallel decoding of restart intervals: MCUs of an image worth using worker processes, and MCUs per task
+PARALLEL_MCUS = 8192
+TASK_MCUS = 1024
+
+# Natural (row-major) position of the k-th coefficient in zig-zag order
+ZIGZAG = (0, 1, 8, 16, 9, 2, 3, 10, 17, 24, 32, 25, 18, 11, 4, 5,
+          12, 19, 26, 33, 40, 48, 41, 34, 27, 20, 13, 6, 7, 14, 21, 28,
+          35, 42, 49, 56, 57, 50, 43, 36, 29, 22, 15, 23, 30, 37, 44, 51,
+          58, 59, 52, 45, 38, 31, 39, 46, 53, 60, 61, 54, 47, 55, 62, 63)
+
+# Markers ending entropy-coded data: 0xFF not followed by stuffing (0x00) or a fill byte (0xFF)
+MARKER = re.compile(b'\xff[^\x00\xff]')
+
+# YCbCr -> RGB (JFIF, full range) in 16-bit fixed point; red and blue terms are offset by 256 to index RANGE
+CR_RED = [((91881 * (value - 128) + 32768) >> 16) + 256 for value in range(256)]
+CB_BLUE = [((116130 * (value - 128) + 32768) >> 16) + 256 for value in range(256)]
+CB_GREEN = [-22554 * (value - 128) + 32768 for value in range(256)]
+CR_GREEN = [-46802 * (value - 128) for value in range(256)]
+
+# RANGE[value + 256] is value limited to 0 .. 255, for value in -256 .. 511
+RANGE = bytes([0] * 256 + list(range(256)) + [255] * 256)
+
+# RGB -> YCbCr (JFIF) in 16-bit fixed point; the blue term of Cb and the red term of Cr
+# (the same table) hold the chroma offset of 128, all luma and chroma terms the rounding
+RED_Y = [19595 * value for value in range(256)]
+GREEN_Y = [38470 * value for value in range(256)]
+BLUE_Y = [7471 * value + 32768 for value in range(256)]
+RED_CB = [-11059 * value for value in range(256)]
+GREEN_CB = [-21709 * value for value in range(256)]
+BLUE_CB = RED_CR = [32768 * value + (128 << 16) + 32767 for value in range(256)]
+GREEN_CR = [-27439 * value for value in range(256)]
+BLUE_CR = [-5329 * value for value in range(256)]
+
+# Quantization tables of the JPEG specification (Annex K.1) in natural order, scaled by quality
+LUMINANCE_QUANTIZATION = (16, 11, 10, 16, 24, 40, 51, 61,
+                          12, 12, 14, 19, 26, 58, 60, 55,
+                          14, 13, 16, 24, 40, 57, 69, 56,
+                          14, 17, 22, 29, 51, 87, 80, 62,
+                          18, 22, 37, 56, 68, 109, 103, 77,
+                          24, 35, 55, 64, 81, 104, 113, 92,
+                          49, 64, 78, 87, 103, 121, 120, 101,
+                          72, 92, 95, 98, 112, 100, 103, 99)
+
+CHROMINANCE_QUANTIZATION = (17, 18, 24, 47, 99, 99, 99, 99,
+                            18, 21, 26, 66, 99, 99, 99, 99,
+                            24, 26, 56, 99, 99, 99, 99, 99,
+                            47, 66, 99, 99, 99, 99, 99, 99) + (99,) * 32
+
+# Huffman tables of the JPEG specification (Annex K.3) as code counts of lengths 1 - 16 and symbols
+LUMINANCE_DC = (0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0), bytes(range(12))
+CHROMINANCE_DC = (0, 3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0), bytes(range(12))
+
+LUMINANCE_AC = (0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 125), bytes.fromhex(
+    '01020300041105122131410613516107227114328191a1082342b1c11552d1f0'
+    '2433627282090a161718191a25262728292a3435363738393a43444546474849'
+    '4a535455565758595a636465666768696a737475767778797a83848586878889'
+    '8a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5'
+    'c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8'
+    'f9fa')
+
+CHROMINANCE_AC = (0, 2, 1, 2, 4, 4, 3, 4, 7, 5, 4, 4, 0, 1, 2, 119), bytes.fromhex(
+    '000102031104052131061241510761711322328108144291a1b1c109233352f0'
+    '156272d10a162434e125f11718191a262728292a35363738393a434445464748'
+    '494a535455565758595a636465666768696a737475767778797a828384858687'
+    '88898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3'
+    'c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae2e3e4e5e6e7e8e9eaf2f3f4f5f6f7f8'
+    'f9fa')
+
+
+class Component:
+
+    def __init__(self, id, horizontal, vertical, quantization_table):
+        self.id = id
+        self.horizontal = horizontal
+        self.vertical = vertical
+        self.quantization_table = quantization_table
+        self.quantization = None
+        self.coefficients = None
+
+
+class Scan:
+    """Start of scan header with the tables in effect and the entropy-coded segments between restart markers."""
+
+    def __init__(self, components, start, end, high, low, dc_tables, ac_tables, restart_interval, segments):
+        self.components = components
+        self.start = start
+        self.end = end
+        self.high = high
+        self.low = low
+        self.dc_tables = dc_tables
+        self.ac_tables = ac_tables
+        self.restart_interval = restart_interval
+        self.segments = segments
+
+
+class McuDecoder:
+    """Decodes the MCUs of a single sequential scan into samples, a run of restart intervals at a time.
+
+    Holds only the tables needed for decoding, so it can be sent to worker processes.
+    """
+
+    def __init__(self, scan):
+        self.restart_interval = scan.restart_interval
+
+        # Component of every block of an MCU, in coding order
+        self.blocks = [i for i, component in enumerate(scan.components) for _ in range(component.vertical * component.horizontal)]
+        self.tables = [(scan.dc_tables[i], scan.ac_tables[i], component.quantization, component.block_size)
+                       for i, component in enumerate(scan.components)]
+        self.mcu_size = sum(self.tables[i][3] ** 2 for i in self.blocks)
+
+    def samples(self, segments):
+        """Generator of the samples of every MCU coded in the segments of consecutive restart intervals.
+
+        The samples of an MCU are those of its blocks in coding order, each
+        block's rows one after another. The generator does not end: missing
+        data (of a truncated file) decodes as zero bits.
+        """
+        for segment in chain(segments, repeat(b'')):
+            reader = BitReader(segment)
+            predictors = [0] * len(self.tables)
+
+            for _ in range(self.restart_interval) if self.restart_interval else repeat(None):
+                mcu = bytearray(self.mcu_size)
+                position = 0
+
+                for i in self.blocks:
+                    dc_table, ac_table, quantization, size = self.tables[i]
+
+                    if size == 1:
+                        predictors[i] = decode_dc(reader, dc_table, ac_table, predictors[i])
+                        idct_dc(predictors[i] * quantization[0], mcu, position, 1, 1)
+                    else:
+                        predictors[i], block = decode_block(reader, dc_table, ac_table, predictors[i], quantization)
+
+                        if block is None:
+                            idct_dc(predictors[i] * quantization[0], mcu, position, size, size)
+                        else:
+                            IDCTS[size](block, mcu, position, size)
+
+                    position += size * size
+
+                yield mcu
+
+    def decode(self, segments, count):
+        """Decodes the first count MCUs of the segments of consecutive restart intervals, as by samples, into one buffer."""
+        return b''.join(islice(self.samples(segments), count))
+
+
+class JpegReader:
+    """Decodes baseline and progressive Huffman-coded JPEG files.
+
+    Images with all components in one sequential scan are decoded one MCU row
+    at a time: blocks are entropy-decoded, dequantized and inverse transformed
+    into the component planes of the row, which are then upsampled and
+    converted to RGB. Other images (progressive, or one scan per component)
+    are entropy-decoded whole into coefficient buffers first.
+
+    At a reduced scale, blocks are inverse transformed into 4 x 4, 2 x 2 or
+    1 x 1 samples; as in libjpeg, subsampled components use larger blocks
+    where that saves upsampling. width and height are those of the result.
+
+    A single sequential scan with restart markers can be decoded by several
+    processes (workers; by default one per CPU for images of at least
+    PARALLEL_MCUS MCUs), since every restart interval is coded on its own.
+    Where no worker processes can be started, e.g. in a daemonic process
+    such as a multiprocessing.Pool worker, the scan is decoded serially.
+    """
+
+    def __init__(self, data, scale=1, workers=None):
+        if scale not in SCALES:
+            raise ValueError('Unsupported JPEG decoding scale: {}'.format(scale))
+
+        self.data = data
+        self.scale = scale
+        self.workers = workers
+        self.frame = None
+        self.components = []
+        self.scans = []
+        self.adobe_transform = None
+
+        if data[:2] != SIGNATURE:
+            raise ValueError('Not a JPEG file')
+
+        self.parse()
+
+        if self.frame is None or not self.scans:
+            raise ValueError('Invalid JPEG file: no image data')
+
+        self.rows = None
+        self.cache = []
+        self.cache_start = 0
+
+    def parse(self):
+        data = self.data
+        quantization_tables = {}
+        dc_tables = {}
+        ac_tables = {}
+        restart_interval = 0
+        position = 2
+
+        while position < len(data):
+            match = MARKER.search(data, position)
+
+            if match is None:
+                break
+
+            marker = data[match.start() + 1]
+            position = match.end()
+
+            if marker == EOI:
+                break
+
+            if 0xd0 <= marker <= 0xd7 or marker in (SOI, 0x01):
+                continue
+
+            length = int.from_bytes(data[position:position + 2], byteorder='big')
+            segment = data[position + 2:position + length]
+            position += length
+
+            if marker in (SOF_BASELINE, SOF_EXTENDED, SOF_PROGRESSIVE):
+                self.parse_frame(marker, segment)
+            elif marker in SOF_MARKERS:
+                raise ValueError('Unsupported JPEG coding process (SOF{})'.format(marker - 0xc0))
+            elif marker == DHT:
+                parse_huffman_tables(segment, dc_tables, ac_tables)
+            elif marker == DQT:
+                parse_quantization_tables(segment, quantization_tables)
+            elif marker == DRI:
+                restart_interval = int.from_bytes(segment[0:2], byteorder='big')
+            elif marker == APP14 and segment[:5] == b'Adobe' and len(segment) >= 12:
+                self.adobe_transform = segment[11]
+            elif marker == SOS:
+                if self.frame is None:
+                    raise ValueError('Invalid JPEG file: scan before frame header')
+
+                scan = self.parse_scan(segment, dict(dc_tables), dict(ac_tables), restart_interval)
+
+                for component in scan.components:
+                    if component.quantization is None:
+                        if component.quantization_table not in quantization_tables:
+                            raise ValueError('Invalid JPEG file: missing quantization table {}'.format(component.quantization_table))
+                        component.quantization = quantization_tables[component.quantization_table]
+
+                scan.segments, position = split_segments(data, position)
+                self.scans.append(scan)
+
+    def parse_frame(self, marker, segment):
+        if segment[0] != 8:
+            raise ValueError('Unsupported JPEG precision: {} bits'.format(segment[0]))
+
+        self.frame = marker
+        height = int.from_bytes(segment[1:3], byteorder='big')
+        width = int.from_bytes(segment[3:5], byteorder='big')
+
+        if not width or not height:
+            raise ValueError('Unsupported JPEG file: image size {} x {}'.format(width, height))
+
+        # Size of the blocks of a full resolution component, and of the result
+        self.block_size = int(8 * self.scale)
+        self.width = -(-width * self.block_size // 8)
+        self.height = -(-height * self.block_size // 8)
+
+        for i in range(segment[5]):
+            id, sampling, table = segment[6 + i * 3:9 + i * 3]
+            self.components.append(Component(id, sampling >> 4, sampling & 15, table))
+
+        if len(self.components) == 1:
+            # The sampling factors of a single component have no meaning
+            self.components[0].horizontal = self.components[0].vertical = 1
+
+        self.max_horizontal = max(component.horizontal for component in self.components)
+        self.max_vertical = max(component.vertical for component in self.components)
+
+        for component in self.components:
+            if self.max_horizontal % component.horizontal or self.max_vertical % component.vertical:
+                raise ValueError('Unsupported JPEG sampling factors')
+
+        self.mcu_width = 8 * self.max_horizontal
+        self.mcu_height = 8 * self.max_vertical
+        self.mcus_per_line = -(-width // self.mcu_width)
+        self.mcu_rows = -(-height // self.mcu_height)
+
+        for component in self.components:
+            # Blocks actually coded in non-interleaved scans
+            component.blocks_per_line = -(-width * component.horizontal // (self.max_horizontal * 8))
+            component.blocks_per_column = -(-height * component.vertical // (self.max_vertical * 8))
+
+            # Reduced subsampled blocks are enlarged by the subsampling factor (up to 8), saving upsampling
+            component.block_size = self.block_size
+            while (component.block_size < 8 and component.horizontal * component.block_size * 2 <= self.max_horizontal * self.block_size
+                   and component.vertical * component.block_size * 2 <= self.max_vertical * self.block_size):
+                component.block_size *= 2
+
+            # Component size in samples, and the blocks allocated (whole MCUs)
+            component.width = -(-width * component.horizontal * component.block_size // (self.max_horizontal * 8))
+            component.height = -(-height * component.vertical * component.block_size // (self.max_vertical * 8))
+            component.line_blocks = self.mcus_per_line * component.horizontal
+            component.column_blocks = self.mcu_rows * component.vertical
+
+    def parse_scan(self, segment, dc_tables, ac_tables, restart_interval):
+        count = segment[0]
+        components = []
+        scan_dc_tables = []
+        scan_ac_tables = []
+
+        for i in range(count):
+            id, tables = segment[1 + i * 2:3 + i * 2]
+            component = next((component for component in self.components if component.id == id), None)
+
+            if component is None:
+                raise ValueError('Invalid JPEG file: scan of unknown component {}'.format(id))
+
+            components.append(component)
+            scan_dc_tables.append(dc_tables.get(tables >> 4))
+            scan_ac_tables.append(ac_tables.get(tables & 15))
+
+        start, end, approximation = segment[1 + count * 2:4 + count * 2]
+        return Scan(components, start, end, approximation >> 4, approximation & 15, scan_dc_tables, scan_ac_tables, restart_interval, None)
+
+    @property
+    def sequential(self):
+        """Whether the image is decoded MCU row by MCU row from a single scan."""
+        return self.frame != SOF_PROGRESSIVE and len(self.scans) == 1 and len(self.scans[0].components) == len(self.components)
+
+    def mcus(self, scan):
+        """Generator of the blocks of every MCU of a scan, in coding order, as (component index, block column, block row).
+
+        Scans of one component are not interleaved: every block is an MCU of its own.
+        """
+        if len(scan.components) == 1:
+            component = scan.components[0]
+            for y in range(component.blocks_per_column):
+                for x in range(component.blocks_per_line):
+                    yield ((0, x, y),)
+            return
+
+        for mcu_y in range(self.mcu_rows):
+            for mcu_x in range(self.mcus_per_line):
+                yield [(i, mcu_x * component.horizontal + h, mcu_y * component.vertical + v)
+                       for i, component in enumerate(scan.components)
+                       for v in range(component.vertical)
+                       for h in range(component.horizontal)]
+
+    def intervals(self, scan):
+        """Generator of (bit reader, blocks of the MCU) for every MCU of a scan.
+
+        A new reader starts at every restart marker, where also the DC
+        predictors and the end-of-band run must be reset (the reader is new).
+        """
+        segments = iter(scan.segments)
+        interval = scan.restart_interval
+        reader = None
+
+        for index, blocks in enumerate(self.mcus(scan)):
+            if reader is None or interval and index % interval == 0:
+                reader = BitReader(next(segments, b''))
+
+            yield reader, blocks
+
+    def sequential_planes(self):
+        """Generator of the component planes of every MCU row of a single sequential scan.
+
+        Scans with restart markers are decoded in parallel by the worker
+        processes, a run of restart intervals at a time.
+        """
+        scan = self.scans[0]
+        decoder = McuDecoder(scan)
+        mcus = self.mcus_per_line * self.mcu_rows
+        workers = self.workers
+
+        if workers is None:
+            workers = cpu_count() if mcus >= PARALLEL_MCUS else 1
+
+        executor = None
+        if workers > 1 and scan.restart_interval and len(scan.segments) > 1:
+            executor = worker_pool(workers)
+
+        if executor is None:
+            yield from self.mcu_planes(scan, decoder.samples(scan.segments))
+            return
+
+        yield from self.mcu_planes(scan, parallel_samples(decoder, scan, mcus, workers, executor))
+
+    def mcu_planes(self, scan, mcus):
+        """Generator of the component planes of every MCU row, from the samples of every MCU of a sequential scan.
+
+        :param mcus:
+            Iterable of the samples of every MCU, as McuDecoder.samples
+        """
+        indices = [self.components.index(component) for component in scan.components]
+
+        # Where the rows of every block of an MCU go: plane, offset in the plane, size, plane stride and MCU width
+        placements = []
+        for i, component in enumerate(scan.components):
+            size = component.block_size
+            stride = component.line_blocks * size
+            for v in range(component.vertical):
+                for h in range(component.horizontal):
+                    placements.append((indices[i], v * size * stride + h * size, size, stride, component.horizontal * size))
+
+        planes = None
+
+        for index, samples in enumerate(mcus):
+            x = index % self.mcus_per_line
+
+            if x == 0:
+                planes = [bytearray(component.line_blocks * component.vertical * component.block_size ** 2) for component in self.components]
+
+            position = 0
+            for plane, offset, size, stride, width in placements:
+                plane = planes[plane]
+                start = offset + x * width
+                for r in range(size):
+                    plane[start:start + size] = samples[position:position + size]
+                    start += stride
+                    position += size
+
+            if x == self.mcus_per_line - 1:
+                yield planes
+
+                if index == self.mcus_per_line * self.mcu_rows - 1:
+                    return
+
+    def decode_coefficients(self):
+        """Entropy-decodes all scans into the coefficient buffers of the components.
+
+        Progressive AC scans of components decoded from DC only are skipped.
+        """
+        for component in self.components:
+            component.coefficients = array('i', bytes(component.line_blocks * component.column_blocks * 64 * 4))
+
+        for scan in self.scans:
+            if scan.start == 0 or any(component.block_size > 1 for component in scan.components):
+                self.decode_scan(scan)
+
+    def decode_scan(self, scan):
+        components = scan.components
+        predictors = [0] * len(components)
+        progressive = self.frame == SOF_PROGRESSIVE
+        eob_run = [0]
+        current = None
+
+        for reader, blocks in self.intervals(scan):
+            if reader is not current:
+                current = reader
+                predictors = [0] * len(components)
+                eob_run[0] = 0
+
+            for i, x, y in blocks:
+                component = components[i]
+                coefficients = component.coefficients
+                base = (y * component.line_blocks + x) * 64
+                block = list(coefficients[base:base + 64])
+
+                if not progressive:
+                    predictors[i] = decode_sequential(reader, scan.dc_tables[i], scan.ac_tables[i], predictors[i], block)
+                elif scan.start == 0:
+                    if scan.high == 0:
+                        predictors[i] += reader.receive_extend(reader.decode(scan.dc_tables[i]))
+                        block[0] = predictors[i] << scan.low
+                    elif reader.read(1):
+                        block[0] |= 1 << scan.low
+                elif scan.high == 0:
+                    decode_ac_first(reader, scan.ac_tables[i], scan.start, scan.end, scan.low, block, eob_run)
+                else:
+                    decode_ac_refine(reader, scan.ac_tables[i], scan.start, scan.end, scan.low, block, eob_run)
+
+                coefficients[base:base + 64] = array('i', block)
+
+    def coefficient_planes(self):
+        """Generator of the component planes of every MCU row, inverse transformed from the coefficient buffers."""
+        if self.components[0].coefficients is None:
+            self.decode_coefficients()
+
+        for mcu_row in range(self.mcu_rows):
+            planes = []
+
+            for component in self.components:
+                size = component.block_size
+                stride = component.line_blocks * size
+                plane = bytearray(stride * component.vertical * size)
+                quantization = component.quantization
+                natural = [0] * 64
+                for k in range(64):
+                    natural[ZIGZAG[k]] = quantization[k]
+
+                for v in range(component.vertical):
+                    y = mcu_row * component.vertical + v
+                    for x in range(component.line_blocks):
+                        base = (y * component.line_blocks + x) * 64
+                        block = component.coefficients[base:base + 64]
+                        offset = v * size * stride + x * size
+
+                        if size > 1 and any(block[1:]):
+                            IDCTS[size]([value * q for value, q in zip(block, natural)], plane, offset, stride)
+                        else:
+                            idct_dc(block[0] * natural[0], plane, offset, stride, size)
+
+                planes.append(plane)
+
+            yield planes
+
+    def read_all_rows(self):
+        """Generator of the rows of the image as RGBA bytes.
+
+        Chroma is upsampled by triangle filtering (as libjpeg "fancy"
+        upsampling) where a factor is 2, which needs the component rows next
+        to every MCU row: the planes of the following MCU row are decoded
+        before the rows of the current one are converted. Like libjpeg,
+        samples are replicated instead at 1/8 scale and for very narrow
+        components.
+        """
+        planes = self.sequential_planes() if self.sequential else self.coefficient_planes()
+        convert = self.converter()
+        window = {0: next(planes), 1: next(planes, None)}
+        mcu_height = self.max_vertical * self.block_size
+
+        for mcu_row in range(self.mcu_rows):
+            top = mcu_row * mcu_height
+            upsampled = {}
+
+            def line(index, row):
+                """Row of a component, with the rows outside the component replicated from its edges."""
+                component = self.components[index]
+                row = min(max(row, 0), component.height - 1)
+                height = component.vertical * component.block_size
+                stride = component.line_blocks * component.block_size
+                start = row % height * stride
+                return window[row // height][index][start:start + component.width]
+
+            for y in range(top, min(self.height, top + mcu_height)):
+                samples = []
+
+                for index, component in enumerate(self.components):
+                    horizontal = self.max_horizontal * self.block_size // (component.horizontal * component.block_size)
+                    vertical = self.max_vertical * self.block_size // (component.vertical * component.block_size)
+                    fancy = self.block_size > 1 and component.width > 2
+                    row = y // vertical
+                    key = index, row, fancy and vertical == 2 and y % 2
+
+                    if key not in upsampled:
+                        if fancy and vertical == 2:
+                            nearer = line(index, row + 1 if y % 2 else row - 1)
+                            upsampled[key] = upsample(line(index, row), nearer, horizontal, y % 2, self.width)
+                        else:
+                            upsampled[key] = upsample(line(index, row), None, horizontal, 0, self.width, fancy)
+
+                    samples.append(upsampled[key])
+
+                row = bytearray(self.width * Image.PIXEL_SIZE)
+                convert(samples, row)
+                yield row
+
+            window.pop(mcu_row - 1, None)
+            window[mcu_row + 2] = next(planes, None)
+
+    def converter(self):
+        """Function converting the samples of the components of a row into RGBA pixels."""
+        count = len(self.components)
+
+        if count == 1:
+            return gray_to_rgba
+
+        if count == 3:
+            ids = tuple(component.id for component in self.components)
+            if self.adobe_transform == 0 or self.adobe_transform is None and ids == (82, 71, 66):
+                return rgb_to_rgba
+            return ycbcr_to_rgba
+
+        if count == 4:
+            if self.adobe_transform == 2:
+                return ycck_to_rgba
+            return cmyk_to_rgba if self.adobe_transform is None else inverted_cmyk_to_rgba
+
+        raise ValueError('Unsupported number of JPEG components: {}'.format(count))
+
+    def read_rows(self, start, count):
+        """Decodes rows start .. start + count - 1 into a new image.
+
+        Rows are decoded in order; rows from the previous call can be requested
+        again cheaply, earlier rows restart decoding at the first row.
+        """
+        if self.rows is None or start < self.cache_start:
+            self.rows = self.read_all_rows()
+            self.cache = []
+            self.cache_start = 0
+
+        skip = start - self.cache_start
+        cached = len(self.cache)
+        del self.cache[:skip]
+        self.cache_start = start
+
+        for _ in range(skip - cached):
+            next(self.rows)
+
+        while len(self.cache) < count:
+            self.cache.append(next(self.rows))
+
+        image = Image(self.width, count)
+        image.pixels[:] = b''.join(self.cache[:count])
+        return image
+
+    @property
+    def has_alpha(self):
+        return False
+
+    @staticmethod
+    def open(path, scale=1, workers=None):
+        with open(path, 'rb') as file:
+            return JpegReader(file.read(), scale, workers)
+
+    def close(self):
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SymbolCounter:
+    """Stands in for a BitWriter to count the coded symbols; the tables are lists of symbol frequencies."""
+
+    def encode(self, frequencies, symbol):
+        frequencies[symbol] += 1
+
+    def write(self, value, length):
+        pass
+
+
+class JpegWriter:
+    """Encodes the rows of an image into a baseline JPEG file from top to bottom, e.g. strip by strip.
+
+    Rows are collected until they make up a row of MCUs (16 rows with 4:2:0
+    subsampling, 8 with 4:4:4), which is converted to YCbCr, transformed,
+    quantized and Huffman-coded with the standard tables and written.
+
+    With optimized Huffman tables the symbols are counted instead and the
+    quantized blocks kept; they are coded with tables built from the counts
+    when the last row has been written.
+
+    With a restart interval, a restart marker follows every that many MCUs,
+    which lets decoders work on the intervals independently.
+    """
+
+    # Horizontal and vertical luma sampling factor (relative to chroma)
+    SUBSAMPLING = {'4:2:0': 2, '4:4:4': 1}
+
+    def __init__(self, file, width, height, quality=75, subsampling='4:2:0', optimize=False, restart_interval=0):
+        if not 1 <= quality <= 100:
+            raise ValueError('JPEG quality must be 1 - 100, not {}'.format(quality))
+        if subsampling not in JpegWriter.SUBSAMPLING:
+            raise ValueError('Unsupported JPEG subsampling: {}'.format(subsampling))
+        if not (0 < width < 1 << 16 and 0 < height < 1 << 16):
+            raise ValueError('Unsupported JPEG image size: {} x {}'.format(width, height))
+        if not 0 <= restart_interval < 1 << 16:
+            raise ValueError('JPEG restart interval must be 0 - 65535 MCUs, not {}'.format(restart_interval))
+
+        self.file = file
+        self.width = width
+        self.height = height
+        self.factor = JpegWriter.SUBSAMPLING[subsampling]
+        self.optimize = optimize
+        self.restart_interval = restart_interval
+        self.next_row = 0
+        self.rows = []
+        self.mcus = 0
+
+        self.mcu_size = 8 * self.factor
+        self.mcus_per_line = -(-width // self.mcu_size)
+
+        # Component of every block of an MCU, in coding order
+        self.mcu_components = [0] * self.factor * self.factor + [1, 2]
+
+        self.quantization_tables = [quantization_table(LUMINANCE_QUANTIZATION, quality),
+                                    quantization_table(CHROMINANCE_QUANTIZATION, quality)]
+        self.divisors = [[value * 8 for value in table] for table in self.quantization_tables]
+        self.predictors = [0, 0, 0]
+        self.bits = BitWriter()
+
+        if optimize:
+            self.frequencies = [[0] * 256 for _ in range(4)]
+            self.blocks = array('h')
+            self.output = SymbolCounter()
+            self.huffman_tables = self.frequencies
+        else:
+            self.output = self.bits
+            self.huffman_tables = [HuffmanTable(*table) for table in (LUMINANCE_DC, CHROMINANCE_DC, LUMINANCE_AC, CHROMINANCE_AC)]
+            self.write_header()
+
+    def write_header(self):
+        """Writes the markers up to the start of the scan."""
+        dc_luminance, dc_chrominance, ac_luminance, ac_chrominance = self.huffman_tables
+
+        self.file.write(bytes((0xff, SOI)))
+        self.file.write(segment(APP0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'))
+        self.file.write(segment(DQT, b''.join(bytes((id,)) + bytes(table) for id, table in enumerate(self.quantization_tables))))
+        self.file.write(segment(SOF_BASELINE, bytes((8,)) + self.height.to_bytes(2, byteorder='big') + self.width.to_bytes(2, byteorder='big') +
+                                bytes((3, 1, self.factor * 0x11, 0, 2, 0x11, 1, 3, 0x11, 1))))
+        self.file.write(segment(DHT, b''.join(bytes((id,)) + bytes(table.counts) + bytes(table.symbols) for id, table in
+                                               ((0x00, dc_luminance), (0x01, dc_chrominance), (0x10, ac_luminance), (0x11, ac_chrominance)))))
+
+        if self.restart_interval:
+            self.file.write(segment(DRI, self.restart_interval.to_bytes(2, byteorder='big')))
+
+        self.file.write(segment(SOS, bytes((3, 1, 0x00, 2, 0x11, 3, 0x11, 0, 63, 0))))
+
+    def write_rows(self, start, image):
+        """Writes all rows of the image as rows start .. start + image.height - 1; rows must come in order."""
+        if start != self.next_row:
+            raise ValueError('JPEG rows must be written in order: expected row {}, got {}'.format(self.next_row, start))
+
+        for y in range(image.height):
+            self.rows.append(bytes(image.row(y)))
+
+            if len(self.rows) == self.mcu_size:
+                self.encode_rows()
+
+        self.next_row += image.height
+
+    def encode_rows(self):
+        """Encodes the collected rows as a row of MCUs, repeating the last row and column to fill the MCUs."""
+        rows = self.rows + self.rows[-1:] * (self.mcu_size - len(self.rows))
+        self.rows = []
+
+        stride = self.mcus_per_line * self.mcu_size
+        padding = stride - self.width
+        luma = bytearray()
+        blue = bytearray()
+        red = bytearray()
+
+        for row in rows:
+            last = len(row) - Image.PIXEL_SIZE
+            r, g, b = (row[channel::Image.PIXEL_SIZE] + bytes((row[last + channel],)) * padding for channel in (Image.RED, Image.GREEN, Image.BLUE))
+
+            luma += bytes([(RED_Y[x] + GREEN_Y[y] + BLUE_Y[z]) >> 16 for x, y, z in zip(r, g, b)])
+            blue += bytes([(RED_CB[x] + GREEN_CB[y] + BLUE_CB[z]) >> 16 for x, y, z in zip(r, g, b)])
+            red += bytes([(RED_CR[x] + GREEN_CR[y] + BLUE_CR[z]) >> 16 for x, y, z in zip(r, g, b)])
+
+        if self.factor == 2:
+            blue = downsample(blue, stride)
+            red = downsample(red, stride)
+
+        chroma_stride = stride // self.factor
+
+        for x in range(self.mcus_per_line):
+            self.restart(self.mcus)
+            self.mcus += 1
+
+            for v in range(self.factor):
+                for h in range(self.factor):
+                    self.encode_block(0, fdct(luma, v * 8 * stride + x * self.mcu_size + h * 8, stride))
+
+            self.encode_block(1, fdct(blue, x * 8, chroma_stride))
+            self.encode_block(2, fdct(red, x * 8, chroma_stride))
+
+        if not self.optimize:
+            self.file.write(self.bits.take())
+
+    def encode_block(self, component, coefficients):
+        """Quantizes and codes (or counts) the coefficients of a block of a component (0 for luma, 1 and 2 for chroma)."""
+        table = min(component, 1)
+        block = quantize(coefficients, self.divisors[table])
+
+        if self.optimize:
+            self.blocks.extend(block)
+
+        self.predictors[component] = encode_block(self.output, block, self.predictors[component],
+                                                  self.huffman_tables[table], self.huffman_tables[2 + table])
+
+    def restart(self, mcu):
+        """Ends the restart interval before the MCU of the given index if it is complete.
+
+        The DC predictors start over and, unless the symbols are only counted,
+        the bits are padded to a whole byte and a restart marker is written.
+        """
+        if not self.restart_interval or not mcu or mcu % self.restart_interval:
+            return
+
+        self.predictors = [0, 0, 0]
+
+        if self.output is self.bits:
+            self.bits.align()
+            self.bits.data += bytes((0xff, RST0 + (mcu // self.restart_interval - 1) % 8))
+
+    def finish(self):
+        """Encodes the last rows (and with optimized tables, all blocks) and writes the end of image marker."""
+        if self.next_row != self.height:
+            raise ValueError('Image has {} rows, {} were written'.format(self.height, self.next_row))
+
+        if self.rows:
+            self.encode_rows()
+
+        if self.optimize:
+            self.huffman_tables = [HuffmanTable.from_frequencies(frequencies) for frequencies in self.frequencies]
+            self.write_header()
+            self.encode_blocks()
+
+        self.bits.align()
+        self.file.write(self.bits.take())
+        self.file.write(bytes((0xff, EOI)))
+
+    def encode_blocks(self):
+        """Codes the kept quantized blocks with the optimized tables."""
+        self.output = self.bits
+        self.predictors = [0, 0, 0]
+        components = self.mcu_components
+        size = len(components) * 64
+        tables = [(self.huffman_tables[0], self.huffman_tables[2]), (self.huffman_tables[1], self.huffman_tables[3])]
+
+        for mcu, start in enumerate(range(0, len(self.blocks), size)):
+            self.restart(mcu)
+
+            for i, component in enumerate(components):
+                block = self.blocks[start + i * 64:start + i * 64 + 64]
+                self.predictors[component] = encode_block(self.bits, block, self.predictors[component], *tables[min(component, 1)])
+
+            if len(self.bits.data) >= 1 << 16:
+                self.file.write(self.bits.take())
+
+    @staticmethod
+    def open(path, width, height, has_alpha=False, quality=75, subsampling='4:2:0', optimize=False, restart_interval=0):
+        """Opens a JPEG file for writing; JPEG has no alpha channel, so has_alpha is ignored."""
+        return JpegWriter(open(path, 'wb'), width, height, quality, subsampling, optimize, restart_interval)
+
+    def close(self):
+        try:
+            self.finish()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+def parse_huffman_tables(segment, dc_tables, ac_tables):
+    position = 0
+
+    while position < len(segment):
+        kind, id = segment[position] >> 4, segment[position] & 15
+        counts = segment[position + 1:position + 17]
+        total = sum(counts)
+        table = HuffmanTable(counts, segment[position + 17:position + 17 + total])
+        (ac_tables if kind else dc_tables)[id] = table
+        position += 17 + total
+
+
+def parse_quantization_tables(segment, tables):
+    """Parses quantization tables; values are kept in zig-zag order."""
+    position = 0
+
+    while position < len(segment):
+        precision, id = segment[position] >> 4, segment[position] & 15
+
+        if precision:
+            values = segment[position + 1:position + 129]
+            tables[id] = [int.from_bytes(values[i:i + 2], byteorder='big') for i in range(0, 128, 2)]
+            position += 129
+        else:
+            tables[id] = list(segment[position + 1:position + 65])
+            position += 65
+
+
+def cpu_count():
+    """Number of CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def worker_pool(workers):
+    """Starts a ProcessPoolExecutor of workers processes.
+
+    :return:
+        The executor, or None where processes cannot be started (inside
+        daemonic processes, or without the OS support multiprocessing needs)
+    """
+    if multiprocessing.current_process().daemon:
+        return None
+
+    executor = ProcessPoolExecutor(workers)
+
+    try:
+        executor.submit(int).result()
+    except (AssertionError, BrokenExecutor, NotImplementedError, OSError):
+        executor.shutdown(cancel_futures=True)
+        return None
+
+    return executor
+
+
+def parallel_samples(decoder, scan, mcus, workers, executor):
+    """Generator of the samples of every MCU of a sequential scan, as McuDecoder.samples, decoded by worker processes.
+
+    Every task is a run of restart intervals of about TASK_MCUS MCUs; a few
+    tasks per worker are in progress while the results are consumed in order.
+    The executor (see worker_pool) is shut down at the end.
+    """
+    intervals = -(-TASK_MCUS // scan.restart_interval)
+    size = intervals * scan.restart_interval
+    pending = deque()
+
+    with executor:
+        try:
+            for start in range(0, mcus, size):
+                segments = scan.segments[start // scan.restart_interval:start // scan.restart_interval + intervals]
+                pending.append(executor.submit(decoder.decode, segments, min(size, mcus - start)))
+
+                if len(pending) > workers * 2:
+                    yield from split_samples(pending.popleft().result(), decoder.mcu_size)
+
+            while pending:
+                yield from split_samples(pending.popleft().result(), decoder.mcu_size)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def split_samples(samples, mcu_size):
+    """Samples of consecutive MCUs split into those of every MCU."""
+    samples = memoryview(samples)
+    return (samples[i:i + mcu_size] for i in range(0, len(samples), mcu_size))
+
+
+def split_segments(data, position):
+    """Splits the entropy-coded data of a scan at its restart markers.
+
+    :return:
+        (segments, position of the marker ending the scan)
+    """
+    segments = []
+    start = position
+
+    while True:
+        match = MARKER.search(data, position)
+
+        if match is None:
+            segments.append(data[start:])
+            return segments, len(data)
+
+        marker = data[match.start() + 1]
+
+        if 0xd0 <= marker <= 0xd7:
+            segments.append(data[start:match.start()])
+            start = position = match.end()
+        else:
+            segments.append(data[start:match.start()])
+            return segments, match.start()
+
+
+def decode_block(reader, dc_table, ac_table, predictor, quantization):
+    """Decodes a sequential block into dequantized coefficients in natural order.
+
+    :return:
+        (DC predictor, coefficients), or (DC predictor, None) for a block without AC coefficients
+    """
+    t = reader.decode(dc_table)
+    predictor += reader.receive_extend(t)
+
+    block = None
+    k = 1
+
+    while k < 64:
+        rs = reader.decode(ac_table)
+        s = rs & 15
+
+        if s:
+            k += rs >> 4
+            if block is None:
+                block = [0] * 64
+            block[ZIGZAG[k]] = reader.receive_extend(s) * quantization[k]
+            k += 1
+        elif rs == 0xf0:
+            k += 16
+        else:
+            break
+
+    if block is not None:
+        block[0] = predictor * quantization[0]
+
+    return predictor, block
+
+
+def decode_dc(reader, dc_table, ac_table, predictor):
+    """Decodes the DC coefficient of a sequential block, skipping its AC coefficients.
+
+    :return:
+        DC predictor
+    """
+    t = reader.decode(dc_table)
+    predictor += reader.receive_extend(t)
+    k = 1
+
+    while k < 64:
+        rs = reader.decode(ac_table)
+        s = rs & 15
+
+        if s:
+            k += (rs >> 4) + 1
+            reader.read(s)
+        elif rs == 0xf0:
+            k += 16
+        else:
+            break
+
+    return predictor
+
+
+def decode_sequential(reader, dc_table, ac_table, predictor, block):
+    """Decodes a sequential block into quantized coefficients in natural order; returns the DC predictor."""
+    predictor += reader.receive_extend(reader.decode(dc_table))
+    block[0] = predictor
+    k = 1
+
+    while k < 64:
+        rs = reader.decode(ac_table)
+        s = rs & 15
+
+        if s:
+            k += rs >> 4
+            block[ZIGZAG[k]] = reader.receive_extend(s)
+            k += 1
+        elif rs == 0xf0:
+            k += 16
+        else:
+            break
+
+    return predictor
+
+
+def decode_ac_first(reader, table, start, end, low, block, eob_run):
+    """First progressive AC scan of a block (spectral selection start .. end, point transform low)."""
+    if eob_run[0]:
+        eob_run[0] -= 1
+        return
+
+    k = start
+
+    while k <= end:
+        rs = reader.decode(table)
+        r = rs >> 4
+        s = rs & 15
+
+        if s:
+            k += r
+            block[ZIGZAG[k]] = reader.receive_extend(s) << low
+            k += 1
+        elif r == 15:
+            k += 16
+        else:
+            eob_run[0] = (1 << r) - 1
+            if r:
+                eob_run[0] += reader.read(r)
+            break
+
+
+def decode_ac_refine(reader, table, start, end, low, block, eob_run):
+    """Refining progressive AC scan of a block: one more bit of every coefficient, and newly nonzero ones."""
+    positive = 1 << low
+    negative = -1 << low
+    k = start
+
+    if not eob_run[0]:
+        while k <= end:
+            rs = reader.decode(table)
+            r = rs >> 4
+            s = rs & 15
+            value = 0
+
+            if s:
+                value = positive if reader.read(1) else negative
+            elif r != 15:
+                eob_run[0] = 1 << r
+                if r:
+                    eob_run[0] += reader.read(r)
+                break
+
+            # Skip r zero coefficients, refining the nonzero ones passed on the way
+            while k <= end:
+                z = ZIGZAG[k]
+                if block[z]:
+                    if reader.read(1) and not block[z] & positive:
+                        block[z] += positive if block[z] >= 0 else negative
+                else:
+                    if r == 0:
+                        break
+                    r -= 1
+                k += 1
+
+            if value and k <= end:
+                block[ZIGZAG[k]] = value
+
+            k += 1
+
+    if eob_run[0]:
+        while k <= end:
+            z = ZIGZAG[k]
+            if block[z] and reader.read(1) and not block[z] & positive:
+                block[z] += positive if block[z] >= 0 else negative
+            k += 1
+
+        eob_run[0] -= 1
+
+
+def quantization_table(base, quality):
+    """Quantization table in zig-zag order scaled for quality 1 - 100 as by the IJG, limited to 8-bit values."""
+    scale = 5000 // quality if quality < 50 else 200 - quality * 2
+    return [min(255, max(1, (base[ZIGZAG[k]] * scale + 50) // 100)) for k in range(64)]
+
+
+def quantize(coefficients, divisors):
+    """Quantized coefficients in zig-zag order, rounded to the nearest integer (halves away from zero).
+
+    :param coefficients:
+        Coefficients in natural order, scaled up by 8 (as by coding.dct.fdct)
+    :param divisors:
+        8 x quantization table in zig-zag order
+    """
+    block = [coefficients[i] for i in ZIGZAG]
+    return [(value + (divisor >> 1)) // divisor if value >= 0 else -(((divisor >> 1) - value) // divisor)
+            for value, divisor in zip(block, divisors)]
+
+
+def encode_block(output, block, predictor, dc_table, ac_table):
+    """Huffman-codes a quantized block in zig-zag order.
+
+    :param output:
+        coding.huffman.BitWriter, or SymbolCounter with frequency lists for tables
+    :return:
+        DC coefficient of the block (the predictor of the next block)
+    """
+    difference = block[0] - predictor
+    size = abs(difference).bit_length()
+    output.encode(dc_table, size)
+
+    if size:
+        output.write(difference if difference > 0 else difference + (1 << size) - 1, size)
+
+    run = 0
+
+    for value in block[1:]:
+        if not value:
+            run += 1
+            continue
+
+        while run > 15:
+            output.encode(ac_table, 0xf0)
+            run -= 16
+
+        size = abs(value).bit_length()
+        output.encode(ac_table, run << 4 | size)
+        output.write(value if value > 0 else value + (1 << size) - 1, size)
+        run = 0
+
+    if run:
+        # End of block
+        output.encode(ac_table, 0)
+
+    return block[0]
+
+
+def downsample(plane, stride):
+    """Averages every 2 x 2 samples of a plane of rows of stride samples; alternating rounding avoids a bias."""
+    samples = bytearray()
+
+    for start in range(0, len(plane), stride * 2):
+        upper = plane[start:start + stride]
+        lower = plane[start + stride:start + stride * 2]
+        sums = [a + b + c + d for a, b, c, d in zip(upper[0::2], upper[1::2], lower[0::2], lower[1::2])]
+        samples += bytes([(value + 1 + (i & 1)) >> 2 for i, value in enumerate(sums)])
+
+    return samples
+
+
+def segment(marker, data):
+    """Marker segment with its length."""
+    return bytes((0xff, marker)) + (len(data) + 2).to_bytes(2, byteorder='big') + data
+
+
+def upsample(samples, nearer, factor, lower, width, fancy=True):
+    """Upsamples a component row to width samples.
+
+    With fancy, factors of 2 are interpolated with weights 3/4 and 1/4 of the
+    nearest and next nearest samples; other factors replicate samples.
+
+    :param nearer:
+        For vertical factor 2, the component row nearer to the output row (above it
+        for the upper output row, below it for the lower), else None
+    :param factor:
+        Horizontal factor
+    :param lower:
+        Whether the output row is the lower of the two rows of a vertical factor 2
+    """
+    if nearer is not None:
+        # Vertical triangle filter, keeping the sums (4 x samples) for the horizontal one
+        sums = [3 * a + b for a, b in zip(samples, nearer)]
+
+        if factor == 1:
+            bias = 2 if lower else 1
+            return bytes((value + bias) >> 2 for value in sums)[:width]
+
+        if factor == 2:
+            row = bytearray(len(sums) * 2)
+            row[0::2] = bytes((3 * a + b + 8) >> 4 for a, b in zip(sums, sums[:1] + sums[:-1]))
+            row[1::2] = bytes((3 * a + b + 7) >> 4 for a, b in zip(sums, sums[1:] + sums[-1:]))
+            return bytes(row[:width])
+
+    if factor == 1:
+        return bytes(samples[:width])
+
+    row = bytearray(len(samples) * factor)
+
+    if factor == 2 and fancy:
+        row[0::2] = bytes((3 * a + b + 1) >> 2 for a, b in zip(samples, samples[:1] + samples[:-1]))
+        row[1::2] = bytes((3 * a + b + 2) >> 2 for a, b in zip(samples, samples[1:] + samples[-1:]))
+    else:
+        for i in range(factor):
+            row[i::factor] = samples
+
+    return bytes(row[:width])
+
+
+def gray_to_rgba(samples, row):
+    for channel in (Image.RED, Image.GREEN, Image.BLUE):
+        row[channel::Image.PIXEL_SIZE] = samples[0]
+
+
+def rgb_to_rgba(samples, row):
+    for channel in (Image.RED, Image.GREEN, Image.BLUE):
+        row[channel::Image.PIXEL_SIZE] = samples[channel]
+
+
+def ycbcr_to_rgba(samples, row):
+    ys, cbs, crs = samples[:3]
+    row[Image.RED::Image.PIXEL_SIZE] = bytes([RANGE[y + CR_RED[cr]] for y, cr in zip(ys, crs)])
+    row[Image.GREEN::Image.PIXEL_SIZE] = bytes([RANGE[y + ((CB_GREEN[cb] + CR_GREEN[cr]) >> 16) + 256] for y, cb, cr in zip(ys, cbs, crs)])
+    row[Image.BLUE::Image.PIXEL_SIZE] = bytes([RANGE[y + CB_BLUE[cb]] for y, cb in zip(ys, cbs)])
+
+
+def cmyk_to_rgba(samples, row):
+    keys = samples[3]
+    for channel in (Image.RED, Image.GREEN, Image.BLUE):
+        row[channel::Image.PIXEL_SIZE] = bytes([(255 - value) * (255 - key) // 255 for value, key in zip(samples[channel], keys)])
+
+
+def inverted_cmyk_to_rgba(samples, row):
+    """Adobe applications store CMYK inverted (0 is full ink)."""
+    keys = samples[3]
+    for channel in (Image.RED, Image.GREEN, Image.BLUE):
+        row[channel::Image.PIXEL_SIZE] = bytes([value * key // 255 for value, key in zip(samples[channel], keys)])
+
+
+def ycck_to_rgba(samples, row):
+    """YCCK is inverted CMYK whose CMY part was converted like RGB to YCbCr."""
+    ycbcr_to_rgba(samples, row)
+    keys = samples[3]
+    for channel in (Image.RED, Image.GREEN, Image.BLUE):
+        row[channel::Image.PIXEL_SIZE] = bytes([(255 - value) * key // 255 for value, key in zip(row[channel::Image.PIXEL_SIZE], keys)])
+
+
+def probe(file):
+    """Reads the size and components of a JPEG from its frame header, skipping the segments before it."""
+    if file.read(2) != SIGNATURE:
+        raise ValueError('Not a JPEG file')
+
+    while True:
+        marker = file.read(2)
+
+        # Markers may be preceded by any number of fill bytes
+        while marker[1:] == b'\xff':
+            marker = marker[1:] + file.read(1)
+
+        if len(marker) < 2 or marker[0] != 0xff:
+            raise ValueError('Invalid JPEG file: no frame header found')
+
+        if 0xd0 <= marker[1] <= 0xd9 or marker[1] == 0x01:
+            # Standalone markers have no length
+            continue
+
+        length = int.from_bytes(file.read(2), byteorder='big')
+
+        if marker[1] in SOF_MARKERS:
+            data = file.read(6)
+            if len(data) < 6:
+                raise ValueError('Invalid JPEG file: truncated frame header')
+
+            precision = data[0]
+            height = int.from_bytes(data[1:3], byteorder='big')
+            width = int.from_bytes(data[3:5], byteorder='big')
+            components = data[5]
+            return ImageInfo('jpeg', width, height, precision, components)
+
+        file.seek(length - 2, 1)
+
+
+def read(path, scale=1, workers=None):
+    """Reads a JPEG file, at full size or reduced by a scale of SCALES; see JpegReader for workers."""
+    reader = JpegReader.open(path, scale, workers)
+    return reader.read_rows(0, reader.height)
+
+
+def reduced_scale(ratio):
+    """Smallest of SCALES not smaller than ratio: the size to decode at for scaling by ratio."""
+    return min(scale for scale in SCALES if scale >= min(ratio, 1))
+
+
+def write(image, path, quality=75, subsampling='4:2:0', optimize=False, restart_interval=0):
+    with JpegWriter.open(path, image.width, image.height, quality=quality, subsampling=subsampling, optimize=optimize,
+                         restart_interval=restart_interval) as writer:
+        writer.write_rows(0, image)
+
+
+if __name__ == '__main__':
+    import imageio
+
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Convert an image to JPEG')
+    parser.add_argument('input_file', metavar='image', help='image to be converted')
+    parser.add_argument('-o', '--out', dest='output_file', help='output JPEG file')
+    parser.add_argument('-q', '--quality', dest='quality', type=int, default=75, help='quality, 1 - 100')
+    parser.add_argument('-s', '--subsampling', dest='subsampling', default='4:2:0', choices=list(JpegWriter.SUBSAMPLING), help='chroma subsampling')
+    parser.add_argument('--optimize', dest='optimize', action='store_true', help='code with Huffman tables optimized for the image')
+    parser.add_argument('-r', '--restart-interval', dest='restart_interval', type=int, default=0, help='MCUs between restart markers (0 for none)')
+
+    args = parser.parse_args()
+
+    write(imageio.read(args.input_file), args.output_file, args.quality, args.subsampling, args.optimize, args.restart_interval)
@@ -0,0 +1,139 @@
+import io
+import multiprocessing
+import os
+
+import format.jpeg as jpeg
+from image import Image
+from unittest import TestCase
+
+
+def encode(image, strip_height=None, **options):
+    file = io.BytesIO()
+    writer = jpeg.JpegWriter(file, image.width, image.height, **options)
+    strip_height = strip_height or image.height
+
+    for start in range(0, image.height, strip_height):
+        count = min(strip_height, image.height - start)
+        strip = Image(image.width, count)
+        strip.pixels[:] = image.pixels[start * image.width * Image.PIXEL_SIZE:(start + count) * image.width * Image.PIXEL_SIZE]
+        writer.write_rows(start, strip)
+
+    writer.finish()
+    return file.getvalue()
+
+
+TESTDATA = os.path.join(os.path.dirname(__file__), 'testdata')
+
+
+def load(name):
+    with open(os.path.join(TESTDATA, name), 'rb') as file:
+        return file.read()
+
+
+def decode(data, scale=1, workers=None):
+    reader = jpeg.JpegReader(data, scale, workers)
+    return reader.read_rows(0, reader.height)
+
+
+def decode_pixels(data, workers):
+    return bytes(decode(data, workers=workers).pixels)
+
+
+class JpegTest(TestCase):
+
+    def setUp(self):
+        # Smooth colors, in a size that fills no MCU completely
+        self.image = Image(27, 21)
+        for x, y in self.image.coordinates:
+            self.image.set_rgb(x, y, (x * 9) << 16 | (y * 12) << 8 | (x + y) * 4)
+
+    def assertSimilar(self, expected, actual, tolerance):
+        self.assertEqual((expected.width, expected.height), (actual.width, actual.height))
+        differences = [abs(a - b) for a, b in zip(expected.pixels, actual.pixels)]
+        self.assertLessEqual(max(differences), tolerance)
+
+    def test_round_trip(self):
+        for subsampling in jpeg.JpegWriter.SUBSAMPLING:
+            self.assertSimilar(self.image, decode(encode(self.image, quality=95, subsampling=subsampling)), 12)
+
+    def test_strips(self):
+        self.assertEqual(encode(self.image), encode(self.image, strip_height=5))
+
+    def test_optimized_huffman_tables(self):
+        standard = encode(self.image)
+        optimized = encode(self.image, optimize=True)
+
+        self.assertLess(len(optimized), len(standard))
+        self.assertEqual(bytes(decode(standard).pixels), bytes(decode(optimized).pixels))
+
+    def test_restart_intervals(self):
+        data = encode(self.image, restart_interval=1)
+        self.assertEqual(4, len(jpeg.JpegReader(data).scans[0].segments))
+
+        expected = bytes(decode(encode(self.image)).pixels)
+        self.assertEqual(expected, bytes(decode(data, workers=1).pixels))
+        self.assertEqual(expected, bytes(decode(data, workers=2).pixels))
+        self.assertEqual(expected, bytes(decode(encode(self.image, optimize=True, restart_interval=2), workers=2).pixels))
+
+    def test_restart_intervals_in_daemonic_process(self):
+        # Pool workers cannot start processes of their own, so they decode serially
+        data = encode(self.image, restart_interval=1)
+        expected = bytes(decode(data).pixels)
+
+        with multiprocessing.Pool(1) as pool:
+            self.assertEqual([expected, expected], pool.starmap(decode_pixels, [(data, None), (data, 2)]))
+
+    def test_quality(self):
+        self.assertEqual([jpeg.LUMINANCE_QUANTIZATION[i] for i in jpeg.ZIGZAG], jpeg.quantization_table(jpeg.LUMINANCE_QUANTIZATION, 50))
+        self.assertEqual([1] * 64, jpeg.quantization_table(jpeg.CHROMINANCE_QUANTIZATION, 100))
+        self.assertLess(len(encode(self.image, quality=30)), len(encode(self.image, quality=90)))
+
+        with self.assertRaises(ValueError):
+            jpeg.JpegWriter(io.BytesIO(), 8, 8, quality=0)
+
+    def test_reduced_scale(self):
+        data = encode(self.image, quality=95)
+
+        for scale in jpeg.SCALES[1:]:
+            size = int(1 / scale)
+            expected = Image(-(-self.image.width // size), -(-self.image.height // size))
+
+            # Average of the pixels reduced into each pixel (the pixels the image has of them)
+            for x, y in expected.coordinates:
+                pixels = [(i, j) for i in range(x * size, min(self.image.width, x * size + size)) for j in range(y * size, min(self.image.height, y * size + size))]
+                for channel in (Image.RED, Image.GREEN, Image.BLUE):
+                    expected.pixels[expected.offset(x, y) + channel] = sum(self.image.pixels[self.image.offset(i, j) + channel] for i, j in pixels) // len(pixels)
+
+            self.assertSimilar(expected, decode(data, scale), 12)
+
+        self.assertEqual(1 / 2, jpeg.reduced_scale(0.3))
+        self.assertEqual(1 / 8, jpeg.reduced_scale(0.1))
+        self.assertEqual(1, jpeg.reduced_scale(0.75))
+
+
+class JpegFilesTest(TestCase):
+    """Decodes files of libjpeg: 35 x 21 pixels, quality 85, YCbCr 4:2:0 and Adobe CMYK.
+
+    The baseline and progressive file of each pair have the same coefficients,
+    and ycbcr.separate.jpg holds those of ycbcr.jpg in one scan per component,
+    so they must decode to the same pixels.
+    """
+
+    def assertSamePixels(self, name, other):
+        for scale in jpeg.SCALES:
+            expected = decode(load(name), scale)
+            self.assertEqual(bytes(expected.pixels), bytes(decode(load(other), scale).pixels))
+
+    def test_progressive(self):
+        self.assertSamePixels('ycbcr.jpg', 'ycbcr.progressive.jpg')
+        self.assertSamePixels('cmyk.jpg', 'cmyk.progressive.jpg')
+
+    def test_non_interleaved_scans(self):
+        self.assertSamePixels('ycbcr.jpg', 'ycbcr.separate.jpg')
+
+    def test_cmyk(self):
+        image = decode(load('cmyk.jpg'))
+
+        for (x, y), color in zip(((15, 8), (3, 3), (30, 18)), (0x9628a7, 0x1524bd, 0xd2d88b)):
+            actual = image.get_argb(x, y)
+            self.assertLessEqual(max(abs((actual >> shift & 0xff) - (color >> shift & 0xff)) for shift in (0, 8, 16)), 8)
@@ -1,7 +1,64 @@
+import io
+import zlib
+from itertools import accumulate
+
+from format.info import ImageInfo
+from image import Image
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+FILTER_NONE = 0
+FILTER_SUB = 1
+FILTER_UP = 2
+FILTER_AVERAGE = 3
+FILTER_PAETH = 4
+
+FILTERS = {'none': FILTER_NONE, 'sub': FILTER_SUB, 'up': FILTER_UP, 'average': FILTER_AVERAGE, 'paeth': FILTER_PAETH}
+
+# Magnitude of a filtered byte read as a signed value, for the adaptive filter heuristic
+COST = bytes(value if value < 128 else 256 - value for value in range(256))
+
+# Compressed data is emitted in IDAT chunks of at most this size
+IDAT_SIZE = 1 << 16
+
+# Largest part of the inflated stream held at once while decoding
+INFLATE_SIZE = 1 << 16
+
+# Adam7 passes: first column, first row, column step, row step and the size of
+# the block a pixel of the pass covers until the following passes are decoded
+ADAM7 = ((0, 0, 8, 8, 8, 8), (4, 0, 8, 8, 4, 8), (0, 4, 4, 8, 4, 4), (2, 0, 4, 4, 2, 4),
+         (0, 2, 2, 4, 2, 2), (1, 0, 2, 2, 1, 2), (0, 1, 1, 2, 1, 1))
+
+# Samples packed in a byte, for every bit depth below 8
+UNPACK = {depth: [bytes((value >> shift) & ((1 << depth) - 1) for shift in range(8 - depth, -1, -depth)) for value in range(256)]
+          for depth in (1, 2, 4)}
+
+
+def chunk(type, data):
+    """Serializes a chunk: length, type, data and CRC of type and data."""
+    return len(data).to_bytes(4, byteorder='big') + type + data + zlib.crc32(type + data).to_bytes(4, byteorder='big')
+
+
 class PngFormat:
 
-    def __init__(self, image):
+    def __init__(self, image, level=6, filter='adaptive', palette=False):
+        """
+        :param level:
+            zlib compression level, 0 (fastest) - 9 (smallest)
+        :param filter:
+            'adaptive' chooses the filter of every scanline by the minimum sum
+            of absolute differences; 'none', 'sub', 'up', 'average' or 'paeth'
+            use one filter for all scanlines, which is faster
+        :param palette:
+            Write an indexed-color image when the image has no alpha and at most 256 colors
+        """
+        if filter != 'adaptive' and filter not in FILTERS:
+            raise ValueError('Filter must be one of: adaptive, {}'.format(', '.join(FILTERS)))
+
         self.image = image
+        self.level = level
+        self.filter = filter
+        self.palette = Palette.from_image(image) if palette and not image.has_alpha_channel() else None
 
     @staticmethod
     def name():
@@ -16,28 +73,200 @@ class PngFormat:
         return ['.png']
 
     @property
-    def image_header(self) -> ImageHeader:
+    def image_header(self) -> 'ImageHeader':
         ihdr = ImageHeader()
         ihdr.width = self.image.width
         ihdr.height = self.image.height
 
-        if self.image.is_grayscale():
+        if self.palette is not None:
+            ihdr.color_type = ImageHeader.COLOR_TYPE_INDEXED_COLOR
+        elif self.image.is_grayscale():
             ihdr.color_type = ImageHeader.COLOR_TYPE_GREYSCALE_WITH_ALPHA if self.image.has_alpha_channel() else ImageHeader.COLOR_TYPE_GREYSCALE
         else:
             ihdr.color_type = ImageHeader.COLOR_TYPE_TRUECOLOR_WITH_ALPHA if self.image.has_alpha_channel() else ImageHeader.COLOR_TYPE_TRUECOLOR
 
-        ihdr.bit_depth = 0
+        ihdr.bit_depth = 8
         ihdr.compression_method = 0
         ihdr.filter_method = 0
         ihdr.interlace_method = 0
         return ihdr
 
+    def write_to(self, file):
+        """Writes the PNG to a binary file object, compressing one scanline at a time."""
+        writer = PngWriter(file, self.image_header, self.palette, self.level, self.filter)
+        writer.write_rows(0, self.image)
+        writer.finish()
+
     def __bytes__(self):
-        b = b'\x89PNG\r\n\x1a\n'
-        b += bytes(self.image_header)
-        b += bytes(ImageData(self.image))
-        b += bytes(ImageTrailer())
-        return b
+        stream = io.BytesIO()
+        self.write_to(stream)
+        return stream.getvalue()
+
+
+class PngWriter:
+    """Encodes the rows of an image into a PNG file from top to bottom, e.g. strip by strip.
+
+    Scanlines are filtered and fed to a zlib compressor as they come; the
+    compressed stream is written in IDAT chunks of at most IDAT_SIZE bytes.
+    """
+
+    def __init__(self, file, header, palette=None, level=6, filter='adaptive'):
+        if header.color_type == ImageHeader.COLOR_TYPE_INDEXED_COLOR and palette is None:
+            raise ValueError('Indexed-color images need a palette')
+
+        self.file = file
+        self.header = header
+        self.palette = palette
+        self.compressor = zlib.compressobj(level)
+        self.data = bytearray()
+        self.next_row = 0
+
+        # Filtering does not pay off for indexed colors (as recommended by the PNG specification)
+        self.filter = FILTER_NONE if palette is not None else None if filter == 'adaptive' else FILTERS[filter]
+        self.pixel_size = header.channels
+        self.previous = bytes(header.width * self.pixel_size)
+
+        file.write(SIGNATURE)
+        file.write(bytes(header))
+
+        if palette is not None:
+            file.write(bytes(palette))
+
+    def write_rows(self, start, image):
+        """Writes all rows of the image as rows start .. start + image.height - 1; rows must come in order."""
+        if start != self.next_row:
+            raise ValueError('PNG rows must be written in order: expected row {}, got {}'.format(self.next_row, start))
+
+        for y in range(image.height):
+            row = encode_row(image.row(y), self.header.color_type, self.palette)
+
+            if self.filter is None:
+                filtered = adaptive_filter(row, self.previous, self.pixel_size)
+            else:
+                filtered = bytes((self.filter,)) + filter_row(self.filter, row, self.previous, self.pixel_size)
+
+            self.data += self.compressor.compress(filtered)
+            self.previous = row
+
+            if len(self.data) >= IDAT_SIZE:
+                self.write_data(IDAT_SIZE)
+
+        self.next_row += image.height
+
+    def write_data(self, size):
+        """Writes buffered compressed data in IDAT chunks of the given size."""
+        while self.data and len(self.data) >= size:
+            self.file.write(bytes(ImageData(bytes(self.data[:size]))))
+            del self.data[:size]
+
+    def finish(self):
+        """Flushes the compressor and writes the trailer."""
+        if self.next_row != self.header.height:
+            raise ValueError('Image has {} rows, {} were written'.format(self.header.height, self.next_row))
+
+        self.data += self.compressor.flush()
+        self.write_data(IDAT_SIZE)
+        self.write_data(len(self.data))
+        self.file.write(bytes(ImageTrailer()))
+
+    @staticmethod
+    def open(path, width, height, has_alpha=False, level=6, filter='adaptive'):
+        """Opens a truecolor PNG file for writing."""
+        header = ImageHeader()
+        header.width = width
+        header.height = height
+        header.bit_depth = 8
+        header.color_type = ImageHeader.COLOR_TYPE_TRUECOLOR_WITH_ALPHA if has_alpha else ImageHeader.COLOR_TYPE_TRUECOLOR
+        return PngWriter(open(path, 'wb'), header, level=level, filter=filter)
+
+    def close(self):
+        try:
+            self.finish()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+def encode_row(row, color_type, palette=None):
+    """Converts a row of RGBA pixels into the samples of a PNG scanline of 8-bit depth."""
+    if color_type == ImageHeader.COLOR_TYPE_TRUECOLOR_WITH_ALPHA:
+        return bytes(row)
+
+    if color_type == ImageHeader.COLOR_TYPE_GREYSCALE:
+        return bytes(row[Image.RED::Image.PIXEL_SIZE])
+
+    if color_type == ImageHeader.COLOR_TYPE_INDEXED_COLOR:
+        rgb = encode_row(row, ImageHeader.COLOR_TYPE_TRUECOLOR)
+        indices = palette.indices
+        return bytes([indices[rgb[i:i + 3]] for i in range(0, len(rgb), 3)])
+
+    width = len(row) // Image.PIXEL_SIZE
+
+    if color_type == ImageHeader.COLOR_TYPE_TRUECOLOR:
+        samples = bytearray(width * 3)
+        samples[0::3] = row[Image.RED::Image.PIXEL_SIZE]
+        samples[1::3] = row[Image.GREEN::Image.PIXEL_SIZE]
+        samples[2::3] = row[Image.BLUE::Image.PIXEL_SIZE]
+    else:
+        samples = bytearray(width * 2)
+        samples[0::2] = row[Image.RED::Image.PIXEL_SIZE]
+        samples[1::2] = row[Image.ALPHA::Image.PIXEL_SIZE]
+
+    return bytes(samples)
+
+
+def filter_row(filter_type, row, previous, pixel_size):
+    """Filters a scanline against the previous (unfiltered) one.
+
+    :param pixel_size:
+        Bytes per complete pixel, the distance to the left neighbour of a byte
+    """
+    if filter_type == FILTER_NONE:
+        return row
+
+    if filter_type == FILTER_UP:
+        return bytes([(x - b) & 255 for x, b in zip(row, previous)])
+
+    left = bytes(pixel_size) + row[:-pixel_size]
+
+    if filter_type == FILTER_SUB:
+        return bytes([(x - a) & 255 for x, a in zip(row, left)])
+
+    if filter_type == FILTER_AVERAGE:
+        return bytes([(x - ((a + b) >> 1)) & 255 for x, a, b in zip(row, left, previous)])
+
+    upper_left = bytes(pixel_size) + previous[:-pixel_size]
+    return bytes([(x - (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 255
+                  for x, a, b, c in zip(row, left, previous, upper_left)
+                  for pa, pb, pc in ((abs(b - c), abs(a - c), abs(a + b - c - c)),)])
+
+
+def adaptive_filter(row, previous, pixel_size):
+    """Filters a scanline with the filter giving the minimum sum of absolute (signed) values.
+
+    :return:
+        Filter type byte followed by the filtered scanline
+    """
+    best = None
+    best_cost = None
+
+    for filter_type in (FILTER_NONE, FILTER_SUB, FILTER_UP, FILTER_AVERAGE, FILTER_PAETH):
+        filtered = filter_row(filter_type, row, previous, pixel_size)
+        cost = sum(filtered.translate(COST))
+
+        if best is None or cost < best_cost:
+            best = bytes((filter_type,)) + filtered
+            best_cost = cost
+
+    return best
 
 
 class ImageHeader:
@@ -48,6 +277,9 @@ class ImageHeader:
     COLOR_TYPE_GREYSCALE_WITH_ALPHA = 4
     COLOR_TYPE_TRUECOLOR_WITH_ALPHA = 6
 
+    # Samples per pixel of every color type
+    CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
     def __init__(self):
         self.width = 0
         self.height = 0
@@ -85,25 +317,47 @@ class ImageHeader:
         self._color_type = value
 
     @property
-    def crc(self):
-        return 0
+    def channels(self):
+        return ImageHeader.CHANNELS[self.color_type]
 
-    def __str__(self) -> str:
-        return 'IHRD'
+    @property
+    def has_alpha(self):
+        return self.color_type in (ImageHeader.COLOR_TYPE_GREYSCALE_WITH_ALPHA, ImageHeader.COLOR_TYPE_TRUECOLOR_WITH_ALPHA)
 
-    def __bytes__(self):
-        bytes = self.length.to_bytes(4, byteorder='big')
-        bytes += str(self).encode('ascii')
-        bytes += self.width.to_bytes(4, byteorder='big')
+    @staticmethod
+    def from_bytes(bytes):
+        """Parses the 13 data bytes of an IHDR chunk."""
+        ihdr = ImageHeader()
+        ihdr.width = int.from_bytes(bytes[0:4], byteorder='big')
+        ihdr.height = int.from_bytes(bytes[4:8], byteorder='big')
+        ihdr.bit_depth = bytes[8]
+        ihdr.color_type = bytes[9]
+        ihdr.compression_method = bytes[10]
+        ihdr.filter_method = bytes[11]
+        ihdr.interlace_method = bytes[12]
+        return ihdr
+
+    @property
+    def data(self):
+        bytes = self.width.to_bytes(4, byteorder='big')
         bytes += self.height.to_bytes(4, byteorder='big')
         bytes += self.bit_depth.to_bytes(1, byteorder='big')
         bytes += self.color_type.to_bytes(1, byteorder='big')
         bytes += self.compression_method.to_bytes(1, byteorder='big')
         bytes += self.filter_method.to_bytes(1, byteorder='big')
         bytes += self.interlace_method.to_bytes(1, byteorder='big')
-        bytes += self.crc.to_bytes(4, byteorder='big')
         return bytes
 
+    @property
+    def crc(self):
+        return zlib.crc32(str(self).encode('ascii') + self.data)
+
+    def __str__(self) -> str:
+        return 'IHDR'
+
+    def __bytes__(self):
+        return chunk(str(self).encode('ascii'), self.data)
+
 
 class Palette:
 
@@ -115,52 +369,69 @@ class Palette:
 
     @property
     def length(self) -> int:
-        return len(self.colors)
+        return len(self.colors) * 3
+
+    @property
+    def indices(self):
+        """Palette index of every color, keyed by its 3 RGB bytes."""
+        return {bytes(color): i for i, color in enumerate(self.colors)}
+
+    @property
+    def data(self):
+        return b''.join(bytes(color) for color in self.colors)
 
     @property
     def crc(self) -> int:
-        return 0
+        return zlib.crc32(b'PLTE' + self.data)
 
     @staticmethod
     def from_colors(colors: list):
-        if not 0 <= len(colors) < 256:
-            raise ValueError('At most 256 colors are allowed. Got {}.'.format(len(colors)))
+        if not 0 < len(colors) <= 256:
+            raise ValueError('Between 1 and 256 colors are allowed. Got {}.'.format(len(colors)))
 
         palette = Palette()
         palette.colors = colors
         return palette
 
+    @staticmethod
+    def from_image(image):
+        """Palette of all colors of the image, or None if there are more than 256."""
+        rgb = encode_row(memoryview(image.pixels), ImageHeader.COLOR_TYPE_TRUECOLOR)
+        colors = set()
+
+        for i in range(0, len(rgb), 3):
+            colors.add(rgb[i:i + 3])
+            if len(colors) > 256:
+                return None
+
+        return Palette.from_colors(sorted(tuple(color) for color in colors))
+
     def __bytes__(self) -> bytes:
         if self.length == 0:
-            raise 'Invalid PLTE. Must have between 1 and 256 entries. Currently has {}.'.format(self.length)
-
-        bytes = self.length.to_bytes(4, byteorder='big')
-        bytes += b'PLTE'
-        for color in self.colors:
-            bytes += color[0].to_bytes(1, byteorder='big')
-            bytes += color[1].to_bytes(1, byteorder='big')
-            bytes += color[2].to_bytes(1, byteorder='big')
-        bytes += self.crc.to_bytes(4, byteorder='big')
-        return bytes
+            raise ValueError('Invalid PLTE. Must have between 1 and 256 entries. Currently has {}.'.format(len(self.colors)))
+
+        return chunk(b'PLTE', self.data)
 
 
 class ImageData:
+    """An IDAT chunk, holding a part of the compressed scanlines."""
 
-    def __init__(self, image):
-        self.image = image
+    def __init__(self, data=b''):
+        self.data = data
 
     @property
     def length(self):
-        return 0
+        return len(self.data)
+
+    @property
+    def crc(self):
+        return zlib.crc32(b'IDAT' + self.data)
 
     def __str__(self):
         return 'IDAT'
 
     def __bytes__(self):
-        bytes = b''
-        bytes += str(self).encode('ascii')
-
-        return bytes
+        return chunk(str(self).encode('ascii'), self.data)
 
 
 class ImageTrailer:
@@ -169,4 +440,403 @@ class ImageTrailer:
         return 'IEND'
 
     def __bytes__(self):
-        return str(self).encode('ascii')
\ No newline at end of file
+        return chunk(str(self).encode('ascii'), b'')
+
+
+class PngReader:
+    """Decodes the rows of a PNG file from top to bottom.
+
+    IDAT chunks are read and inflated as the rows are needed, through a
+    zlib.decompressobj, and every scanline is unfiltered against the
+    previous one only, so the inflated stream is never held whole.
+    Samples of 16 bits are reduced to their high byte.
+
+    Interlaced (Adam7) images are decoded whole on the first request of
+    rows; progressive() yields the image after each of their passes.
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+        if file.read(len(SIGNATURE)) != SIGNATURE:
+            raise ValueError('Not a PNG file')
+
+        type, data = read_chunk(file)
+        if type != b'IHDR':
+            raise ValueError('Invalid PNG file: IHDR must be the first chunk')
+
+        self.header = ImageHeader.from_bytes(data)
+        self.palette = None
+        self.transparency = None
+
+        if self.header.interlace_method not in (0, 1):
+            raise ValueError('Unknown interlace method: {}'.format(self.header.interlace_method))
+
+        while True:
+            position = file.tell()
+            type, data = read_chunk(file)
+
+            if type == b'IDAT':
+                self.data_start = position
+                break
+            elif type == b'PLTE':
+                self.palette = Palette.from_colors([tuple(data[i:i + 3]) for i in range(0, len(data) - 2, 3)])
+            elif type == b'tRNS':
+                self.transparency = data
+            elif type == b'IEND':
+                raise ValueError('Invalid PNG file: no image data')
+
+        if self.header.color_type == ImageHeader.COLOR_TYPE_INDEXED_COLOR and self.palette is None:
+            raise ValueError('Invalid PNG file: indexed-color image without a palette')
+
+        self.width = self.header.width
+        self.height = self.header.height
+        self.pixel_size = max(1, self.header.channels * self.header.bit_depth // 8)
+        self.scanlines = None
+        self.interlaced_image = None
+        self.cache = []
+        self.cache_start = 0
+
+    @property
+    def has_alpha(self):
+        return self.header.has_alpha or self.transparency is not None
+
+    def image_data(self):
+        """Generator of the data of the IDAT chunks."""
+        self.file.seek(self.data_start)
+
+        while True:
+            type, data = read_chunk(self.file)
+
+            if type == b'IDAT':
+                yield data
+            elif type == b'IEND':
+                return
+
+    def inflate(self):
+        """Generator of parts of the inflated image data, of at most INFLATE_SIZE bytes each."""
+        decompressor = zlib.decompressobj()
+
+        for data in self.image_data():
+            while data:
+                yield decompressor.decompress(data, INFLATE_SIZE)
+                data = decompressor.unconsumed_tail
+
+        yield decompressor.flush()
+
+    def pass_sizes(self):
+        """Width and height of the reduced image of every Adam7 pass (0 for empty passes)."""
+        return [(max(0, (self.width - x + dx - 1) // dx), max(0, (self.height - y + dy - 1) // dy)) for x, y, dx, dy, _, _ in ADAM7]
+
+    def read_scanlines(self, sizes):
+        """Generator of the unfiltered scanlines of reduced images of the given sizes, stored one after another."""
+        inflated = self.inflate()
+        buffer = bytearray()
+
+        for width, height in sizes:
+            if not width or not height:
+                continue
+
+            stride = (width * self.header.channels * self.header.bit_depth + 7) // 8
+            previous = bytes(stride)
+
+            for _ in range(height):
+                while len(buffer) <= stride:
+                    data = next(inflated, None)
+                    if data is None:
+                        raise ValueError('Invalid PNG file: image data ends early')
+                    buffer += data
+
+                previous = unfilter_row(buffer[0], buffer[1:stride + 1], previous, self.pixel_size)
+                del buffer[:stride + 1]
+                yield previous
+
+    def read_rows(self, start, count):
+        """Decodes rows start .. start + count - 1 into a new image.
+
+        Rows are decoded in order; rows from the previous call can be requested
+        again cheaply, earlier rows restart decoding at the first row.
+        """
+        if self.header.interlace_method:
+            if self.interlaced_image is None:
+                for self.interlaced_image in self.progressive(fill=False):
+                    pass
+
+            row_size = self.interlaced_image.row_size
+            return Image.from_buffer(self.width, count, 'RGBA', self.interlaced_image.pixels[start * row_size:(start + count) * row_size])
+
+        if self.scanlines is None or start < self.cache_start:
+            self.scanlines = self.read_scanlines([(self.width, self.height)])
+            self.cache = []
+            self.cache_start = 0
+
+        skip = start - self.cache_start
+        cached = len(self.cache)
+        del self.cache[:skip]
+        self.cache_start = start
+
+        for _ in range(skip - cached):
+            next(self.scanlines)
+
+        image = Image(self.width, count)
+
+        while len(self.cache) < count:
+            row = bytearray(image.row_size)
+            self.decode_row(next(self.scanlines), row)
+            self.cache.append(row)
+
+        image.pixels[:] = b''.join(self.cache[:count])
+        return image
+
+    def progressive(self, fill=True):
+        """Generator of the image after each Adam7 pass, for previews shown while decoding.
+
+        The same image is refined in place by every pass, so callers can stop
+        as soon as the resolution suffices. Images that are not interlaced are
+        yielded once, complete.
+
+        :param fill:
+            Fill the pixels not decoded yet with the nearest decoded pixel above
+            and to the left, making every pass a blocky but complete picture
+        """
+        if not self.header.interlace_method:
+            yield self.read_rows(0, self.height)
+            return
+
+        width = self.width
+        image = Image(width, self.height)
+        pixels = memoryview(image.pixels).cast('I')
+        sizes = self.pass_sizes()
+        scanlines = self.read_scanlines(sizes)
+
+        for (x, y, dx, dy, block_width, block_height), (pass_width, pass_height) in zip(ADAM7, sizes):
+            row = bytearray(pass_width * Image.PIXEL_SIZE)
+            pass_pixels = memoryview(row).cast('I')
+
+            for j in range(pass_height if pass_width else 0):
+                self.decode_row(next(scanlines), row)
+                top = (y + j * dy) * width
+                line = pixels[top:top + width]
+                line[x::dx] = pass_pixels
+
+                if fill:
+                    for k in range(1, block_width):
+                        line[x + k::dx] = pass_pixels[:len(range(x + k, width, dx))]
+
+                    # Rows below hold no pixels of this or earlier passes yet
+                    for below in range(1, min(block_height, self.height - y - j * dy)):
+                        pixels[top + below * width:top + (below + 1) * width] = line
+
+            yield image
+
+    def samples(self, scanline, width):
+        """8-bit samples of a scanline of the given width in pixels, one byte each."""
+        depth = self.header.bit_depth
+
+        if depth == 16:
+            return scanline[0::2]
+
+        if depth < 8:
+            unpack = UNPACK[depth]
+            samples = b''.join([unpack[value] for value in scanline])[:width]
+
+            if self.header.color_type == ImageHeader.COLOR_TYPE_GREYSCALE:
+                scale = 255 // ((1 << depth) - 1)
+                return samples.translate(bytes(min(255, value * scale) for value in range(256)))
+
+            return samples
+
+        return scanline
+
+    def transparent_key(self, scanline, width):
+        """Alpha of the pixels of a grayscale or truecolor scanline, 0 where the pixel matches the tRNS color."""
+        depth = self.header.bit_depth
+        key = self.transparency
+
+        if self.header.color_type == ImageHeader.COLOR_TYPE_GREYSCALE:
+            value = int.from_bytes(key[0:2], byteorder='big')
+
+            if depth == 16:
+                return bytes([0 if scanline[i:i + 2] == key[0:2] else 255 for i in range(0, len(scanline), 2)])
+
+            samples = b''.join([UNPACK[depth][byte] for byte in scanline])[:width] if depth < 8 else scanline
+            return bytes([0 if sample == value else 255 for sample in samples])
+
+        key = bytes(key[0:6]) if depth == 16 else bytes(key[1:6:2])
+        size = len(key)
+        return bytes([0 if scanline[i:i + size] == key else 255 for i in range(0, len(scanline), size)])
+
+    def decode_row(self, scanline, row):
+        """Converts an unfiltered scanline into RGBA pixels."""
+        color_type = self.header.color_type
+        width = len(row) // Image.PIXEL_SIZE
+        samples = self.samples(scanline, width)
+        alpha = None
+
+        if color_type == ImageHeader.COLOR_TYPE_INDEXED_COLOR:
+            colors = self.palette.colors
+            for channel in (Image.RED, Image.GREEN, Image.BLUE):
+                table = bytes(color[channel] for color in colors) + bytes(256 - len(colors))
+                row[channel::Image.PIXEL_SIZE] = samples.translate(table)
+
+            if self.transparency is not None:
+                alpha = samples.translate(bytes(self.transparency[:256]) + b'\xff' * (256 - len(self.transparency[:256])))
+
+        elif color_type in (ImageHeader.COLOR_TYPE_GREYSCALE, ImageHeader.COLOR_TYPE_GREYSCALE_WITH_ALPHA):
+            step = 2 if color_type == ImageHeader.COLOR_TYPE_GREYSCALE_WITH_ALPHA else 1
+            for channel in (Image.RED, Image.GREEN, Image.BLUE):
+                row[channel::Image.PIXEL_SIZE] = samples[0::step]
+
+            if step == 2:
+                alpha = samples[1::2]
+            elif self.transparency is not None:
+                alpha = self.transparent_key(scanline, width)
+
+        elif color_type == ImageHeader.COLOR_TYPE_TRUECOLOR:
+            row[Image.RED::Image.PIXEL_SIZE] = samples[0::3]
+            row[Image.GREEN::Image.PIXEL_SIZE] = samples[1::3]
+            row[Image.BLUE::Image.PIXEL_SIZE] = samples[2::3]
+
+            if self.transparency is not None:
+                alpha = self.transparent_key(scanline, width)
+
+        else:
+            row[:] = samples
+
+        if alpha is not None:
+            row[Image.ALPHA::Image.PIXEL_SIZE] = alpha
+
+    @staticmethod
+    def open(path):
+        return PngReader(open(path, 'rb'))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_chunk(file):
+    """Reads the next chunk of a file and checks its CRC.
+
+    :return:
+        (type, data)
+    """
+    head = file.read(8)
+
+    if len(head) < 8:
+        raise ValueError('Invalid PNG file: unexpected end of file')
+
+    length = int.from_bytes(head[0:4], byteorder='big')
+    type = head[4:8]
+    data = file.read(length)
+    crc = file.read(4)
+
+    if len(data) < length or len(crc) < 4:
+        raise ValueError('Invalid PNG file: unexpected end of file in {} chunk'.format(type.decode('ascii', 'replace')))
+
+    if zlib.crc32(type + data) != int.from_bytes(crc, byteorder='big'):
+        raise ValueError('Invalid PNG file: CRC mismatch in {} chunk'.format(type.decode('ascii', 'replace')))
+
+    return type, data
+
+
+def unfilter_row(filter_type, line, previous, pixel_size):
+    """Reverses the filter of a scanline given the previous unfiltered one.
+
+    Sub, Average and Paeth depend on the reconstructed left neighbour, so each
+    of the pixel_size byte lanes of the scanline is reconstructed in one pass.
+    """
+    if filter_type == FILTER_NONE:
+        return bytes(line)
+
+    if filter_type == FILTER_UP:
+        return bytes([(x + b) & 255 for x, b in zip(line, previous)])
+
+    row = bytearray(line)
+
+    for k in range(pixel_size):
+        lane = line[k::pixel_size]
+
+        if filter_type == FILTER_SUB:
+            row[k::pixel_size] = bytes([value & 255 for value in accumulate(lane)])
+            continue
+
+        above = previous[k::pixel_size]
+        output = bytearray(len(lane))
+        a = 0
+        i = 0
+
+        if filter_type == FILTER_AVERAGE:
+            for x, b in zip(lane, above):
+                a = (x + ((a + b) >> 1)) & 255
+                output[i] = a
+                i += 1
+
+        elif filter_type == FILTER_PAETH:
+            c = 0
+            for x, b in zip(lane, above):
+                pa = abs(b - c)
+                pb = abs(a - c)
+                pc = abs(a + b - c - c)
+                a = (x + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 255
+                c = b
+                output[i] = a
+                i += 1
+
+        else:
+            raise ValueError('Invalid PNG file: unknown filter type {}'.format(filter_type))
+
+        row[k::pixel_size] = output
+
+    return bytes(row)
+
+
+def probe(file):
+    """Reads the size and pixel format of a PNG from the IHDR chunk at the start of a binary file."""
+    data = file.read(len(SIGNATURE) + 8 + 13)
+
+    if len(data) < len(SIGNATURE) + 8 + 13 or not data.startswith(SIGNATURE) or data[12:16] != b'IHDR':
+        raise ValueError('Not a PNG file')
+
+    ihdr = ImageHeader.from_bytes(data[16:])
+    return ImageInfo('png', ihdr.width, ihdr.height, ihdr.bit_depth, ihdr.channels, ihdr.has_alpha)
+
+
+def read(path):
+    with PngReader.open(path) as reader:
+        image = reader.read_rows(0, reader.height)
+        image.has_alpha = reader.has_alpha
+        return image
+
+
+def progressive(path, fill=True):
+    """Generator of the image of a PNG file after each interlacing pass (see PngReader.progressive)."""
+    with PngReader.open(path) as reader:
+        yield from reader.progressive(fill)
+
+
+def write(image, path, level=6, filter='adaptive', palette=False):
+    with open(path, 'wb') as file:
+        PngFormat(image, level, filter, palette).write_to(file)
+
+
+if __name__ == '__main__':
+    import imageio
+
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Convert an image to PNG')
+    parser.add_argument('input_file', metavar='image', help='image to be converted')
+    parser.add_argument('-o', '--out', dest='output_file', help='output PNG file')
+    parser.add_argument('-l', '--level', dest='level', type=int, default=6, help='compression level, 0 - 9')
+    parser.add_argument('-f', '--filter', dest='filter', default='adaptive', choices=['adaptive'] + list(FILTERS), help='scanline filter')
+    parser.add_argument('-p', '--palette', dest='palette', action='store_true', help='write indexed colors when possible')
+
+    args = parser.parse_args()
+
+    write(imageio.read(args.input_file), args.output_file, args.level, args.filter, args.palette)
@@ -0,0 +1,117 @@
+import io
+import zlib
+
+import format.png as png
+from image import Image
+from unittest import TestCase
+
+
+def chunks(data):
+    i = len(png.SIGNATURE)
+    while i < len(data):
+        length = int.from_bytes(data[i:i + 4], byteorder='big')
+        yield data[i + 4:i + 8], data[i + 8:i + 8 + length], int.from_bytes(data[i + 8 + length:i + 12 + length], byteorder='big')
+        i += length + 12
+
+
+class PngWriterTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(16, 8)
+        for x, y in self.image.coordinates:
+            self.image.set_rgb(x, y, (x * 16) << 16 | (y * 32) << 8 | 0x40)
+
+    def test_chunks_have_valid_crcs(self):
+        data = bytes(png.PngFormat(self.image))
+        self.assertTrue(data.startswith(png.SIGNATURE))
+
+        types = []
+        for type, chunk_data, crc in chunks(data):
+            self.assertEqual(zlib.crc32(type + chunk_data), crc)
+            types.append(type)
+
+        self.assertEqual([b'IHDR', b'IDAT', b'IEND'], types)
+
+    def test_scanlines(self):
+        data = bytes(png.PngFormat(self.image, filter='sub'))
+        header = png.ImageHeader.from_bytes(next(chunks(data))[1])
+        self.assertEqual((16, 8, 8, png.ImageHeader.COLOR_TYPE_TRUECOLOR), (header.width, header.height, header.bit_depth, header.color_type))
+
+        scanlines = zlib.decompress(b''.join(chunk_data for type, chunk_data, _ in chunks(data) if type == b'IDAT'))
+        self.assertEqual(8 * (1 + 16 * 3), len(scanlines))
+        self.assertEqual(bytes([png.FILTER_SUB, 0, 0, 0x40, 16, 0, 0]), scanlines[:7])
+
+    def test_adaptive_filter(self):
+        row = bytes(range(0, 240, 10))
+        self.assertEqual(png.FILTER_SUB, png.adaptive_filter(row, bytes(len(row)), 3)[0])
+        self.assertEqual(png.FILTER_UP, png.adaptive_filter(row, row, 3)[0])
+
+
+class PngReaderTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(12, 10)
+        for x, y in self.image.coordinates:
+            self.image.set_argb(x, y, (0x80 + x * y) << 24 | (x * 20) << 16 | (y * 25) << 8 | (x * y) % 256)
+
+    def read(self, data):
+        reader = png.PngReader(io.BytesIO(data))
+        return reader.read_rows(0, reader.height)
+
+    def test_round_trip(self):
+        for filter in ['adaptive'] + list(png.FILTERS):
+            image = self.read(bytes(png.PngFormat(self.image, filter=filter)))
+            self.assertEqual(bytes(self.image.pixels), bytes(image.pixels), filter)
+
+    def test_sixteen_bit_grayscale(self):
+        header = png.ImageHeader()
+        header.width, header.height, header.bit_depth, header.color_type = 2, 1, 16, png.ImageHeader.COLOR_TYPE_GREYSCALE
+        data = png.SIGNATURE + bytes(header) + png.chunk(b'IDAT', zlib.compress(b'\x00\x12\x34\xab\xcd')) + png.chunk(b'IEND', b'')
+
+        self.assertEqual(b'\x12\x12\x12\x00\xab\xab\xab\x00', bytes(self.read(data).pixels))
+
+    def test_rows_in_strips(self):
+        reader = png.PngReader(io.BytesIO(bytes(png.PngFormat(self.image))))
+        reader.read_rows(0, 4)
+        strip = reader.read_rows(2, 6)
+        self.assertEqual(bytes(self.image.pixels[2 * 48:8 * 48]), bytes(strip.pixels))
+
+    def test_corrupt_chunk(self):
+        data = bytearray(bytes(png.PngFormat(self.image)))
+        data[20] ^= 1
+        self.assertRaises(ValueError, self.read, bytes(data))
+
+
+class InterlaceTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(11, 9)
+        for x, y in self.image.coordinates:
+            self.image.set_argb(x, y, 0xff000000 | (x * 23) << 16 | (y * 28) << 8 | (x ^ y))
+
+        header = png.ImageHeader()
+        header.width, header.height, header.bit_depth = 11, 9, 8
+        header.color_type = png.ImageHeader.COLOR_TYPE_TRUECOLOR_WITH_ALPHA
+        header.interlace_method = 1
+
+        scanlines = b''
+        for x, y, dx, dy, _, _ in png.ADAM7:
+            for row in range(y, 9, dy):
+                if x < 11:
+                    scanlines += b'\x00' + b''.join(bytes(self.image.row(row)[column * 4:column * 4 + 4]) for column in range(x, 11, dx))
+
+        self.data = png.SIGNATURE + bytes(header) + png.chunk(b'IDAT', zlib.compress(scanlines)) + png.chunk(b'IEND', b'')
+
+    def test_read(self):
+        reader = png.PngReader(io.BytesIO(self.data))
+        self.assertEqual(bytes(self.image.pixels), bytes(reader.read_rows(0, 9).pixels))
+
+    def test_progressive(self):
+        previews = [bytes(image.pixels) for image in png.PngReader(io.BytesIO(self.data)).progressive()]
+        self.assertEqual(7, len(previews))
+        self.assertEqual(bytes(self.image.pixels), previews[-1])
+
+        # After the first pass every pixel repeats the top left one of its 8 x 8 block
+        first = previews[0]
+        self.assertEqual(first[:4] * 8, first[:32])
+        self.assertEqual(bytes(self.image.row(8)[32:36]), first[-4:])
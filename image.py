@@ -1,14 +1,20 @@
 from color.lab import LabColor
 from color.rgb import RgbColor
-from matrix import MatrixIterator
+from matrix import MatrixIterator, array_interface
 
 
 class Image:
     """Represents an image of pixels, each of one has its own RGB value.
 
+    Pixels are stored in a single contiguous buffer, row by row, each pixel
+    taking four bytes in R, G, B, A order. Pixel (x, y) therefore starts at
+    offset (y * width + x) * 4 of `pixels`.
+
     Public attributes:
     - width: Image width in pixels
     - height: Image height in pixels
+    - pixels: Interleaved RGBA pixel buffer (a bytearray, or a memoryview of
+      foreign memory for images created by `from_buffer`)
 
     Public methods:
     - red: Returns red color value on (x, y). The value is between 0 and 255.
@@ -19,33 +25,68 @@ class Image:
     - blue_double: Returns blue color value on (x, y). The value is between 0 and 0.1.
     """
 
+    RED = 0
+    GREEN = 1
+    BLUE = 2
+    ALPHA = 3
+
+    PIXEL_SIZE = 4
+
+    MODES = {'RGBA': 4, 'RGB': 3, 'L': 1}
+
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.alphas = []
-        self.reds = []
-        self.greens = []
-        self.blues = []
+        self.pixels = bytearray(width * height * Image.PIXEL_SIZE)
         self.coordinates = Coordinates(self)
 
-        for _ in range(width):
-            self.alphas.append([0] * height)
-            self.reds.append([0] * height)
-            self.greens.append([0] * height)
-            self.blues.append([0] * height)
-
     @property
     def size(self):
         return self.width * self.height
 
+    @property
+    def row_size(self):
+        return self.width * Image.PIXEL_SIZE
+
+    @property
+    def alphas(self):
+        return ChannelView(self, Image.ALPHA)
+
+    @property
+    def reds(self):
+        return ChannelView(self, Image.RED)
+
+    @property
+    def greens(self):
+        return ChannelView(self, Image.GREEN)
+
+    @property
+    def blues(self):
+        return ChannelView(self, Image.BLUE)
+
+    def offset(self, x, y):
+        return (y * self.width + x) * Image.PIXEL_SIZE
+
+    def row(self, y):
+        """Returns a writable view of the y-th row of `pixels`."""
+        start = y * self.row_size
+        return memoryview(self.pixels)[start:start + self.row_size]
+
+    def get_channel(self, channel):
+        """Returns all values of one channel (e.g. Image.RED) as bytes, row by row."""
+        return bytes(self.pixels[channel::Image.PIXEL_SIZE])
+
+    def set_channel(self, channel, values):
+        self.pixels[channel::Image.PIXEL_SIZE] = values
+
     def has_alpha_channel(self):
-        return any(any(value > 0 for value in column) for column in self.alphas)
+        return any(self.pixels[Image.ALPHA::Image.PIXEL_SIZE])
 
     def get_alpha(self, x, y, result_type=int):
         if result_type not in [int, float]:
             raise ValueError('Return type must be one of: int, float')
 
-        alpha = self.alphas[x][y]
+        alpha = self.pixels[self.offset(x, y) + Image.ALPHA]
         return alpha if result_type is int else alpha / 255
 
     def get_red(self, x, y, result_type=int):
@@ -61,40 +102,52 @@ class Image:
         if result_type not in [int, float]:
             raise ValueError('Return type must be one of: int, float')
 
-        red = self.reds[x][y]
+        red = self.pixels[self.offset(x, y) + Image.RED]
         return red if result_type is int else red / 255
 
     def get_green(self, x, y, result_type=int):
         if result_type not in [int, float]:
             raise ValueError('Return type must be one of: int, float')
 
-        green = self.greens[x][y]
+        green = self.pixels[self.offset(x, y) + Image.GREEN]
         return green if result_type is int else green / 255
 
     def get_blue(self, x, y, result_type=int):
         if result_type not in [int, float]:
             raise ValueError('Return type must be one of: int, float')
 
-        blue = self.blues[x][y]
+        blue = self.pixels[self.offset(x, y) + Image.BLUE]
         return blue if result_type is int else blue / 255
 
+    def alpha(self, x, y, type=int):
+        return self.get_alpha(x, y, type)
+
+    def red(self, x, y, type=int):
+        return self.get_red(x, y, type)
+
+    def green(self, x, y, type=int):
+        return self.get_green(x, y, type)
+
+    def blue(self, x, y, type=int):
+        return self.get_blue(x, y, type)
+
     def get_argb(self, x, y):
-        argb = self.alphas[x][y]
-        argb <<= 8
-        argb += self.reds[x][y]
-        argb <<= 8
-        argb += self.greens[x][y]
-        argb <<= 8
-        argb += self.blues[x][y]
-        return argb
+        i = self.offset(x, y)
+        r, g, b, a = self.pixels[i:i + Image.PIXEL_SIZE]
+        return a << 24 | r << 16 | g << 8 | b
 
     def get_color(self, x, y):
-        return RgbColor(self.reds[x][y], self.greens[x][y], self.blues[x][y])
+        i = self.offset(x, y)
+        return RgbColor(self.pixels[i], self.pixels[i + 1], self.pixels[i + 2])
 
     def get_luminance(self, x, y):
-        lab = LabColor.from_rgb(self.reds[x][y], self.greens[x][y], self.blues[x][y])
+        i = self.offset(x, y)
+        lab = LabColor.from_rgb(self.pixels[i], self.pixels[i + 1], self.pixels[i + 2])
         return lab.l
 
+    def set_alpha(self, x, y, value):
+        self.pixels[self.offset(x, y) + Image.ALPHA] = value if type(value) is int else int(value * 255)
+
     def set_red(self, x, y, value):
         """
         Set red color on given coordinates. Red can be supplied either as
@@ -104,21 +157,86 @@ class Image:
         :param y:
         :param value:
         """
-        self.reds[x][y] = value if type(value) is int else int(value * 255)
+        self.pixels[self.offset(x, y) + Image.RED] = value if type(value) is int else int(value * 255)
 
     def set_green(self, x, y, value):
-        self.greens[x][y] = value if type(value) is int else int(value * 255)
+        self.pixels[self.offset(x, y) + Image.GREEN] = value if type(value) is int else int(value * 255)
 
     def set_blue(self, x, y, value):
-        self.blues[x][y] = value if type(value) is int else int(value * 255)
+        self.pixels[self.offset(x, y) + Image.BLUE] = value if type(value) is int else int(value * 255)
 
     def set_rgb(self, x, y, value):
-        self.reds[x][y] = (value >> 16) & 0xff
-        self.greens[x][y] = (value >> 8) & 0xff
-        self.blues[x][y] = value & 0xff
+        i = self.offset(x, y)
+        self.pixels[i] = (value >> 16) & 0xff
+        self.pixels[i + 1] = (value >> 8) & 0xff
+        self.pixels[i + 2] = value & 0xff
+
+    def set_argb(self, x, y, value):
+        i = self.offset(x, y)
+        self.pixels[i:i + Image.PIXEL_SIZE] = bytes(((value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff, (value >> 24) & 0xff))
 
     def is_grayscale(self):
-        return all(self.reds[x][y] == self.greens[x][y] == self.blues[x][y] for x, y in self)
+        reds = self.pixels[Image.RED::Image.PIXEL_SIZE]
+        return reds == self.pixels[Image.GREEN::Image.PIXEL_SIZE] == self.pixels[Image.BLUE::Image.PIXEL_SIZE]
+
+    def memoryview(self):
+        """Returns a (height, width, 4) view of the pixels, sharing memory with the image."""
+        return memoryview(self.pixels).cast('B', (self.height, self.width, Image.PIXEL_SIZE))
+
+    def __buffer__(self, flags):
+        """Exports the pixels through the buffer protocol (PEP 688).
+
+        Only Python 3.12 and later call this for `memoryview(image)`; on 3.11
+        that raises TypeError, so use `image.memoryview()` there.
+        """
+        return self.memoryview()
+
+    @property
+    def __array_interface__(self):
+        return array_interface(self.pixels, (self.height, self.width, Image.PIXEL_SIZE))
+
+    @staticmethod
+    def from_buffer(width, height, mode, buffer):
+        """Creates an image from pixel data in any object supporting the buffer protocol.
+
+        :param mode:
+            Layout of the pixels in the buffer: 'RGBA', 'RGB' or 'L' (8-bit gray).
+            'RGBA' buffers are wrapped without copying, so the image and the
+            buffer share memory. Other modes are converted into a new buffer.
+        """
+        if mode not in Image.MODES:
+            raise ValueError('Mode must be one of: {}'.format(', '.join(Image.MODES)))
+
+        view = memoryview(buffer).cast('B')
+        pixel_size = Image.MODES[mode]
+
+        if len(view) != width * height * pixel_size:
+            raise ValueError('Buffer of {} bytes does not hold {} x {} {} pixels'.format(len(view), width, height, mode))
+
+        image = Image(0, 0)
+        image.width = width
+        image.height = height
+
+        if mode == 'RGBA':
+            image.pixels = view
+            return image
+
+        image.pixels = bytearray(width * height * Image.PIXEL_SIZE)
+
+        if mode == 'RGB':
+            image.set_channel(Image.RED, view[0::3])
+            image.set_channel(Image.GREEN, view[1::3])
+            image.set_channel(Image.BLUE, view[2::3])
+        else:
+            for channel in (Image.RED, Image.GREEN, Image.BLUE):
+                image.set_channel(channel, view)
+
+        return image
+
+    def copy(self):
+        image = Image(self.width, self.height)
+        image.pixels[:] = self.pixels
+        return image
 
     def __str__(self):
         return 'Image {} x {} px'.format(self.width, self.height)
@@ -127,6 +245,37 @@ class Image:
         return PixelIterator(self)
 
 
+class ChannelView:
+    """Compatibility accessor allowing `image.reds[x][y]` style indexing into the pixel buffer."""
+
+    def __init__(self, image, channel):
+        self.image = image
+        self.channel = channel
+
+    def __getitem__(self, x):
+        return ChannelColumn(self.image, self.channel, x)
+
+    def __len__(self):
+        return self.image.width
+
+
+class ChannelColumn:
+
+    def __init__(self, image, channel, x):
+        self.image = image
+        self.channel = channel
+        self.x = x
+
+    def __getitem__(self, y):
+        return self.image.pixels[self.image.offset(self.x, y) + self.channel]
+
+    def __setitem__(self, y, value):
+        self.image.pixels[self.image.offset(self.x, y) + self.channel] = value
+
+    def __len__(self):
+        return self.image.height
+
+
 class PixelIterator:
 
     def __init__(self, image):
@@ -28,6 +28,24 @@ class ImageTest(TestCase):
         green = self.image.green(0, 0, type=float)
         self.assertEqual(0.6, green)
 
+    def test_pixels_are_row_major_rgba(self):
+        self.image.set_argb(3, 2, 0x80102030)
+        offset = (2 * 100 + 3) * 4
+        self.assertEqual(b'\x10\x20\x30\x80', self.image.pixels[offset:offset + 4])
+        self.assertEqual(0x80102030, self.image.get_argb(3, 2))
+
+    def test_channel_view(self):
+        self.image.reds[5][7] = 42
+        self.assertEqual(42, self.image.get_red(5, 7))
+        self.assertEqual(240, self.image.blues[0][0])
+
+    def test_from_buffer_shares_memory(self):
+        buffer = bytearray(2 * 2 * 4)
+        image = Image.from_buffer(2, 2, 'RGBA', buffer)
+        image.set_green(1, 1, 99)
+        self.assertEqual(99, buffer[13])
+        self.assertEqual(99, image.memoryview()[1, 1, 1])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
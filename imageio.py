@@ -1,11 +1,132 @@
+import os
+
 import format.bmp as bmp
+import format.jpeg as jpeg
+import format.png as png
+
+# Header probes by file signature
+PROBES = ((bmp.SIGNATURE, bmp.probe), (png.SIGNATURE, png.probe), (jpeg.SIGNATURE, jpeg.probe))
+
+
+def read(path, scale=1):
+    """Reads an image in the format given by the extension of the path.
 
+    :param scale:
+        Reduced size to decode JPEG files at, one of format.jpeg.SCALES; other formats are read at full size only
+    """
+    if scale != 1 and not path.endswith(('.jpg', '.jpeg')):
+        raise ValueError('Reading at reduced size is supported for JPEG files only: {}'.format(path))
 
-def read(path):
     if path.endswith('.bmp'):
         return bmp.read(path)
+    elif path.endswith('.png'):
+        return png.read(path)
+    elif path.endswith(('.jpg', '.jpeg')):
+        return jpeg.read(path, scale)
 
+    raise ValueError('Unsupported image format: {}'.format(path))
 
-def write(image, path):
+
+def write(image, path, **options):
+    """Writes an image in the format given by the extension of the path.
+
+    :param options:
+        Options of the format writer, e.g. level, filter and palette of format.png.write
+        or quality, subsampling and optimize of format.jpeg.write
+    """
     if path.endswith('.bmp'):
-        bmp.write(image, path)
\ No newline at end of file
+        bmp.write(image, path)
+    elif path.endswith('.png'):
+        png.write(image, path, **options)
+    elif path.endswith(('.jpg', '.jpeg')):
+        jpeg.write(image, path, **options)
+    else:
+        raise ValueError('Unsupported image format: {}'.format(path))
+
+
+def probe(path):
+    """Reads format, size, bit depth and alpha presence of an image file from its header only.
+
+    The format is recognized by the file signature, not by the extension.
+
+    :return:
+        format.info.ImageInfo
+    """
+    with open(path, 'rb') as file:
+        head = file.read(8)
+
+        for signature, function in PROBES:
+            if head.startswith(signature):
+                file.seek(0)
+                return function(file)
+
+    raise ValueError('Unknown image format: {}'.format(path))
+
+
+def probe_all(directory, recursive=False):
+    """Probes all image files in a directory, skipping other files.
+
+    :return:
+        Generator of (path, ImageInfo)
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if recursive:
+                    yield from probe_all(entry.path, recursive)
+                continue
+
+            try:
+                info = probe(entry.path)
+            except (ValueError, OSError):
+                continue
+
+            yield entry.path, info
+
+
+def edit(path, *operations):
+    """Applies point operations (operations.point) to an image file in place.
+
+    BMP files are edited through a memory map, without decoding them into an image.
+    """
+    from functools import reduce
+
+    operation = reduce(lambda first, second: first.then(second), operations)
+
+    if path.endswith('.bmp'):
+        bmp.edit(path, operation)
+    else:
+        image = read(path)
+        operation.apply(image)
+        write(image, path)
+
+
+def stream(input_path, output_path, *operations, strip_height=256):
+    """Applies operations to an image file in strips of rows, without loading it whole.
+
+    :param operations:
+        Point operations (operations.point) and strip operations (operations.streaming)
+    """
+    from operations import streaming
+
+    if input_path.endswith('.bmp'):
+        open_reader = bmp.BmpReader.open
+    elif input_path.endswith('.png'):
+        open_reader = png.PngReader.open
+    elif input_path.endswith(('.jpg', '.jpeg')):
+        open_reader = jpeg.JpegReader.open
+    else:
+        raise ValueError('Streaming is supported for BMP, PNG and JPEG input only')
+
+    if output_path.endswith('.bmp'):
+        open_writer = bmp.BmpWriter.open
+    elif output_path.endswith('.png'):
+        open_writer = png.PngWriter.open
+    elif output_path.endswith(('.jpg', '.jpeg')):
+        open_writer = jpeg.JpegWriter.open
+    else:
+        raise ValueError('Streaming is supported for BMP, PNG and JPEG output only')
+
+    with open_reader(input_path) as reader:
+        with open_writer(output_path, reader.width, reader.height, reader.has_alpha) as writer:
+            streaming.stream(reader, writer, operations, strip_height)
@@ -1,9 +1,11 @@
 import sys
 
 import imageio
-from operations.grayscale import convert_to_grayscale
-from operations.gamma import correct_gamma
-from operations.negative import apply_negative
+from operations.grayscale import grayscale
+from operations.gamma import gamma_correction
+from operations.negative import negative
+from operations.pipeline import Pipeline
+from operations.point import PointOperation
 
 # main.py --negative --grayscale --gamma=0.3 -i venice.jpg -o venice2.jpg
 if __name__ == '__main__':
@@ -19,24 +21,37 @@ if __name__ == '__main__':
 
     print('Start...')
 
-    image = imageio.read(input_file)
-
-    print('Image read')
+    pipeline = Pipeline()
 
     if '--negative' in sys.argv:
-        apply_negative(image)
+        pipeline.append(negative())
 
     if '--grayscale' in sys.argv or '--greyscale' in sys.argv:
-        convert_to_grayscale(image)
+        pipeline.append(grayscale())
 
     if '--histogram' in sys.argv:
         import operations.histogram as histogram
-        histogram.equalize(image)
+        pipeline.append(histogram.equalize)
+
+    if '--histogram=luma' in sys.argv:
+        import operations.histogram as histogram
+        pipeline.append(histogram.equalize_luma)
 
     for argument in sys.argv:
         if argument.startswith('--gamma'):
-            value = float(argument.split('='))
-            correct_gamma(image, value)
+            value = float(argument.split('=')[1])
+            pipeline.append(gamma_correction(value))
+
+    stages = pipeline.stages()
+
+    if output_file == input_file and stages and all(isinstance(stage, PointOperation) for stage in stages):
+        imageio.edit(input_file, *stages)
+    else:
+        image = imageio.read(input_file)
+        print('Image read')
+
+        pipeline.run(image)
+
+        imageio.write(image, output_file)
 
-    imageio.write(image, output_file)
     print('Output saved: {}'.format(output_file))
\ No newline at end of file
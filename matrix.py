@@ -1,3 +1,6 @@
+import sys
+
+
 class Matrix:
 
     def __init__(self, width, height):
@@ -46,3 +49,45 @@ class MatrixIterator:
             self.x += 1
 
         return x, y
+
+
+class MatrixView:
+    """Compatibility accessor allowing `matrix.l[x][y]` style indexing into a row-major plane."""
+
+    def __init__(self, values, width):
+        self.values = values
+        self.width = width
+
+    def __getitem__(self, x):
+        return MatrixColumn(self.values, self.width, x)
+
+    def __len__(self):
+        return self.width
+
+
+class MatrixColumn:
+    """Accessor allowing `matrix[x][y]` style indexing into row-major values."""
+
+    def __init__(self, values, width, x):
+        self.values = values
+        self.width = width
+        self.x = x
+
+    def __getitem__(self, y):
+        return self.values[y * self.width + self.x]
+
+    def __setitem__(self, y, value):
+        self.values[y * self.width + self.x] = value
+
+
+def array_interface(buffer, shape):
+    """Describes a C-contiguous buffer in the NumPy array interface (version 3)."""
+    view = memoryview(buffer)
+    byteorder = '|' if view.itemsize == 1 else ('<' if sys.byteorder == 'little' else '>')
+    kind = 'f' if view.format in 'fd' else 'u'
+    return {
+        'version': 3,
+        'shape': shape,
+        'typestr': '{}{}{}'.format(byteorder, kind, view.itemsize),
+        'data': view,
+    }
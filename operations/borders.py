@@ -1,70 +1,218 @@
+import math
+
+from array import array
+
 import operations.negative as negative
 from color.grayscale import GrayscaleMatrix
 from operations.convolution import ConvolutionMask
 from operations.convolution import convolve
+from operations.convolution import padded_indices
 
 
 def normalize(value, lowerBound, upperBound):
     return (value - lowerBound) / (upperBound - lowerBound)
 
 
-def apply(matrix, mask):
-    result = GrayscaleMatrix(matrix.width, matrix.height, value_type=float)
-    partial_result = convolve(matrix, mask)
+def gradient(matrix, masks, absolute=True):
+    """Computes the summed response of all masks and its extremes in one traversal of the matrix.
 
-    for x, y in result:
-        result[x][y] = partial_result[x][y]
+    Values outside of the matrix repeat the edge, as in convolve.
 
-    lowest, highest = result.edge_values()
+    :param absolute:
+        Whether absolute values of the responses are summed
+    :return:
+        (result, lowest, highest)
+    """
+    width = matrix.width
+    height = matrix.height
+    size = masks[0].size
 
-    for x, y in result:
-        result[x][y] = normalize(result[x][y], lowest, highest)
+    x_indices = padded_indices(width, size // 2, 'clamp')
+    y_indices = padded_indices(height, size // 2, 'clamp')
 
-    return result
+    mask_taps = []
+    for mask in masks:
+        taps = [(t, i, mask.values[size - 1 - i][size - 1 - t]) for t in range(size) for i in range(size)]
+        mask_taps.append([tap for tap in taps if tap[2]])
 
+    result = GrayscaleMatrix(width, height, value_type=float)
+    lowest = float('inf')
+    highest = float('-inf')
+    window = {}
 
-def apply_all(matrix, *masks):
-    result = GrayscaleMatrix(matrix.width, matrix.height, value_type=float)
+    for y in range(height):
+        needed = y_indices[y:y + size]
+        window = {k: window[k] if k in window else padded_row(matrix, k, x_indices) for k in needed}
+        rows = [window[k] for k in needed]
 
-    for mask in masks:
-        partial_result = convolve(matrix, mask)
+        total = [0.0] * width
 
-        for x, y in result:
-            result[x][y] = abs(result[x][y]) + abs(partial_result[x][y])
+        for taps in mask_taps:
+            response = [0.0] * width
 
-    lowest, highest = result.edge_values()
+            for t, i, weight in taps:
+                response = [r + weight * value for r, value in zip(response, rows[t][i:i + width])]
 
-    for x, y in result:
-        result[x][y] = normalize(result[x][y], lowest, highest)
+            if absolute:
+                total = [a + abs(b) for a, b in zip(total, response)]
+            else:
+                total = [a + b for a, b in zip(total, response)]
 
-    return result
+        lowest = min(lowest, min(total))
+        highest = max(highest, max(total))
+        result.values[y * width:(y + 1) * width] = array('d', total)
 
+    return result, lowest, highest
+
+
+def padded_row(matrix, y, x_indices):
+    row = matrix.values[y * matrix.width:(y + 1) * matrix.width]
+    return [row[i] for i in x_indices]
+
+
+def normalized(matrix, lowest, highest):
+    """Maps values of the matrix from lowest .. highest to 0.0 .. 1.0 in place."""
+    if highest > lowest:
+        scale = 1 / (highest - lowest)
+        matrix.values = array('d', [(value - lowest) * scale for value in matrix.values])
+    else:
+        matrix.values = array('d', bytes(len(matrix.values) * matrix.values.itemsize))
+
+    return matrix
 
-def apply_border_detection(image, method='prewitt'):
-    matrix = GrayscaleMatrix.from_image(image, value_type=float)
 
+def apply(matrix, mask):
+    result, lowest, highest = gradient(matrix, [mask], absolute=False)
+    return normalized(result, lowest, highest)
+
+
+def apply_all(matrix, *masks):
+    result, lowest, highest = gradient(matrix, masks)
+    return normalized(result, lowest, highest)
+
+
+def gaussian_mask(sigma):
+    radius = max(1, math.ceil(2.5 * sigma))
+    weights = [math.exp(-i * i / (2 * sigma * sigma)) for i in range(-radius, radius + 1)]
+    total = sum(weights)
+    weights = [weight / total for weight in weights]
+    return ConvolutionMask(*[[a * b for a in weights] for b in weights])
+
+
+def canny(matrix, sigma=1.4, low_threshold=0.1, high_threshold=0.3):
+    """Canny edge detector.
+
+    :param sigma:
+        Standard deviation of the Gaussian smoothing
+    :param low_threshold:
+        Gradient magnitude (relative to the strongest edge) needed to continue an edge
+    :param high_threshold:
+        Gradient magnitude (relative to the strongest edge) needed to start an edge
+    :return:
+        Integer GrayscaleMatrix with 255 on edges and 0 elsewhere
+    """
+    width = matrix.width
+    height = matrix.height
+
+    smoothed = convolve(matrix, gaussian_mask(sigma)) if sigma > 0 else matrix
+    dx = convolve(smoothed, ConvolutionMask((-1, 0, 1), (-2, 0, 2), (-1, 0, 1))).values
+    dy = convolve(smoothed, ConvolutionMask((-1, -2, -1), (0, 0, 0), (1, 2, 1))).values
+
+    magnitudes = [math.hypot(gx, gy) for gx, gy in zip(dx, dy)]
+
+    # Non-maximum suppression: keep pixels that are local maxima across the edge (ties go to one side).
+    # Directions are quantized to 0, 45, 90 and 135 degrees; tan(22.5 deg) = 0.4142.
+    thin = array('d', bytes(width * height * 8))
+
+    for y in range(1, height - 1):
+        for i in range(y * width + 1, (y + 1) * width - 1):
+            magnitude = magnitudes[i]
+            if not magnitude:
+                continue
+
+            gx = dx[i]
+            gy = dy[i]
+
+            if abs(gy) <= 0.4142 * abs(gx):
+                step = 1
+            elif abs(gx) <= 0.4142 * abs(gy):
+                step = width
+            elif (gx > 0) == (gy > 0):
+                step = width + 1
+            else:
+                step = width - 1
+
+            if magnitude > magnitudes[i - step] and magnitude >= magnitudes[i + step]:
+                thin[i] = magnitude
+
+    result = GrayscaleMatrix(width, height)
+    strongest = max(thin) if thin else 0
+
+    if not strongest:
+        return result
+
+    low = low_threshold * strongest
+    high = high_threshold * strongest
+
+    # Hysteresis: flood fill from strong pixels through 8-connected weak ones. Only inner
+    # pixels can be non-zero in `thin`, and only those are pushed, so neighbours of a
+    # pushed pixel are always inside (even with zero thresholds).
+    edges = result.values
+    neighbours = (-width - 1, -width, -width + 1, -1, 1, width - 1, width, width + 1)
+    stack = [i for i, magnitude in enumerate(thin) if magnitude and magnitude >= high]
+
+    for i in stack:
+        edges[i] = 255
+
+    while stack:
+        i = stack.pop()
+        for offset in neighbours:
+            j = i + offset
+            if not edges[j] and thin[j] and thin[j] >= low:
+                edges[j] = 255
+                stack.append(j)
+
+    return result
+
+
+def gradient_masks(method):
+    """Masks of a gradient method and whether absolute values of their responses are summed."""
     if method == 'prewitt':
         x_mask = ConvolutionMask((1, 1, 1), (0, 0, 0), (-1, -1, -1))
         y_mask = ConvolutionMask((-1, 0, 1), (-1, 0, 1), (-1, 0, 1))
-
-        result = apply_all(matrix, x_mask, y_mask)
+        return [x_mask, y_mask], True
 
     elif method == 'sobel':
         x_mask = ConvolutionMask((1, 2, 1), (0, 0, 0), (-1, -2, -1))
         y_mask = ConvolutionMask((-1, 0, 1), (-2, 0, 2), (-1, 0, 1))
-
-        result = apply_all(matrix, x_mask, y_mask)
+        return [x_mask, y_mask], True
 
     elif method == 'laplace':
-        mask = ConvolutionMask((0, -1, 0), (-1, 4, -1), (0, -1, 0))
-        result = apply(matrix, mask)
+        return [ConvolutionMask((0, -1, 0), (-1, 4, -1), (0, -1, 0))], False
 
     elif method == 'laplace2':
-        mask = ConvolutionMask((0, 1, 0), (1, -4, 1), (0, 1, 0))
-        result = apply(matrix, mask)
+        return [ConvolutionMask((0, 1, 0), (1, -4, 1), (0, 1, 0))], False
+
+    raise ValueError('Unknown border detection method: {}'.format(method))
+
+
+def apply_border_detection(image, method='prewitt', **options):
+    """Replaces the image with its edges.
+
+    :param method:
+        One of 'prewitt', 'sobel', 'laplace', 'laplace2' (gradient magnitudes)
+        or 'canny' (thin binary edges)
+    :param options:
+        Parameters of the 'canny' method (sigma, low_threshold, high_threshold)
+    """
+    matrix = GrayscaleMatrix.from_image(image, value_type=float)
 
+    if method == 'canny':
+        result = canny(matrix, **options)
     else:
-        raise ValueError()
+        masks, absolute = gradient_masks(method)
+        result, lowest, highest = gradient(matrix, masks, absolute)
+        normalized(result, lowest, highest)
 
     result.apply_to(image)
 
@@ -77,7 +225,7 @@ if __name__ == '__main__':
     parser = ArgumentParser(description='Scale image')
     parser.add_argument('input_file', metavar='image', help='')
     parser.add_argument('-o', '--out', dest='output_file', nargs='?', help='')
-    parser.add_argument('-m', '--method', dest='method', nargs='?', choices=['prewitt', 'sobel', 'laplace'], default='prewitt', help='')
+    parser.add_argument('-m', '--method', dest='method', nargs='?', choices=['prewitt', 'sobel', 'laplace', 'canny'], default='prewitt', help='')
     parser.add_argument('-n', '--negative', dest='negative', action='store_true')
 
     args = parser.parse_args()
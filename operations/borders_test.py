@@ -0,0 +1,56 @@
+from color.grayscale import GrayscaleMatrix
+from operations.borders import apply, apply_all, canny
+from operations.convolution import ConvolutionMask, convolve
+from unittest import TestCase
+
+
+class GradientTest(TestCase):
+
+    def setUp(self):
+        self.matrix = GrayscaleMatrix(6, 5, value_type=float)
+        for i in range(30):
+            self.matrix.values[i] = (i * 7 % 11) / 10
+
+    def assertNormalized(self, expected, actual):
+        lowest, highest = min(expected), max(expected)
+        for value, result in zip(expected, actual.values):
+            self.assertAlmostEqual((value - lowest) / (highest - lowest), result)
+
+    def test_fused_pass_matches_separate_convolutions(self):
+        x_mask = ConvolutionMask((1, 2, 1), (0, 0, 0), (-1, -2, -1))
+        y_mask = ConvolutionMask((-1, 0, 1), (-2, 0, 2), (-1, 0, 1))
+        x = convolve(self.matrix, x_mask).values
+        y = convolve(self.matrix, y_mask).values
+
+        self.assertNormalized([abs(a) + abs(b) for a, b in zip(x, y)], apply_all(self.matrix, x_mask, y_mask))
+
+        laplace = ConvolutionMask((0, -1, 0), (-1, 4, -1), (0, -1, 0))
+        self.assertNormalized(convolve(self.matrix, laplace).values, apply(self.matrix, laplace))
+
+
+class CannyTest(TestCase):
+
+    def setUp(self):
+        self.matrix = GrayscaleMatrix(20, 20, value_type=float)
+        for x, y in self.matrix:
+            self.matrix[x][y] = 1.0 if 5 <= x < 15 and 5 <= y < 15 else 0.0
+
+    def test_edges_are_binary_and_thin(self):
+        edges = canny(self.matrix)
+        self.assertEqual({0, 255}, set(edges.values))
+
+        for y in range(7, 13):
+            row = [edges[x][y] for x in range(20)]
+            self.assertEqual(2, row.count(255))
+
+    def test_flat_matrix_has_no_edges(self):
+        edges = canny(GrayscaleMatrix(10, 10, value_type=float))
+        self.assertFalse(any(edges.values))
+
+    def test_zero_thresholds(self):
+        # Zero-magnitude pixels, on the border too, must neither start nor continue edges
+        for low, high in ((0, 0.3), (0, 0)):
+            edges = canny(self.matrix, low_threshold=low, high_threshold=high)
+            self.assertEqual(0, edges[0][0])
+            self.assertEqual(0, edges[10][10])
+            self.assertTrue(any(edges.values))
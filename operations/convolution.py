@@ -1,4 +1,12 @@
-from copy import deepcopy
+from array import array
+
+from color.grayscale import GrayscaleMatrix
+from operations.fft import fft2
+
+BORDER_MODES = ('clamp', 'reflect', 'wrap', 'zero')
+
+# Smallest size of a non-separable mask convolved through FFT; measured by operations/convolution_benchmark.py
+FFT_THRESHOLD = 11
 
 
 class ConvolutionMask:
@@ -11,23 +19,244 @@ class ConvolutionMask:
             for x, value in enumerate(row):
                 self.values[x][y] = value
 
+    @property
+    def radius(self):
+        return self.size // 2
+
     def get_relative(self, dx, dy):
         return self.values[dx + self.size // 2][dy + self.size // 2]
 
+    def separate(self):
+        """Splits a rank-1 mask into horizontal and vertical vectors.
+
+        :return:
+            (horizontal, vertical) such that values[x][y] == horizontal[x] * vertical[y],
+            or None when the mask is not separable
+        """
+        pivot_x, pivot_y = max(((x, y) for x in range(self.size) for y in range(self.size)),
+                               key=lambda position: abs(self.values[position[0]][position[1]]))
+        pivot = self.values[pivot_x][pivot_y]
+
+        if pivot == 0:
+            return None
+
+        horizontal = [self.values[x][pivot_y] for x in range(self.size)]
+        vertical = [self.values[pivot_x][y] / pivot for y in range(self.size)]
+
+        for x in range(self.size):
+            for y in range(self.size):
+                if abs(horizontal[x] * vertical[y] - self.values[x][y]) > 1e-9 * abs(pivot):
+                    return None
+
+        return horizontal, vertical
+
+    def __getitem__(self, dx):
+        # Rotate the column so that index 0 is the center and negative indices reach above it
+        column = self.values[dx + self.size // 2]
+        return column[self.size // 2:] + column[:self.size // 2]
+
+
+def border_index(i, length, mode):
+    """Maps a coordinate outside of 0 .. length - 1 back inside according to the border mode.
+
+    Returns None for the 'zero' mode, meaning the value is 0.
+    """
+    if 0 <= i < length:
+        return i
+
+    if mode == 'clamp':
+        return min(max(i, 0), length - 1)
+
+    if mode == 'wrap':
+        return i % length
+
+    if mode == 'reflect':
+        # Mirrored around the edge pixel: ... c b | a b c ... | c b ...
+        if length == 1:
+            return 0
+        period = 2 * (length - 1)
+        i %= period
+        return i if i < length else period - i
 
-def convolve(matrix, mask):
-    result = deepcopy(matrix)
+    if mode == 'zero':
+        return None
 
-    offset = mask.size // 2
+    raise ValueError('Border mode must be one of: {}'.format(', '.join(BORDER_MODES)))
 
-    for x in range(offset, matrix.width - offset):
-        for y in range(offset, matrix.height - offset):
-            g = 0
 
-            for i in range(-offset, offset + 1):
-                for j in range(-offset, offset + 1):
-                    g += mask.get_relative(i, j) * (matrix[x - i][y - j])
+def padded_indices(length, radius, mode):
+    """Indices of values for positions -radius .. length + radius - 1.
 
-            result[x][y] = g
+    Positions outside of the matrix in the 'zero' mode point to index `length`,
+    where callers place a 0.
+    """
+    indices = [border_index(i, length, mode) for i in range(-radius, length + radius)]
+    return [length if i is None else i for i in indices]
+
+
+def correlate_row(padded, weights, length):
+    """Sums weights[t] * padded[t + x] for every x in 0 .. length - 1."""
+    result = [0.0] * length
+
+    for t, weight in enumerate(weights):
+        if weight:
+            result = [r + weight * value for r, value in zip(result, padded[t:t + length])]
 
     return result
+
+
+def convolve(matrix, mask, border='clamp', out=None):
+    """Convolves a grayscale matrix with a mask of odd size.
+
+    Non-separable masks of FFT_THRESHOLD or more rows are convolved by
+    convolve_fft, all others by convolve_direct.
+
+    :param border:
+        How values outside of the matrix are obtained: 'clamp' (repeat the edge),
+        'reflect' (mirror around the edge), 'wrap' (periodic) or 'zero'
+    :param out:
+        Float GrayscaleMatrix of the same size to write the result into
+    :return:
+        Float GrayscaleMatrix with the result
+    """
+    if mask.size % 2 == 0:
+        raise ValueError('Mask size must be odd. Got {}.'.format(mask.size))
+
+    if border not in BORDER_MODES:
+        raise ValueError('Border mode must be one of: {}'.format(', '.join(BORDER_MODES)))
+
+    if mask.size >= FFT_THRESHOLD and mask.separate() is None:
+        return convolve_fft(matrix, mask, border, out)
+
+    return convolve_direct(matrix, mask, border, out)
+
+
+def convolve_direct(matrix, mask, border='clamp', out=None):
+    """Convolves a grayscale matrix with a mask of odd size tap by tap.
+
+    Separable (rank-1) masks are applied as a horizontal and a vertical pass.
+    Parameters and result are the same as for convolve.
+    """
+    width = matrix.width
+    height = matrix.height
+    size = mask.size
+
+    if out is None:
+        out = GrayscaleMatrix(width, height, value_type=float)
+
+    x_indices = padded_indices(width, mask.radius, border)
+    y_indices = padded_indices(height, mask.radius, border)
+
+    rows = padded_rows(matrix, x_indices)
+    separable = mask.separate()
+
+    if separable is not None:
+        horizontal, vertical = separable
+        rows = [correlate_row(row, horizontal[::-1], width) for row in rows]
+        rows.append([0.0] * width)
+
+        for y in range(height):
+            result = [0.0] * width
+
+            for t, weight in enumerate(reversed(vertical)):
+                if weight:
+                    result = [r + weight * value for r, value in zip(result, rows[y_indices[y + t]])]
+
+            out.values[y * width:(y + 1) * width] = array('d', result)
+    else:
+        rows.append([0.0] * (width + size - 1))
+        taps = [(t, i, mask.values[size - 1 - i][size - 1 - t]) for t in range(size) for i in range(size)]
+        taps = [tap for tap in taps if tap[2]]
+
+        for y in range(height):
+            result = [0.0] * width
+
+            for t, i, weight in taps:
+                row = rows[y_indices[y + t]]
+                result = [r + weight * value for r, value in zip(result, row[i:i + width])]
+
+            out.values[y * width:(y + 1) * width] = array('d', result)
+
+    return out
+
+
+def convolve_fft(matrix, mask, border='clamp', out=None):
+    """Convolves a grayscale matrix with a mask of odd size using FFT and overlap-add.
+
+    The padded matrix is split into tiles which are transformed two at a time
+    (one as the real and one as the imaginary part), multiplied with the
+    spectrum of the mask and added into the result.
+
+    Parameters and result are the same as for convolve.
+    """
+    width = matrix.width
+    height = matrix.height
+    size = mask.size
+    offset = 2 * mask.radius
+
+    if out is None:
+        out = GrayscaleMatrix(width, height, value_type=float)
+
+    rows = padded_rows(matrix, padded_indices(width, mask.radius, border))
+    rows.append([0.0] * (width + size - 1))
+    rows = [rows[i] for i in padded_indices(height, mask.radius, border)]
+
+    # Transform size with the lowest estimated total cost: tiles * n^2 * log n
+    def cost(n):
+        block = n - size + 1
+        tiles = -(-(width + size - 1) // block) * -(-(height + size - 1) // block)
+        return tiles * n * n * n.bit_length()
+
+    n = min((1 << bits for bits in range(size.bit_length(), 13)), key=cost)
+    block = n - size + 1
+
+    kernel = [[mask.values[x][y] for x in range(size)] + [0.0] * (n - size) for y in range(size)]
+    kernel += [[0.0] * n for _ in range(n - size)]
+    spectrum = fft2(kernel)
+
+    result = [[0.0] * width for _ in range(height)]
+    tiles = [(x, y) for y in range(0, len(rows), block) for x in range(0, len(rows[0]), block)]
+
+    for pair in range(0, len(tiles), 2):
+        first, second = tiles[pair], tiles[pair + 1] if pair + 1 < len(tiles) else None
+        grid = [[0j] * n for _ in range(n)]
+
+        for part, tile in ((1, first), (1j, second)):
+            if tile is None:
+                continue
+
+            x, y = tile
+            for j, row in enumerate(rows[y:y + block]):
+                values = row[x:x + block]
+                grid[j][:len(values)] = [g + part * value for g, value in zip(grid[j], values)]
+
+        transformed = fft2(grid)
+        transformed = [[a * b for a, b in zip(column, kernel_column)] for column, kernel_column in zip(transformed, spectrum)]
+        grid = fft2(transformed, inverse=True)
+
+        for part, tile in ((0, first), (1, second)):
+            if tile is None:
+                continue
+
+            x, y = tile
+            start = max(0, offset - x)
+            end = min(n, width + offset - x)
+
+            for j in range(max(0, offset - y), min(n, height + offset - y)):
+                values = grid[j][start:end]
+                values = [value.imag for value in values] if part else [value.real for value in values]
+                target = result[y + j - offset]
+                target[x + start - offset:x + end - offset] = [t + value for t, value in zip(target[x + start - offset:x + end - offset], values)]
+
+    for y, row in enumerate(result):
+        out.values[y * width:(y + 1) * width] = array('d', row)
+
+    return out
+
+
+def padded_rows(matrix, x_indices):
+    rows = []
+    for y in range(matrix.height):
+        row = matrix.values[y * matrix.width:(y + 1) * matrix.width].tolist() + [0.0]
+        rows.append([row[i] for i in x_indices])
+    return rows
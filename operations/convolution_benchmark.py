@@ -0,0 +1,48 @@
+# Compares direct and FFT convolution of non-separable masks to find FFT_THRESHOLD in operations/convolution.py
+#
+# > python -m operations.convolution_benchmark
+# > python -m operations.convolution_benchmark --width 512 --height 512 --sizes 15 21 25 31 41
+import random
+import time
+
+from array import array
+
+from color.grayscale import GrayscaleMatrix
+from operations.convolution import ConvolutionMask, convolve_direct, convolve_fft
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def benchmark(width, height, sizes):
+    matrix = GrayscaleMatrix(width, height, value_type=float)
+    matrix.values = array('d', [random.random() for _ in range(width * height)])
+
+    crossover = None
+
+    for size in sizes:
+        mask = ConvolutionMask(*[[random.random() for _ in range(size)] for _ in range(size)])
+        direct = measure(convolve_direct, matrix, mask)
+        fft = measure(convolve_fft, matrix, mask)
+
+        if crossover is None and fft < direct:
+            crossover = size
+
+        print('{0:>3} x {0:<3} direct {1:8.3f} s   fft {2:8.3f} s'.format(size, direct, fft))
+
+    print('FFT is faster from size: {}'.format(crossover))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Benchmark direct and FFT convolution')
+    parser.add_argument('--width', dest='width', type=int, default=256, help='matrix width')
+    parser.add_argument('--height', dest='height', type=int, default=256, help='matrix height')
+    parser.add_argument('--sizes', dest='sizes', type=int, nargs='+', default=[3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 25, 31], help='mask sizes')
+
+    args = parser.parse_args()
+    benchmark(args.width, args.height, args.sizes)
@@ -1,4 +1,5 @@
-from operations.convolution import ConvolutionMask
+from color.grayscale import GrayscaleMatrix
+from operations.convolution import ConvolutionMask, convolve, convolve_direct, convolve_fft
 from unittest import TestCase
 
 
@@ -10,4 +11,45 @@ class MaskTest(TestCase):
     def test_getitem(self):
         self.assertEqual(0, self.mask[0][0])
         self.assertEqual(-1, self.mask[-1][0])
-        self.assertEqual(2, self.mask[0][1])
\ No newline at end of file
+        self.assertEqual(2, self.mask[0][1])
+
+
+class ConvolveTest(TestCase):
+
+    def setUp(self):
+        self.matrix = GrayscaleMatrix(4, 3, value_type=float)
+        for i in range(12):
+            self.matrix.values[i] = i
+
+    def test_separable_mask(self):
+        mask = ConvolutionMask((1, 2, 1), (0, 0, 0), (-1, -2, -1))
+        self.assertEqual(([1, 2, 1], [1.0, 0.0, -1.0]), mask.separate())
+
+        result = convolve(self.matrix, mask, border='zero')
+        self.assertEqual(32, result[1][1])
+        self.assertEqual(13, result[0][0])
+
+    def test_non_separable_mask(self):
+        mask = ConvolutionMask((0, -1, 0), (-1, 4, -1), (0, -1, 0))
+        self.assertIsNone(mask.separate())
+
+        result = convolve(self.matrix, mask, border='clamp')
+        self.assertEqual(0, result[1][1])
+        self.assertEqual(-5, result[0][0])
+
+    def test_border_modes(self):
+        mask = ConvolutionMask((0, 0, 0), (1, 0, 0), (0, 0, 0))
+        self.assertEqual(0, convolve(self.matrix, mask, border='zero')[3][0])
+        self.assertEqual(3, convolve(self.matrix, mask, border='clamp')[3][0])
+        self.assertEqual(2, convolve(self.matrix, mask, border='reflect')[3][0])
+        self.assertEqual(0, convolve(self.matrix, mask, border='wrap')[3][0])
+
+    def test_fft_matches_direct(self):
+        mask = ConvolutionMask((1, 2, 0), (-1, 4, 3), (0, 5, -2))
+
+        for border in ('clamp', 'reflect', 'wrap', 'zero'):
+            direct = convolve_direct(self.matrix, mask, border)
+            fft = convolve_fft(self.matrix, mask, border)
+
+            for expected, actual in zip(direct.values, fft.values):
+                self.assertAlmostEqual(expected, actual, places=9)
@@ -0,0 +1,62 @@
+import cmath
+
+_plans = {}
+
+
+def plan(n):
+    """Bit-reversal permutation and twiddle factors for a transform of length n (a power of two)."""
+    if n not in _plans:
+        if n & (n - 1):
+            raise ValueError('FFT length must be a power of two. Got {}.'.format(n))
+
+        bits = n.bit_length() - 1
+        permutation = [int('{:0{}b}'.format(i, bits)[::-1], 2) if bits else 0 for i in range(n)]
+        twiddles = [cmath.exp(-2j * cmath.pi * k / n) for k in range(n // 2)]
+        _plans[n] = permutation, twiddles
+
+    return _plans[n]
+
+
+def fft(values, inverse=False):
+    """Iterative radix-2 FFT of a list of complex numbers. The inverse transform is scaled by 1 / n."""
+    n = len(values)
+    permutation, twiddles = plan(n)
+    a = [values[i] for i in permutation]
+
+    size = 2
+    while size <= n:
+        half = size // 2
+        w = twiddles[::n // size]
+        if inverse:
+            w = [value.conjugate() for value in w]
+
+        if half < n // size:
+            # Few butterflies per block: process the k-th butterfly of every block at once
+            for k in range(half):
+                low = a[k::size]
+                high = [w[k] * value for value in a[k + half::size]]
+                a[k::size] = [u + t for u, t in zip(low, high)]
+                a[k + half::size] = [u - t for u, t in zip(low, high)]
+        else:
+            for start in range(0, n, size):
+                low = a[start:start + half]
+                high = [wk * value for wk, value in zip(w, a[start + half:start + size])]
+                a[start:start + half] = [u + t for u, t in zip(low, high)]
+                a[start + half:start + size] = [u - t for u, t in zip(low, high)]
+
+        size *= 2
+
+    if inverse:
+        a = [value / n for value in a]
+
+    return a
+
+
+def fft2(rows, inverse=False):
+    """2-D FFT of a square list of rows. The forward result is transposed; the inverse expects it so."""
+    if inverse:
+        columns = [fft(column, inverse=True) for column in rows]
+        return [fft(list(row), inverse=True) for row in zip(*columns)]
+
+    rows = [fft(row) for row in rows]
+    return [fft(list(column)) for column in zip(*rows)]
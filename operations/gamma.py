@@ -1,11 +1,10 @@
-def correct_gamma(image, gamma=1):
-    for x, y in image.coordinates:
-        red = image.get_red(x, y, float)
-        green = image.get_green(x, y, float)
-        blue = image.get_blue(x, y, float)
+from operations.point import PointOperation
+
 
-        image.set_red(x, y, red ** (1 / gamma))
-        image.set_green(x, y, green ** (1 / gamma))
-        image.set_blue(x, y, blue ** (1 / gamma))
+def gamma_correction(gamma=1):
+    exponent = 1 / gamma
+    return PointOperation.from_function(lambda value: (value / 255) ** exponent * 255)
 
-        image.reds[x][y] = image.reds[x][y] ** (1 / gamma)
+
+def correct_gamma(image, gamma=1):
+    gamma_correction(gamma).apply(image)
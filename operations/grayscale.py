@@ -1,9 +1,12 @@
-from color.grayscale import GrayscaleMatrix
+from operations.point import PointOperation
+
+
+def grayscale():
+    return PointOperation.luma()
 
 
 def convert_to_grayscale(image):
-    matrix = GrayscaleMatrix.from_image(image)
-    matrix.apply_to(image)
+    grayscale().apply(image)
 
 
 if __name__ == '__main__':
@@ -1,35 +1,119 @@
-from collections import defaultdict
+from array import array
+from collections import Counter
+
+from color.grayscale import gray_plane
 from color.lab import LabMatrix
 
+# CLAMP[value + 255] is value limited to 0 .. 255, for value in -255 .. 510
+CLAMP = bytes([0] * 255 + list(range(256)) + [255] * 255)
 
-def luminance_histogram_from_matrix(matrix):
-    histogram = defaultdict(int)
-    for x, y in matrix:
-        l = matrix.l[x][y]
-        histogram[l] += 1
-    return histogram
 
+class Histogram:
+    """Counts of values in equally wide bins covering lowest .. highest.
 
-def equalize(image):
-    matrix = LabMatrix.from_image(image)
+    Values below lowest fall into the first bin, values above highest into the last one.
+    """
+
+    def __init__(self, bins=256, lowest=0.0, highest=255.0):
+        self.bins = bins
+        self.lowest = lowest
+        self.highest = highest
+        self.counts = array('Q', bytes(bins * 8))
+
+    @property
+    def scale(self):
+        return self.bins / (self.highest - self.lowest)
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def bin(self, value):
+        return min(self.bins - 1, max(0, int((value - self.lowest) * self.scale)))
+
+    def indices(self, values):
+        last = self.bins - 1
+        lowest = self.lowest
+        scale = self.scale
+        return [min(last, max(0, int((value - lowest) * scale))) for value in values]
+
+    def add(self, values):
+        for index, count in Counter(self.indices(values)).items():
+            self.counts[index] += count
+
+    def cumulative(self):
+        result = array('Q', self.counts)
+        for i in range(1, self.bins):
+            result[i] += result[i - 1]
+        return result
+
+    def equalization_table(self, lowest=None, highest=None):
+        """Maps every bin to lowest + cumulative share of values up to and including the bin * (highest - lowest)."""
+        lowest = self.lowest if lowest is None else lowest
+        highest = self.highest if highest is None else highest
+        total = self.total or 1
+        return [min(highest, lowest + count / total * (highest - lowest)) for count in self.cumulative()]
 
-    histogram = luminance_histogram_from_matrix(matrix)
+    @staticmethod
+    def from_values(values, bins=256, lowest=0.0, highest=255.0):
+        histogram = Histogram(bins, lowest, highest)
+        histogram.add(values)
+        return histogram
 
-    adjustments = {}
+    @staticmethod
+    def from_bytes(values):
+        """Histogram of 8-bit values with one bin per value."""
+        histogram = Histogram(256, 0, 256)
+        values = bytes(values)
+        for value in range(256):
+            histogram.counts[value] = values.count(value)
+        return histogram
 
-    for i, luminance in enumerate(sorted(histogram.keys())):
-        relative_count = histogram[luminance] / image.size
 
-        new_value = relative_count * 100
+def luminance_histogram_from_matrix(matrix, bins=1024):
+    return Histogram.from_values(matrix.l_values, bins, 0.0, 100.0)
 
-        if i > 0:
-            previous_luminance = sorted(histogram.keys())[i - 1]
-            new_value += adjustments[previous_luminance]
-            new_value = min(new_value, 100.0)
 
-        adjustments[luminance] = new_value
+def equalize(image, bins=1024, method='lab'):
+    """Equalizes the lightness histogram of the image.
 
-    for x, y in matrix:
-        matrix.l[x][y] = adjustments[matrix.l[x][y]]
+    :param method:
+        'lab' equalizes L* of CIELAB (in `bins` levels), 'luma' equalizes the
+        8-bit luma Y of YCbCr, which is much faster and visually close
+    """
+    if method == 'luma':
+        return equalize_luma(image)
 
+    if method != 'lab':
+        raise ValueError('Method must be one of: lab, luma')
+
+    matrix = LabMatrix.from_image(image)
+
+    histogram = luminance_histogram_from_matrix(matrix, bins)
+    table = histogram.equalization_table()
+
+    matrix.l_values[:] = array('d', [table[index] for index in histogram.indices(matrix.l_values)])
     matrix.apply_to(image)
+
+
+def equalize_luma(image):
+    """Equalizes luma while keeping chroma (Cb, Cr) of every pixel.
+
+    With Cb and Cr fixed, changing Y by d changes each of R, G and B by d,
+    so the pixels are shifted by the difference between equalized and
+    original luma, without converting to another color space.
+    """
+    reds = image.get_channel(image.RED)
+    greens = image.get_channel(image.GREEN)
+    blues = image.get_channel(image.BLUE)
+
+    lumas = gray_plane(reds, greens, blues)
+    histogram = Histogram.from_bytes(lumas)
+    table = histogram.equalization_table(0, 255)
+
+    # Shift of each luma value, offset by 255 to index CLAMP directly
+    shifts = [int(value + 0.5) - luma + 255 for luma, value in enumerate(table)]
+    shifts = [shifts[luma] for luma in lumas]
+
+    for channel, values in ((image.RED, reds), (image.GREEN, greens), (image.BLUE, blues)):
+        image.set_channel(channel, bytes([CLAMP[value + shift] for value, shift in zip(values, shifts)]))
@@ -0,0 +1,58 @@
+from image import Image
+from operations.histogram import Histogram, equalize, equalize_luma
+from unittest import TestCase
+
+
+class HistogramTest(TestCase):
+
+    def test_bins(self):
+        histogram = Histogram.from_values([-5, 0, 10, 20, 99, 100, 150], bins=4, lowest=0.0, highest=100.0)
+        self.assertEqual([4, 0, 0, 3], list(histogram.counts))
+        self.assertEqual([4, 4, 4, 7], list(histogram.cumulative()))
+
+    def test_equalization_table(self):
+        histogram = Histogram.from_bytes(bytes([10, 10, 10, 200]))
+        table = histogram.equalization_table(0, 255)
+
+        self.assertEqual(0, table[9])
+        self.assertEqual(255 * 3 / 4, table[10])
+        self.assertEqual(255 * 3 / 4, table[199])
+        self.assertEqual(255, table[200])
+
+
+class EqualizeTest(TestCase):
+
+    def setUp(self):
+        # Low-contrast grays 100 .. 130
+        self.image = Image(4, 4)
+        for i, (x, y) in enumerate(self.image.coordinates):
+            self.image.set_rgb(x, y, 0x010101 * (100 + 2 * i))
+
+    def reds(self):
+        return [self.image.get_red(x, y) for x, y in self.image.coordinates]
+
+    def test_lab(self):
+        equalize(self.image, bins=64)
+        reds = self.reds()
+
+        self.assertEqual(sorted(reds), reds)
+        self.assertEqual(255, reds[-1])
+        self.assertLess(reds[0], 100)
+
+    def test_luma(self):
+        expected = Image(4, 4)
+        expected.pixels[:] = self.image.pixels
+        equalize_luma(expected)
+
+        equalize(self.image, method='luma')
+        self.assertEqual(bytes(expected.pixels), bytes(self.image.pixels))
+
+        # Spread to the full range, with grays kept neutral
+        reds = self.reds()
+        self.assertEqual(sorted(reds), reds)
+        self.assertEqual(255, reds[-1])
+        self.assertLessEqual(reds[0], 16)
+        self.assertTrue(self.image.is_grayscale())
+
+        with self.assertRaises(ValueError):
+            equalize(self.image, method='hsv')
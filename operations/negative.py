@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 # negative.py
 
+from operations.point import PointOperation
+
+
+def negative():
+    return PointOperation.from_function(lambda value: 255 - value)
+
 
 def apply_negative(image):
-    for x, y in image.coordinates:
-        image.reds[x][y] = 255 - image.reds[x][y]
-        image.greens[x][y] = 255 - image.greens[x][y]
-        image.blues[x][y] = 255 - image.blues[x][y]
+    negative().apply(image)
 
 
 if __name__ == '__main__':
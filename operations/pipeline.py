@@ -0,0 +1,40 @@
+from operations.point import PointOperation
+
+
+class Pipeline:
+    """Lazy chain of operations run over an image.
+
+    Operations are either PointOperation instances or callables taking an image.
+    Nothing is applied until `run`; at that point adjacent point operations are
+    composed into one, so the image is traversed once per group of them.
+    """
+
+    def __init__(self, *operations):
+        self.operations = list(operations)
+
+    def append(self, operation):
+        self.operations.append(operation)
+        return self
+
+    def stages(self):
+        stages = []
+
+        for operation in self.operations:
+            if isinstance(operation, PointOperation) and stages and isinstance(stages[-1], PointOperation):
+                stages[-1] = stages[-1].then(operation)
+            else:
+                stages.append(operation)
+
+        return stages
+
+    def run(self, image):
+        for stage in self.stages():
+            if isinstance(stage, PointOperation):
+                stage.apply(image)
+            else:
+                stage(image)
+
+        return image
+
+    def __len__(self):
+        return len(self.operations)
@@ -0,0 +1,79 @@
+from color.grayscale import BLUE_WEIGHTS, GREEN_WEIGHTS, RED_WEIGHTS, WEIGHT_BITS, gray_plane
+
+IDENTITY = bytes(range(256))
+
+
+class PointOperation:
+    """Operation computing each output pixel from the same input pixel only.
+
+    The operation is compiled into 256-entry lookup tables, one per color
+    channel, and is applied to whole channel planes at once. Optionally the
+    channels are first mixed into a single gray value through fixed-point
+    weight tables (see color.grayscale); the tables are then looked up with
+    that gray value for every channel.
+
+    Alpha is never changed.
+    """
+
+    # Rows around a pixel the operation reads, for strip processing (see operations.streaming)
+    halo = 0
+
+    def __init__(self, red=IDENTITY, green=IDENTITY, blue=IDENTITY, mix=None):
+        self.tables = (bytes(red), bytes(green), bytes(blue))
+        self.mix = mix
+
+    @staticmethod
+    def from_function(function, red=True, green=True, blue=True):
+        """Compiles function(value) -> value of 8-bit values into a point operation.
+
+        The result of the function is truncated to int and clamped to 0 - 255.
+        """
+        table = bytes(min(255, max(0, int(function(value)))) for value in range(256))
+        return PointOperation(table if red else IDENTITY, table if green else IDENTITY, table if blue else IDENTITY)
+
+    @staticmethod
+    def luma():
+        return PointOperation(mix=(RED_WEIGHTS, GREEN_WEIGHTS, BLUE_WEIGHTS))
+
+    def then(self, other):
+        """Returns a single operation equivalent to applying self and then other."""
+        if other.mix is None:
+            tables = [[second[first[value]] for value in range(256)] for first, second in zip(self.tables, other.tables)]
+            return PointOperation(*tables, mix=self.mix)
+
+        if self.mix is None:
+            mix = tuple([weights[table[value]] for value in range(256)] for table, weights in zip(self.tables, other.mix))
+            return PointOperation(*other.tables, mix=mix)
+
+        # Both operations mix: the second gray value depends on the first one only.
+        red_weights, green_weights, blue_weights = other.mix
+        red, green, blue = self.tables
+        grays = [(red_weights[red[gray]] + green_weights[green[gray]] + blue_weights[blue[gray]]) >> WEIGHT_BITS for gray in range(256)]
+        tables = [[table[gray] for gray in grays] for table in other.tables]
+        return PointOperation(*tables, mix=self.mix)
+
+    def apply(self, image):
+        self.apply_to_buffer(image.pixels, (image.RED, image.GREEN, image.BLUE), image.PIXEL_SIZE)
+
+    def __call__(self, image):
+        self.apply(image)
+        return image
+
+    def apply_to_buffer(self, buffer, offsets=(0, 1, 2), step=4):
+        """Applies the operation to pixels in any writable buffer (an image, a row, a mapped file, ...).
+
+        :param offsets:
+            offsets of the red, green and blue bytes within a pixel
+        :param step:
+            size of a pixel in bytes
+        """
+        if self.mix is None:
+            for offset, table in zip(offsets, self.tables):
+                if table != IDENTITY:
+                    buffer[offset::step] = bytes(buffer[offset::step]).translate(table)
+            return
+
+        grays = gray_plane(*(buffer[offset::step] for offset in offsets), weights=self.mix)
+
+        for offset, table in zip(offsets, self.tables):
+            buffer[offset::step] = grays.translate(table)
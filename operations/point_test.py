@@ -0,0 +1,46 @@
+from image import Image
+from operations.gamma import gamma_correction
+from operations.grayscale import grayscale
+from operations.negative import negative
+from operations.pipeline import Pipeline
+from unittest import TestCase
+
+
+class PointOperationTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(3, 1)
+        self.image.set_argb(0, 0, 0x00ff9900)
+        self.image.set_argb(1, 0, 0x80123456)
+        self.image.set_argb(2, 0, 0x00ffffff)
+
+    def test_negative(self):
+        negative().apply(self.image)
+        self.assertEqual(0x000066ff, self.image.get_argb(0, 0))
+        self.assertEqual(0x80edcba9, self.image.get_argb(1, 0))
+
+    def test_grayscale(self):
+        grayscale().apply(self.image)
+        self.assertEqual(0x00a6a6a6, self.image.get_argb(0, 0))
+        self.assertEqual(0x00ffffff, self.image.get_argb(2, 0))
+
+    def test_then_equals_sequential_application(self):
+        operations = [negative(), gamma_correction(2.2), grayscale(), gamma_correction(0.5)]
+
+        expected = self.image.copy()
+        for operation in operations:
+            operation.apply(expected)
+
+        fused = operations[0]
+        for operation in operations[1:]:
+            fused = fused.then(operation)
+        fused.apply(self.image)
+
+        self.assertEqual(expected.pixels, self.image.pixels)
+
+
+class PipelineTest(TestCase):
+
+    def test_adjacent_point_operations_are_fused(self):
+        pipeline = Pipeline(negative(), gamma_correction(0.3), grayscale(), print, negative())
+        self.assertEqual(3, len(pipeline.stages()))
@@ -0,0 +1,125 @@
+"""Operations on images processed in horizontal strips, for images larger than memory.
+
+A strip operation is a callable taking an image (a strip of rows) and returning
+an image of the same size, with a `halo` attribute: the number of rows above
+and below a row the operation reads to compute it. Point operations
+(operations.point.PointOperation) have a halo of 0.
+
+Operations needing statistics of the whole image also have an `analyse(strip,
+start, count)` method, called for every strip in a pass over the image before
+the operation itself is applied; rows start .. start + count - 1 of the strip
+are the ones to take into account.
+"""
+from array import array
+
+from color.grayscale import GrayscaleMatrix
+from image import Image
+from operations.borders import gradient, gradient_masks, normalized
+from operations.convolution import convolve
+from operations.pipeline import Pipeline
+
+
+class Convolution:
+    """Convolves the red, green and blue channels with a mask; results are clamped to 0 - 255."""
+
+    def __init__(self, mask, border='clamp'):
+        if border == 'wrap':
+            raise ValueError('The wrap border mode needs rows from the other end of the image')
+
+        self.mask = mask
+        self.border = border
+        self.halo = mask.radius
+
+    def __call__(self, image):
+        matrix = GrayscaleMatrix(image.width, image.height)
+
+        for channel in (image.RED, image.GREEN, image.BLUE):
+            matrix.values = array('B', image.get_channel(channel))
+            result = convolve(matrix, self.mask, self.border)
+            image.set_channel(channel, bytes(0 if value < 0 else 255 if value > 255 else int(value + 0.5) for value in result.values))
+
+        return image
+
+
+class BorderDetection:
+    """Gradient border detection (see operations.borders), normalized over the whole image."""
+
+    def __init__(self, method='prewitt'):
+        if method == 'canny':
+            raise ValueError('Canny edge detection follows edges across the whole image and cannot run in strips')
+
+        self.masks, self.absolute = gradient_masks(method)
+        self.halo = self.masks[0].radius
+        self.lowest = float('inf')
+        self.highest = float('-inf')
+
+    def analyse(self, strip, start, count):
+        result, _, _ = gradient(GrayscaleMatrix.from_image(strip, value_type=float), self.masks, self.absolute)
+        values = result.values[start * strip.width:(start + count) * strip.width]
+        self.lowest = min(self.lowest, min(values))
+        self.highest = max(self.highest, max(values))
+
+    def __call__(self, image):
+        result, _, _ = gradient(GrayscaleMatrix.from_image(image, value_type=float), self.masks, self.absolute)
+        normalized(result, self.lowest, self.highest)
+
+        # Halo rows near the strip edges see a false border and may leave 0.0 .. 1.0; they are cropped later.
+        result.values = array('d', [0.0 if value < 0.0 else 1.0 if value > 1.0 else value for value in result.values])
+        result.apply_to(image)
+        return image
+
+
+def strips(reader, operations, strip_height=256, context=0):
+    """Runs operations over the image of a reader strip by strip.
+
+    :param reader:
+        Object with width, height and read_rows(start, count) returning an image
+    :param context:
+        Rows of valid output to keep around every strip in addition to the strip itself
+    :return:
+        Generator of (strip, start, count, top): the processed rows, the index of
+        the first row belonging to the strip, the number of such rows and the
+        position of that row in the whole image
+    """
+    halo = sum(operation.halo for operation in operations) + context
+
+    for top in range(0, reader.height, strip_height):
+        count = min(strip_height, reader.height - top)
+        first = max(0, top - halo)
+        last = min(reader.height, top + count + halo)
+
+        strip = reader.read_rows(first, last - first)
+
+        for operation in operations:
+            strip = operation(strip)
+
+        yield strip, top - first, count, top
+
+
+def crop(image, start, count):
+    """Rows start .. start + count - 1 of the image, sharing its memory."""
+    view = memoryview(image.pixels)[start * image.row_size:(start + count) * image.row_size]
+    return Image.from_buffer(image.width, count, 'RGBA', view)
+
+
+def stream(reader, writer, operations, strip_height=256):
+    """Reads, processes and writes an image strip by strip.
+
+    Memory use is bounded by strip_height plus the halos of the operations, not by the image size.
+
+    :param writer:
+        Object with write_rows(start, image)
+    """
+    for operation in operations:
+        if not hasattr(operation, 'halo'):
+            raise ValueError('{} cannot be applied to strips'.format(operation))
+
+    operations = Pipeline(*operations).stages()
+
+    for i, operation in enumerate(operations):
+        if hasattr(operation, 'analyse'):
+            for strip, start, count, _ in strips(reader, operations[:i], strip_height, context=operation.halo):
+                operation.analyse(strip, start, count)
+
+    for strip, start, count, top in strips(reader, operations, strip_height):
+        writer.write_rows(top, crop(strip, start, count))
@@ -0,0 +1,54 @@
+from image import Image
+from operations.borders import apply_border_detection, gaussian_mask
+from operations.negative import negative
+from operations.streaming import BorderDetection, Convolution, stream
+from unittest import TestCase
+
+
+class ImageReader:
+
+    def __init__(self, image):
+        self.image = image
+        self.width = image.width
+        self.height = image.height
+
+    def read_rows(self, start, count):
+        row_size = self.image.row_size
+        return Image.from_buffer(self.width, count, 'RGBA', bytearray(self.image.pixels[start * row_size:(start + count) * row_size]))
+
+
+class ImageWriter:
+
+    def __init__(self, width, height):
+        self.image = Image(width, height)
+
+    def write_rows(self, start, image):
+        row_size = self.image.row_size
+        self.image.pixels[start * row_size:(start + image.height) * row_size] = image.pixels
+
+
+class StreamTest(TestCase):
+
+    def setUp(self):
+        self.image = Image(13, 29)
+        for i in range(len(self.image.pixels)):
+            if i % 4 != 3:
+                self.image.pixels[i] = (i * 37 + i // 52 * 11) % 256
+
+    def assertStreamed(self, operations, whole):
+        writer = ImageWriter(self.image.width, self.image.height)
+        stream(ImageReader(self.image), writer, operations, strip_height=5)
+
+        for operation in whole:
+            operation(self.image)
+
+        self.assertEqual(bytes(self.image.pixels), bytes(writer.image.pixels))
+
+    def test_matches_whole_image(self):
+        operations = [negative(), Convolution(gaussian_mask(1.0)), BorderDetection('sobel')]
+        self.assertStreamed(operations, operations[:2] + [lambda image: apply_border_detection(image, 'sobel')])
+
+    def test_rejects_global_operations(self):
+        self.assertRaises(ValueError, BorderDetection, 'canny')
+        self.assertRaises(ValueError, Convolution, gaussian_mask(1.0), 'wrap')
+        self.assertRaises(ValueError, stream, ImageReader(self.image), None, [lambda image: image])
@@ -1,9 +1,10 @@
+import format.jpeg as jpeg
+import imageio
 from image import Image
 
 
-def nearest_neighbor(image, ratio):
-    new_width = int(image.width * ratio)
-    new_height = int(image.height * ratio)
+def nearest_neighbor(image, ratio, size=None):
+    new_width, new_height = size or (int(image.width * ratio), int(image.height * ratio))
 
     result = Image(new_width, new_height)
 
@@ -26,9 +27,8 @@ def nearest_neighbor(image, ratio):
     return result
 
 
-def bilinear_interpolation(image, ratio):
-    new_width = int(image.width * ratio)
-    new_height = int(image.height * ratio)
+def bilinear_interpolation(image, ratio, size=None):
+    new_width, new_height = size or (int(image.width * ratio), int(image.height * ratio))
 
     result = Image(new_width, new_height)
 
@@ -53,21 +53,15 @@ def bilinear_interpolation(image, ratio):
             # +---+---+
             #
 
-            a_red = image.reds[i][j]
-            a_green = image.greens[i][j]
-            a_blue = image.blues[i][j]
+            a = image.offset(i, j)
+            b = image.offset(i + 1, j)
+            c = image.offset(i, j + 1)
+            d = image.offset(i + 1, j + 1)
 
-            b_red = image.reds[i + 1][j]
-            b_green = image.greens[i + 1][j]
-            b_blue = image.blues[i + 1][j]
-
-            c_red = image.reds[i][j + 1]
-            c_green = image.greens[i][j + 1]
-            c_blue = image.blues[i][j + 1]
-
-            d_red = image.reds[i + 1][j + 1]
-            d_green = image.greens[i + 1][j + 1]
-            d_blue = image.blues[i + 1][j + 1]
+            a_red, a_green, a_blue = image.pixels[a:a + 3]
+            b_red, b_green, b_blue = image.pixels[b:b + 3]
+            c_red, c_green, c_blue = image.pixels[c:c + 3]
+            d_red, d_green, d_blue = image.pixels[d:d + 3]
 
             red = (b_red - a_red) * di + (c_red - a_red) * dj + (d_red + a_red - b_red - c_red) * di * dj + a_red
             green = (b_green - a_green) * di + (c_green - a_green) * dj + (d_green + a_green - b_green - c_green) * di * dj + a_green
@@ -81,6 +75,28 @@ def bilinear_interpolation(image, ratio):
 
 
 def scaled(image, ratio, method=bilinear_interpolation):
+    """Scales an image by ratio.
+
+    :param image:
+        Image, or path of an image file; JPEG files are decoded at the reduced size nearest
+        above the result (format.jpeg.reduced_scale) and only resampled the rest of the way.
+        The result has the same size either way.
+    :param method:
+        method(image, ratio, size) resampling by ratio; size, if given, is the (width, height)
+        of the result instead of the image size times ratio
+    """
+    if isinstance(image, str):
+        info = imageio.probe(image)
+        size = (int(info.width * ratio), int(info.height * ratio))
+        scale = jpeg.reduced_scale(ratio) if info.format == 'jpeg' else 1
+        image = imageio.read(image, scale)
+
+        # The reduced size is rounded up, so it may be a pixel larger than the result
+        if (image.width, image.height) == size:
+            return image
+
+        return method(image, ratio / scale, size)
+
     return method(image, ratio)
 
 
@@ -89,8 +105,6 @@ def scaled(image, ratio, method=bilinear_interpolation):
 # > scaling.py image.png -o scaled.png --width 1080
 # > scaling.py image.png -o scaled.png --height 560
 if __name__ == '__main__':
-    import imageio
-
     from argparse import ArgumentParser
 
     parser = ArgumentParser(description='Scale image')
@@ -108,16 +122,16 @@ if __name__ == '__main__':
     input_file = args.input_file
     output_file = args.output_file or input_file
 
-    image = imageio.read(input_file)
+    info = imageio.probe(input_file)
 
     if args.ratio:
         ratio = args.ratio
     elif args.width:
-        ratio = args.width / image.width
+        ratio = args.width / info.width
     elif args.height:
-        ratio = args.height / image.height
+        ratio = args.height / info.height
 
     methods = {'nn': nearest_neighbor, 'bi': bilinear_interpolation}
 
-    image = scaled(image, ratio, methods[args.method])
+    image = scaled(input_file, ratio, methods[args.method])
     imageio.write(image, output_file)
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+import format.jpeg as jpeg
+from image import Image
+from transformations.scaling import scaled
+from unittest import TestCase
+
+
+class ScaledTest(TestCase):
+
+    def setUp(self):
+        # A size that the reduced JPEG decode rounds up
+        self.image = Image(93, 67)
+        for x, y in self.image.coordinates:
+            self.image.set_rgb(x, y, (x * 2) << 16 | (y * 3) << 8 | (x + y))
+
+        handle, self.path = tempfile.mkstemp(suffix='.jpg')
+        os.close(handle)
+        jpeg.write(self.image, self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_path_and_image_give_same_size(self):
+        decoded = jpeg.read(self.path)
+
+        for ratio in (0.125, 0.2, 0.25, 0.5, 0.7):
+            expected = scaled(decoded, ratio)
+            actual = scaled(self.path, ratio)
+            self.assertEqual((expected.width, expected.height), (actual.width, actual.height))